@@ -0,0 +1,177 @@
+"""Packed, compressed bundle for completed tasks in tasks/_archive/.
+
+Archived task files are appended to a single pack file, each entry
+compressed on its own so one task can be read by seeking to its offset.
+A small JSON index maps slug -> offset, title and completion date.
+"""
+
+import json
+import os
+import re
+import zlib
+from datetime import date
+from pathlib import Path
+
+from taskman.jj import find_agent_files_dir
+from taskman.lock import repo_lock
+from taskman.results import ArchiveEntry, ArchiveList, ArchivedTask, ArchivePack
+
+ARCHIVE_DIR = Path("tasks") / "_archive"
+PACK_NAME = "archive.pack"
+INDEX_NAME = "archive.idx.json"
+
+_TITLE_RE = re.compile(r"^#\s*TASK:\s*(.+?)\s*$", re.MULTILINE)
+_COMPLETED_RE = re.compile(r"^Completed:\s*(\S+)", re.MULTILINE)
+
+
+def _archive_dir(agent_files: Path) -> Path:
+    return agent_files / ARCHIVE_DIR
+
+
+def _slug_for(path: Path) -> str:
+    stem = path.stem
+    return stem[len("TASK_"):] if stem.startswith("TASK_") else stem
+
+
+def _parse_meta(text: str) -> tuple[str, str]:
+    """Return (title, completed date) from a task file, empty if missing."""
+    title = _TITLE_RE.search(text)
+    completed = _COMPLETED_RE.search(text)
+    return (
+        title.group(1) if title else "",
+        completed.group(1) if completed else "",
+    )
+
+
+def load_index(agent_files: Path) -> dict[str, dict]:
+    path = _archive_dir(agent_files) / INDEX_NAME
+    if not path.exists():
+        return {}
+    text = path.read_text(encoding="utf-8")
+    if not text.strip():
+        return {}
+    return json.loads(text).get("entries", {})
+
+
+def _write_index(agent_files: Path, entries: dict[str, dict]) -> None:
+    path = _archive_dir(agent_files) / INDEX_NAME
+    tmp = path.with_suffix(".tmp")
+    data = {"version": 1, "entries": entries}
+    tmp.write_text(json.dumps(data, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def pack(agent_files: Path | None = None) -> ArchivePack:
+    """Fold tasks/_archive/*.md into the compressed pack and remove them.
+
+    1. Checkpoint pending edits, so the pack commit holds only the pack
+    2. Append each file to the pack, replace the index, remove the files
+    3. Checkpoint the result as one commit
+
+    Runs under the repo write lock. The pack is append-only: re-packing a
+    slug appends a new entry and the index points at the latest one. The
+    pack is flushed to disk before the index is replaced, and source files
+    are removed only after both, so an interrupted run leaves every task
+    readable.
+    """
+    from taskman import tasks  # tasks imports this module
+
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    archive_dir = _archive_dir(agent_files)
+
+    with repo_lock(agent_files) as lock:
+        sources = sorted(archive_dir.glob("*.md")) if archive_dir.is_dir() else []
+        if not sources:
+            return ArchivePack(0, 0, 0, str(ARCHIVE_DIR / PACK_NAME), lock_wait=lock.waited)
+
+        tasks.run_jj(["status"], agent_files)
+        if not tasks._is_empty(agent_files):
+            tasks._checkpoint("checkpoint before archive pack", agent_files)
+
+        entries = load_index(agent_files)
+        pack_path = archive_dir / PACK_NAME
+        raw_total = 0
+        packed_total = 0
+        with open(pack_path, "ab") as fh:
+            offset = fh.tell()
+            for source in sources:
+                raw = source.read_bytes()
+                data = zlib.compress(raw, 9)
+                fh.write(data)
+                title, completed = _parse_meta(raw.decode("utf-8", errors="replace"))
+                entries[_slug_for(source)] = {
+                    "completed": completed,
+                    "file": source.name,
+                    "length": len(data),
+                    "offset": offset,
+                    "packed": date.today().isoformat(),
+                    "size": len(raw),
+                    "title": title,
+                }
+                offset += len(data)
+                raw_total += len(raw)
+                packed_total += len(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        _write_index(agent_files, entries)
+        for source in sources:
+            source.unlink()
+
+        rev = tasks._checkpoint(f"archive pack: {len(sources)} task(s)", agent_files)
+    return ArchivePack(
+        len(sources), raw_total, packed_total, str(ARCHIVE_DIR / PACK_NAME),
+        rev=rev, lock_wait=lock.waited,
+    )
+
+
+def show(slug: str, agent_files: Path | None = None) -> ArchivedTask:
+    """Read one archived task by slug, seeking straight to its pack entry."""
+    # Same rule as tasks.normalize_slug (tasks imports this module): the
+    # slug names a file in the archive directory, never a path out of it.
+    if not slug or "/" in slug or "\\" in slug or slug.startswith("."):
+        raise ValueError(f"invalid task slug: {slug!r}")
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    archive_dir = _archive_dir(agent_files)
+
+    # Not-yet-packed archive files take precedence: they are newer.
+    for name in (f"TASK_{slug}.md", f"{slug}.md"):
+        loose = archive_dir / name
+        if loose.is_file():
+            return ArchivedTask(slug, loose.read_text(encoding="utf-8"))
+
+    entry = load_index(agent_files).get(slug)
+    if entry is None:
+        raise FileNotFoundError(f"archived task not found: {slug}")
+    with open(archive_dir / PACK_NAME, "rb") as fh:
+        fh.seek(entry["offset"])
+        data = fh.read(entry["length"])
+    return ArchivedTask(slug, zlib.decompress(data).decode("utf-8"))
+
+
+def list_entries(query: str | None = None, agent_files: Path | None = None) -> ArchiveList:
+    """List archived tasks, optionally filtered by slug, title or date prefix."""
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    rows: dict[str, tuple[str, str]] = {
+        slug: (entry.get("completed", ""), entry.get("title", ""))
+        for slug, entry in load_index(agent_files).items()
+    }
+    archive_dir = _archive_dir(agent_files)
+    if archive_dir.is_dir():
+        for source in archive_dir.glob("*.md"):
+            rows[_slug_for(source)] = tuple(reversed(
+                _parse_meta(source.read_text(encoding="utf-8", errors="replace"))
+            ))
+
+    needle = query.lower() if query else None
+    result = ArchiveList()
+    for slug in sorted(rows, key=lambda s: (rows[s][0], s), reverse=True):
+        completed, title = rows[slug]
+        if needle and not (
+            needle in slug.lower()
+            or needle in title.lower()
+            or completed.startswith(query)
+        ):
+            continue
+        result.entries.append(ArchiveEntry(slug, title, completed))
+    return result
@@ -0,0 +1,258 @@
+"""Similarity index over `### Attempt` entries in task files.
+
+Each attempt is reduced to a MinHash signature over its word unigrams and
+bigrams; locality-sensitive hashing on bands of the signature finds
+candidate matches without comparing against every entry. The index covers
+live tasks, loose archive files and the archive pack, and is persisted in
+.jj/repo/taskman/attempts-<workspace>.json keyed by source so only changed
+files are re-read.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+
+from taskman import archive
+from taskman.jj import find_agent_files_dir, taskman_state_dir, workspace_key
+from taskman.results import AttemptMatch, AttemptMatches
+
+INDEX_VERSION = 1
+
+NUM_PERM = 64
+# Two-row bands keep recall high when a one-line query is compared with a
+# full attempt entry (Jaccard ~0.2); candidates are re-ranked exactly.
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+_MASK = 0xFFFFFFFF
+
+# Shingles are hashed to 64 random bits; XOR with a fixed random mask acts
+# as each "permutation". That is a few times cheaper than (a*x + b) mod p
+# in pure Python and estimates Jaccard with negligible bias.
+_SEEDS = [random.Random(0x7A5C + i).getrandbits(64) for i in range(NUM_PERM)]
+
+_ATTEMPT_RE = re.compile(r"^###\s+Attempt\b.*$", re.MULTILINE)
+_HEADING_RE = re.compile(r"^#{1,3}\s", re.MULTILINE)
+_TITLE_RE = re.compile(r"^#\s*TASK:\s*(.+?)\s*$", re.MULTILINE)
+_FIELD_RE = re.compile(r"^(Approach|Result):\s*(.*)$", re.MULTILINE | re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9_]{2,}")
+_STOPWORDS = frozenset(
+    "the and for with that this from into was were are but not use used using "
+    "then than have has had its it's out via per all any".split()
+)
+
+# In-process cache so a long-running MCP server loads the index once.
+_cache: dict[Path, "AttemptIndex"] = {}
+
+
+def shingles(text: str) -> set[int]:
+    """Hashed word unigrams and bigrams, ignoring case and stopwords."""
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+    grams = set(words)
+    grams.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "little")
+        for g in grams
+    }
+
+
+def signature(hashed: set[int]) -> list[int]:
+    if not hashed:
+        return [_MASK] * NUM_PERM
+    return [min(map(seed.__xor__, hashed)) & _MASK for seed in _SEEDS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _bands(sig: list[int]) -> list[tuple[int, ...]]:
+    return [(i, *sig[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+
+def _encode_sig(sig: list[int]) -> str:
+    return base64.b64encode(array("I", sig).tobytes()).decode("ascii")
+
+
+def _decode_sig(data: str) -> list[int]:
+    return array("I", base64.b64decode(data)).tolist()
+
+
+def _field(body: str, name: str) -> str:
+    for m in _FIELD_RE.finditer(body):
+        if m.group(1).lower() == name:
+            return m.group(2).strip()
+    return ""
+
+
+def parse_attempts(text: str) -> list[dict]:
+    """Split a task file into its attempt entries (header, approach, result)."""
+    title = _TITLE_RE.search(text)
+    entries = []
+    for m in _ATTEMPT_RE.finditer(text):
+        end = _HEADING_RE.search(text, m.end())
+        body = text[m.end():end.start() if end else len(text)].strip()
+        entries.append({
+            "title": title.group(1) if title else "",
+            "header": m.group(0).lstrip("#").strip(),
+            "approach": _field(body, "approach")[:300],
+            "result": _field(body, "result")[:300],
+            "sig": _encode_sig(signature(shingles(body))),
+        })
+    return entries
+
+
+@dataclass
+class _Entry:
+    source: str
+    title: str
+    header: str
+    approach: str
+    result: str
+    sig: list[int]
+
+
+class AttemptIndex:
+    """Attempt signatures plus LSH buckets, refreshed incrementally."""
+
+    def __init__(self, agent_files: Path, path: Path) -> None:
+        self.agent_files = agent_files
+        self.path = path
+        # source -> {"stamp": ..., "entries": [...]} as persisted
+        self.sources: dict[str, dict] = {}
+        self.entries: list[_Entry] = []
+        self.buckets: dict[tuple[int, ...], list[int]] = {}
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if data.get("version") == INDEX_VERSION:
+                    self.sources = data.get("sources", {})
+            except (OSError, json.JSONDecodeError):
+                self.sources = {}
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.entries = []
+        self.buckets = {}
+        for source in sorted(self.sources):
+            for raw in self.sources[source]["entries"]:
+                entry = _Entry(
+                    source, raw["title"], raw["header"], raw["approach"], raw["result"],
+                    _decode_sig(raw["sig"]),
+                )
+                idx = len(self.entries)
+                self.entries.append(entry)
+                for band in _bands(entry.sig):
+                    self.buckets.setdefault(band, []).append(idx)
+
+    def _current_sources(self) -> dict[str, tuple]:
+        """Source id -> change stamp for everything that may hold attempts."""
+        stamps: dict[str, tuple] = {}
+        root = str(self.agent_files)
+        # Plain strings and os.scandir: this runs before every query.
+        stack = [os.path.join(root, "tasks")]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".md"):
+                        st = entry.stat()
+                        rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                        stamps[rel] = (st.st_mtime_ns, st.st_size)
+        archive_dir = archive.ARCHIVE_DIR.as_posix()
+        for slug, entry in archive.load_index(self.agent_files).items():
+            # A loose archive file for the slug is newer than its packed copy.
+            if f"{archive_dir}/TASK_{slug}.md" in stamps or f"{archive_dir}/{slug}.md" in stamps:
+                continue
+            stamps[f"pack:{slug}"] = (entry["offset"], entry["length"])
+        return stamps
+
+    def _read(self, source: str) -> str:
+        if source.startswith("pack:"):
+            return archive.show(source[len("pack:"):], self.agent_files).content
+        return (self.agent_files / source).read_text(encoding="utf-8", errors="replace")
+
+    def refresh(self) -> bool:
+        """Re-index changed sources; returns True if anything changed."""
+        current = self._current_sources()
+        changed = False
+        for source in list(self.sources):
+            if source not in current:
+                del self.sources[source]
+                changed = True
+        for source, stamp in current.items():
+            known = self.sources.get(source)
+            if known is not None and tuple(known["stamp"]) == stamp:
+                continue
+            try:
+                text = self._read(source)
+            except OSError:
+                continue
+            self.sources[source] = {"stamp": list(stamp), "entries": parse_attempts(text)}
+            changed = True
+        if changed:
+            self._rebuild()
+            self._save()
+        return changed
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        data = {"version": INDEX_VERSION, "sources": self.sources}
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def query(self, text: str, k: int) -> list[tuple[float, _Entry]]:
+        sig = signature(shingles(text))
+        candidates: set[int] = set()
+        for band in _bands(sig):
+            candidates.update(self.buckets.get(band, ()))
+        scored = [(similarity(sig, self.entries[i].sig), self.entries[i]) for i in candidates]
+        scored.sort(key=lambda pair: (-pair[0], pair[1].source, pair[1].header))
+        return scored[:k]
+
+
+def _index_path(agent_files: Path) -> Path:
+    # One index per workspace: their task files differ, and a shared one
+    # would be invalidated and rewritten by each in turn.
+    return taskman_state_dir(agent_files) / f"attempts-{workspace_key(agent_files)}.json"
+
+
+def load(agent_files: Path) -> AttemptIndex:
+    index = _cache.get(agent_files)
+    if index is None:
+        index = AttemptIndex(agent_files, _index_path(agent_files))
+        _cache[agent_files] = index
+    index.refresh()
+    return index
+
+
+def similar_attempts(text: str, k: int = 5, agent_files: Path | None = None) -> AttemptMatches:
+    """Closest past attempts to a planned approach, most similar first."""
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    index = load(agent_files)
+    return AttemptMatches(
+        query=text,
+        indexed=len(index.entries),
+        matches=[
+            AttemptMatch(
+                source=entry.source,
+                title=entry.title,
+                header=entry.header,
+                approach=entry.approach,
+                result=entry.result,
+                score=round(score, 3),
+            )
+            for score, entry in index.query(text, k)
+        ],
+    )
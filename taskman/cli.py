@@ -1,4 +1,8 @@
 import argparse
+import json
+import os
+import sys
+from pathlib import Path
 
 from taskman import core
 
@@ -11,6 +15,62 @@ def _get_version() -> str:
         return "dev"
 
 
+def _emit(result, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(result.to_dict(), indent=2))
+    else:
+        print(result)
+
+
+def _streaming(args: argparse.Namespace) -> bool:
+    """Plain, unbudgeted output: print sections as they are produced."""
+    return not args.json and args.max_bytes is None and args.cursor is None
+
+
+def _stream(sections) -> None:
+    """Write each section to stdout as soon as it is yielded.
+
+    Stops quietly when the reader goes away (`taskman history-batch ... | head`):
+    the generator is closed so no further jj/git work is done.
+    """
+    printed = False
+    try:
+        while True:
+            try:
+                section = next(sections)
+            except StopIteration as stop:
+                if not printed and stop.value:
+                    print(stop.value, flush=True)
+                break
+            print(section.text.rstrip(), flush=True)
+            printed = True
+    except BrokenPipeError:
+        sections.close()
+        # Python flushes stdout again at exit; send that to /dev/null.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+def _add_budget_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--max-bytes", type=int, default=None,
+                        help="stop output at this size and print a resume cursor")
+    parser.add_argument("--cursor", default=None,
+                        help="resume from a cursor printed by a truncated run")
+
+
+def _add_window_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--since", default=None,
+                        help="only revisions made at/after this time (2026-01-02, yesterday, 6h)")
+    parser.add_argument("--until", default=None,
+                        help="only revisions made at/before this time")
+
+
+def _file_args(args: argparse.Namespace) -> str | list[str]:
+    """The file argument plus any --path extras (a list only when there are extras)."""
+    return [args.file, *args.paths] if args.paths else args.file
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(prog="taskman")
     parser.add_argument("--version", action="version", version=f"%(prog)s {_get_version()}")
@@ -27,7 +87,15 @@ def main() -> None:
     uninstall_mcp.add_argument("agent", choices=["claude", "cursor", "codex"])
     uninstall_skills = subparsers.add_parser("uninstall-skills")
     uninstall_skills.add_argument("agent", choices=["claude", "codex", "pi"])
-    subparsers.add_parser("stdio")
+    stdio = subparsers.add_parser("stdio")
+    stdio.add_argument("--group-window", type=float, default=0.0,
+                       help="coalesce syncs arriving within this many seconds (group commit)")
+    stdio.add_argument("--push", dest="push_remote", metavar="REMOTE", default=None,
+                       help="queue a background push of the workspace bookmark after each sync")
+    stdio.add_argument("--metrics-file", type=Path, default=None,
+                       help="write per-tool metrics to this Prometheus textfile (*.prom)")
+    stdio.add_argument("--metrics-interval", type=float, default=15.0,
+                       help="seconds between metrics textfile writes (default: %(default)s)")
 
     wt_parser = subparsers.add_parser("wt", help="create git worktree with jj workspace")
     wt_parser.add_argument("name", nargs="?", default=None,
@@ -44,64 +112,230 @@ def main() -> None:
 
     subparsers.add_parser("wt-prune", help="cleanup orphaned worktree state")
 
+    doctor_parser = subparsers.add_parser("doctor", help="check jj version and workspace health")
+    doctor_parser.add_argument("--perf", action="store_true",
+                               help="also measure repo size, counts and jj timings")
+
+    gc_parser = subparsers.add_parser("gc", help="abandon empty commits, trim op log, repack")
+    gc_parser.add_argument("--keep-days", type=float, default=core.GC_KEEP_DAYS,
+                           help="keep operations newer than this many days (default: %(default)s)")
+    gc_parser.add_argument("--dry-run", action="store_true",
+                           help="report what would be removed without changing anything")
+
     # Operation commands
     desc = subparsers.add_parser("describe")
     desc.add_argument("reason")
 
     sy = subparsers.add_parser("sync")
     sy.add_argument("reason")
+    sy.add_argument("--group-window", type=float, default=0.0,
+                    help="coalesce with other syncs arriving within this many seconds")
+    sy.add_argument("--push", dest="push_remote", metavar="REMOTE", default=None,
+                    help="queue a background push of the workspace bookmark to REMOTE")
+
+    subparsers.add_parser("push-status", help="show pending background pushes")
 
     hd = subparsers.add_parser("history-diffs")
     hd.add_argument("file")
-    hd.add_argument("start_rev")
+    hd.add_argument("start_rev", nargs="?", default="root()")
     hd.add_argument("end_rev", nargs="?", default="@")
+    hd.add_argument("--path", dest="paths", action="append", default=[],
+                    help="another path or glob to include (repeatable)")
+    _add_window_args(hd)
+    _add_budget_args(hd)
 
     hb = subparsers.add_parser("history-batch")
     hb.add_argument("file")
-    hb.add_argument("start_rev")
+    hb.add_argument("start_rev", nargs="?", default="root()")
     hb.add_argument("end_rev", nargs="?", default="@")
+    hb.add_argument("--path", dest="paths", action="append", default=[],
+                    help="another path or glob to include (repeatable)")
+    _add_window_args(hb)
+    _add_budget_args(hb)
 
     hs = subparsers.add_parser("history-search")
     hs.add_argument("pattern")
     hs.add_argument("--file", default=None)
     hs.add_argument("--limit", type=int, default=20)
+    _add_budget_args(hs)
+
+    hg = subparsers.add_parser("history-grep")
+    hg.add_argument("pattern")
+    hg.add_argument("paths", nargs="+")
+    hg.add_argument("--start", dest="start_rev", default="root()")
+    hg.add_argument("--end", dest="end_rev", default="@")
+    _add_window_args(hg)
+    _add_budget_args(hg)
+
+    tl = subparsers.add_parser("timeline", help="checkpoints made in a time window")
+    _add_window_args(tl)
+    tl.add_argument("--limit", type=int, default=50)
+
+    hbl = subparsers.add_parser("history-blame")
+    hbl.add_argument("file")
+    hbl.add_argument("rev", nargs="?", default="@")
+    _add_budget_args(hbl)
+
+    sh = subparsers.add_parser("since-handoff", help="net changes in all workspaces since a handoff")
+    sh.add_argument("agent_slug")
+    _add_budget_args(sh)
+
+    subparsers.add_parser("conflicts", help="list conflicted revisions and files with conflict regions")
+
+    wa = subparsers.add_parser("watch", help="auto-checkpoint edits via inotify (Linux)")
+    wa.add_argument("--quiet", type=float, default=2.0,
+                    help="checkpoint after this many seconds without edits")
+    wa.add_argument("--interval", type=float, default=60.0,
+                    help="checkpoint at least this often while edits keep coming")
+
+    sa = subparsers.add_parser("similar-attempts", help="find past attempts similar to an approach")
+    sa.add_argument("text")
+    sa.add_argument("-k", type=int, default=5, help="number of matches")
+
+    gr = subparsers.add_parser("grep", help="search the current .agent-files (trigram index)")
+    gr.add_argument("pattern")
+    gr.add_argument("-E", "--regex", action="store_true", help="pattern is a Python regex")
+    gr.add_argument("-i", "--ignore-case", action="store_true")
+    gr.add_argument("-C", "--context", type=int, default=0, help="lines of context")
+    gr.add_argument("--path", default=None, help="only paths matching this glob")
+    gr.add_argument("--limit", type=int, default=100)
+
+    ct = subparsers.add_parser("complete", help="complete and archive a task in one checkpoint")
+    ct.add_argument("slug")
+    ct.add_argument("summary", nargs="?", default="", help="outcome, added to ## Summary")
+    ct.add_argument("--push", dest="push_remote", metavar="REMOTE", default=None,
+                    help="queue a background push of the workspace bookmark")
+
+    nx = subparsers.add_parser("next", help="tasks ready to start, by priority and dependencies")
+    nx.add_argument("--limit", type=int, default=10, help="ready tasks to list (0 = all)")
+
+    tp = subparsers.add_parser("task-path", help="resolve a task slug to its file")
+    tp.add_argument("slug")
+
+    rs = subparsers.add_parser("reshard", help="move tasks/ to the sharded (or flat) layout")
+    rs.add_argument("--flat", action="store_true", help="move back to one flat tasks/ directory")
+    rs.add_argument("--dry-run", action="store_true", help="report what would move")
+
+    ar = subparsers.add_parser("archive", help="packed archive of completed tasks")
+    ar_sub = ar.add_subparsers(dest="archive_command", required=True)
+    ar_sub.add_parser("pack", help="fold tasks/_archive/*.md into the compressed pack")
+    ar_show = ar_sub.add_parser("show", help="print one archived task")
+    ar_show.add_argument("slug")
+    ar_list = ar_sub.add_parser("list", help="list archived tasks")
+    ar_list.add_argument("query", nargs="?", default=None,
+                         help="filter by slug, title or completion date prefix")
+
+    # Every command that returns a result can print it as JSON.
+    leaves = [
+        sub for name, sub in subparsers.choices.items()
+        if name not in ("stdio", "watch", "archive")
+    ] + list(ar_sub.choices.values())
+    for sub in leaves:
+        sub.add_argument("--json", action="store_true", help="print the result as JSON")
 
     args = parser.parse_args()
 
     if args.command == "init":
-        print(core.init())
+        _emit(core.init(), args.json)
     elif args.command == "migrate":
-        print(core.migrate())
+        _emit(core.migrate(), args.json)
     elif args.command == "wt":
-        print(core.wt(args.name, new_branch=args.new_branch))
+        _emit(core.wt(args.name, new_branch=args.new_branch), args.json)
     elif args.command == "wt-list":
-        print(core.wt_list())
+        _emit(core.wt_list(), args.json)
     elif args.command == "wt-rm":
-        print(core.wt_rm(args.name, force=args.force))
+        _emit(core.wt_rm(args.name, force=args.force), args.json)
     elif args.command == "wt-prune":
-        print(core.wt_prune())
+        _emit(core.wt_prune(), args.json)
+    elif args.command == "doctor":
+        _emit(core.doctor(perf=args.perf), args.json)
+    elif args.command == "gc":
+        _emit(core.gc(args.keep_days, dry_run=args.dry_run), args.json)
     elif args.command == "install-mcp":
-        print(core.install_mcp(args.agent))
+        _emit(core.install_mcp(args.agent), args.json)
     elif args.command == "install-skills":
-        print(core.install_skills(args.agent))
+        _emit(core.install_skills(args.agent), args.json)
     elif args.command == "uninstall-mcp":
-        print(core.uninstall_mcp(args.agent))
+        _emit(core.uninstall_mcp(args.agent), args.json)
     elif args.command == "uninstall-skills":
-        print(core.uninstall_skills(args.agent))
+        _emit(core.uninstall_skills(args.agent), args.json)
     elif args.command == "stdio":
         from taskman.server import main as server_main
 
-        server_main()
+        server_main(
+            group_window=args.group_window,
+            push_remote=args.push_remote,
+            metrics_file=args.metrics_file,
+            metrics_interval=args.metrics_interval,
+        )
     elif args.command == "describe":
-        print(core.describe(args.reason))
+        _emit(core.describe(args.reason), args.json)
     elif args.command == "sync":
-        print(core.sync(args.reason))
+        _emit(core.sync(
+            args.reason, group_window=args.group_window, push_remote=args.push_remote
+        ), args.json)
+    elif args.command == "push-status":
+        _emit(core.push_status(), args.json)
+    elif args.command == "conflicts":
+        _emit(core.conflicts(), args.json)
+    elif args.command == "history-diffs" and _streaming(args):
+        _stream(core.iter_history_diffs(
+            _file_args(args), args.start_rev, args.end_rev, args.since, args.until
+        ))
     elif args.command == "history-diffs":
-        print(core.history_diffs(args.file, args.start_rev, args.end_rev))
+        _emit(core.history_diffs(
+            _file_args(args), args.start_rev, args.end_rev, args.max_bytes, args.cursor,
+            args.since, args.until,
+        ), args.json)
+    elif args.command == "history-batch" and _streaming(args):
+        _stream(core.iter_history_batch(
+            _file_args(args), args.start_rev, args.end_rev, args.since, args.until
+        ))
     elif args.command == "history-batch":
-        print(core.history_batch(args.file, args.start_rev, args.end_rev))
+        _emit(core.history_batch(
+            _file_args(args), args.start_rev, args.end_rev, args.max_bytes, args.cursor,
+            args.since, args.until,
+        ), args.json)
+    elif args.command == "history-search" and _streaming(args):
+        _stream(core.iter_history_search(args.pattern, args.file, args.limit))
     elif args.command == "history-search":
-        print(core.history_search(args.pattern, args.file, args.limit))
+        _emit(core.history_search(
+            args.pattern, args.file, args.limit, args.max_bytes, args.cursor
+        ), args.json)
+    elif args.command == "history-grep":
+        _emit(core.history_grep(
+            args.pattern, args.paths, args.start_rev, args.end_rev,
+            args.max_bytes, args.cursor, args.since, args.until,
+        ), args.json)
+    elif args.command == "timeline":
+        _emit(core.timeline(args.since, args.until, args.limit), args.json)
+    elif args.command == "history-blame":
+        _emit(core.history_blame(args.file, args.rev, args.max_bytes, args.cursor), args.json)
+    elif args.command == "since-handoff":
+        _emit(core.since_handoff(args.agent_slug, args.max_bytes, args.cursor), args.json)
+    elif args.command == "watch":
+        core.watch(args.quiet, args.interval, lambda line: print(line, flush=True))
+    elif args.command == "similar-attempts":
+        _emit(core.similar_attempts(args.text, args.k), args.json)
+    elif args.command == "grep":
+        _emit(core.grep(
+            args.pattern, args.regex, args.ignore_case, args.context, args.path, args.limit
+        ), args.json)
+    elif args.command == "complete":
+        _emit(core.complete_task(args.slug, args.summary, push_remote=args.push_remote), args.json)
+    elif args.command == "next":
+        _emit(core.ready_queue(args.limit), args.json)
+    elif args.command == "task-path":
+        _emit(core.task_path(args.slug), args.json)
+    elif args.command == "reshard":
+        _emit(core.reshard(args.flat, dry_run=args.dry_run), args.json)
+    elif args.command == "archive":
+        if args.archive_command == "pack":
+            _emit(core.archive_pack(), args.json)
+        elif args.archive_command == "show":
+            _emit(core.archive_show(args.slug), args.json)
+        else:
+            _emit(core.archive_list(args.query), args.json)
     else:
         parser.print_help()
         raise SystemExit(1)
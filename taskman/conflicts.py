@@ -0,0 +1,81 @@
+"""Parse git-style conflict markers as materialized by jj.
+
+taskman runs jj with `ui.conflict-marker-style = "git"`, so conflicted
+files look like:
+
+    <<<<<<< Side #1 (Conflict 1 of 1)
+    ours
+    ||||||| Base
+    base
+    =======
+    theirs
+    >>>>>>> Side #2 (Conflict 1 of 1 ends)
+
+jj lengthens the markers when a file already contains marker-like lines,
+so any run of 7 or more is accepted as long as it matches the opener.
+"""
+
+import re
+
+from taskman.results import ConflictRegion, ConflictSide
+
+_OPEN_RE = re.compile(r"^(<{7,})(?: (.*))?$")
+
+
+def _marker(line: str, char: str, width: int) -> str | None:
+    """Return the label if line is a `char * width` marker, else None."""
+    if not line.startswith(char * width):
+        return None
+    rest = line[width:]
+    if rest and rest[0] == char:
+        return None
+    if rest and rest[0] != " ":
+        return None
+    return rest[1:] if rest else ""
+
+
+def parse_conflicts(text: str) -> list[ConflictRegion]:
+    """Find every conflict region in text.
+
+    Line numbers are 1-based. A side's `start` is its first content line;
+    an empty side has no lines and `start` points at the next marker.
+    Unterminated regions are ignored.
+    """
+    lines = text.splitlines()
+    regions: list[ConflictRegion] = []
+    i = 0
+    while i < len(lines):
+        m = _OPEN_RE.match(lines[i])
+        if not m:
+            i += 1
+            continue
+        width = len(m.group(1))
+        start = i + 1
+        ours = ConflictSide(m.group(2) or "", start + 1, [])
+        base: ConflictSide | None = None
+        theirs: ConflictSide | None = None
+        current = ours
+        j = i + 1
+        end = None
+        while j < len(lines):
+            line = lines[j]
+            lineno = j + 1
+            label = _marker(line, "|", width)
+            if label is not None and current is ours:
+                base = ConflictSide(label, lineno + 1, [])
+                current = base
+            elif _marker(line, "=", width) == "" and theirs is None:
+                theirs = ConflictSide("", lineno + 1, [])
+                current = theirs
+            elif (label := _marker(line, ">", width)) is not None and theirs is not None:
+                theirs.label = label
+                end = lineno
+                break
+            else:
+                current.lines.append(line)
+            j += 1
+        if end is None or theirs is None:
+            break
+        regions.append(ConflictRegion(start, end, ours, theirs, base))
+        i = j + 1
+    return regions
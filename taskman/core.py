@@ -1,24 +1,60 @@
+import base64
+import difflib
+import fnmatch
+import functools
+import hashlib
 import json
+import os
+import re
 import shutil
-import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from pathlib import Path
+from typing import Callable, Generator, Iterable, Iterator
 import tomllib
 
-from taskman.jj import run_jj, find_agent_files_dir
-
-
-def _run_cmd(args: list[str], cwd: Path | None = None) -> tuple[int, str, str]:
-    proc = subprocess.run(
-        args,
-        cwd=str(cwd) if cwd is not None else None,
-        text=True,
-        capture_output=True,
-    )
-    return proc.returncode, proc.stdout, proc.stderr
-
-
-def _run_cmd_check(args: list[str], cwd: Path | None = None) -> tuple[int, str, str]:
-    code, out, err = _run_cmd(args, cwd=cwd)
+from taskman.jj import iter_jj_lines, run_jj, find_agent_files_dir, find_git_dir, find_repo_dir, taskman_state_dir
+from taskman import archive, deps, gitstore, group, mdmerge, process, push, tasks
+from taskman.timeline import commits_between, parse_time
+from taskman.lock import DEFAULT_TIMEOUT as DEFAULT_LOCK_TIMEOUT, repo_lock
+from taskman.conflicts import parse_conflicts
+from taskman.doctor import report as doctor_report
+from taskman.results import (
+    Checkpoint,
+    ConfigChange,
+    ConflictedFile,
+    ConflictedRevision,
+    ConflictInventory,
+    ConflictRegion,
+    DoctorReport,
+    GcResult,
+    HistoryResult,
+    Message,
+    PushStatus,
+    ReadyTask,
+    Section,
+    Steps,
+    SyncResult,
+    TaskCompleted,
+    WorkspaceCreated,
+    WorktreeList,
+    WorktreeRemoval,
+    WorktreeStatus,
+)
+
+
+def _run_cmd(
+    args: list[str], cwd: Path | None = None, input: str | None = None
+) -> tuple[int, str, str]:
+    """Run a non-jj command (git) with the timeout for its operation class."""
+    return process.run(args, cwd, input=input)
+
+
+def _run_cmd_check(
+    args: list[str], cwd: Path | None = None, input: str | None = None
+) -> tuple[int, str, str]:
+    code, out, err = _run_cmd(args, cwd=cwd, input=input)
     if code != 0:
         cmd_str = " ".join(args)
         raise RuntimeError(
@@ -59,11 +95,32 @@ def _rev_list(start_rev: str, end_rev: str, cwd: Path) -> list[str]:
     return _rev_list_for_revset(revset, cwd)
 
 
+def _rev_commit_list(start_rev: str, end_rev: str, cwd: Path) -> list[tuple[str, str]]:
+    """Like _rev_list, but returns (change_id, commit_id) pairs."""
+    if _revset_has_revs(start_rev, cwd):
+        revset = f"{start_rev}::{end_rev}"
+    else:
+        revset = f"::{end_rev}"
+    _, out, _ = run_jj(
+        [
+            "log", "--no-graph", "-r", revset,
+            "-T", 'change_id.short() ++ " " ++ commit_id ++ "\\n"',
+        ],
+        cwd,
+    )
+    pairs = []
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            pairs.append((parts[0], parts[1]))
+    return pairs
+
+
 def _escape_revset_value(value: str) -> str:
     return value.replace("\\", "\\\\").replace('"', "\\\"")
 
 
-def describe(reason: str) -> str:
+def describe(reason: str) -> Checkpoint:
     """Create named checkpoint.
 
     1. jj status (trigger snapshot)
@@ -73,13 +130,14 @@ def describe(reason: str) -> str:
     Returns: Revision ID and confirmation
     """
     cwd = _agent_files_cwd()
-    run_jj(["status"], cwd)
-    run_jj(["describe", "-m", reason], cwd)
-    rev = _current_rev_id(cwd)
-    # Start fresh working copy so subsequent edits don't modify the checkpoint.
-    # (jj auto-snapshots before all commands, so @ already contains our changes)
-    run_jj(["new"], cwd)
-    return f"checkpoint {rev}: {reason}"
+    with repo_lock(cwd) as lock:
+        run_jj(["status"], cwd)
+        run_jj(["describe", "-m", reason], cwd)
+        rev = _current_rev_id(cwd)
+        # Start fresh working copy so subsequent edits don't modify the checkpoint.
+        # (jj auto-snapshots before all commands, so @ already contains our changes)
+        run_jj(["new"], cwd)
+    return Checkpoint(rev=rev, reason=reason, lock_wait=lock.waited)
 
 
 def _current_workspace_name(cwd: Path) -> str:
@@ -92,7 +150,7 @@ def _current_workspace_name(cwd: Path) -> str:
     return out.strip() or "default"
 
 
-def sync(reason: str) -> str:
+def sync(reason: str, group_window: float = 0.0, push_remote: str | None = None) -> SyncResult:
     """Sync working copy: describe, update workspace bookmark.
 
     1. jj describe -m "<reason>"
@@ -101,14 +159,28 @@ def sync(reason: str) -> str:
 
     Each workspace has its own bookmark matching its name.
 
+    With group_window > 0, concurrent syncs from all workspaces arriving
+    within that many seconds are coalesced into one pass (see _sync_group).
+    With push_remote, the workspace bookmark is queued for a background
+    push to that remote (see taskman/push.py).
+
     Returns: Step-by-step status
     """
     cwd = _agent_files_cwd()
-    steps: list[str] = []
+    if group_window > 0:
+        return _queue_push(_sync_grouped(reason, group_window, cwd), cwd, push_remote)
+
+    with repo_lock(cwd) as lock:
+        result = _sync_locked(reason, cwd)
+    result.lock_wait = lock.waited
+    return _queue_push(result, cwd, push_remote)
+
 
+def _sync_locked(reason: str, cwd: Path) -> SyncResult:
+    """The sync steps; the caller holds the repo lock."""
+    auto_merged = _auto_merge_conflicts(cwd)
     run_jj(["describe", "-m", reason], cwd)
     rev = _current_rev_id(cwd)
-    steps.append(f"rev: {rev}")
 
     # Get current workspace name for bookmark
     workspace = _current_workspace_name(cwd)
@@ -116,96 +188,1429 @@ def sync(reason: str) -> str:
     # Move workspace bookmark to current revision
     try:
         run_jj(["bookmark", "set", workspace, "-r", "@"], cwd)
-        steps.append(f"bookmark: {workspace} -> @")
+        bookmark = "moved"
     except RuntimeError:
         # Create if doesn't exist
         try:
             run_jj(["bookmark", "create", workspace, "-r", "@"], cwd)
-            steps.append(f"bookmark: created {workspace}")
+            bookmark = "created"
         except RuntimeError:
-            steps.append("bookmark: failed")
+            bookmark = "failed"
 
     run_jj(["new"], cwd)
-    return "\n".join(steps)
+    return SyncResult(rev=rev, workspace=workspace, bookmark=bookmark, auto_merged=auto_merged)
 
 
-def history_diffs(file: str, start_rev: str, end_rev: str = "@") -> str:
-    """Get all diffs for file across revision range.
+def _replace_text(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
 
-    1. Get revisions: jj log --no-graph -r "{start}::{end}" -T 'change_id.short()'
-    2. For each: jj diff -r {rev} -- {file}
-    3. Concatenate with === {rev} === headers
+
+def _update_status(status: Path, slug: str, next_task: ReadyTask | None) -> bool:
+    """Drop STATUS.md lines about slug and point `Next:` at next_task."""
+    lines = status.read_text(encoding="utf-8").splitlines() if status.exists() else []
+    kept = [line for line in lines if mdmerge.status_task(line) != slug]
+    pointer = f"Next: {next_task.slug} ({next_task.path})" if next_task else None
+    for i, line in enumerate(kept):
+        if line.startswith("Next:"):
+            if pointer:
+                kept[i] = pointer
+            else:
+                del kept[i]
+            break
+    else:
+        if pointer:
+            kept.append(pointer)
+    if kept == lines:
+        return False
+    _replace_text(status, "\n".join(kept) + "\n")
+    return True
+
+
+def complete_task(slug: str, summary: str = "", push_remote: str | None = None) -> TaskCompleted:
+    """Complete a task and archive it in one checkpoint.
+
+    1. Set Status: complete and Completed: <today> in the task's Meta,
+       add the summary to ## Summary as `Outcome:`
+    2. Move the file to tasks/_archive/TASK_<slug>.md
+    3. Remove the task from STATUS.md, point `Next:` at the next task
+    4. Sync (describe, move the workspace bookmark, jj new)
+
+    All of it runs under the repo lock, and the edits land in a single
+    checkpoint. The archived copy is written before the live file is
+    removed, so an interrupted run leaves the task readable, and running
+    it again for the same slug finishes the job.
     """
     cwd = _agent_files_cwd()
-    revs = _rev_list(start_rev, end_rev, cwd)
-    if not revs:
-        return "No revisions found in range."
+    with repo_lock(cwd) as lock:
+        found = tasks.task_path(slug, cwd)
+        if not found.exists:
+            raise FileNotFoundError(f"task not found: {slug}")
+        if not found.path:
+            raise ValueError(f"task {found.slug} is already archived in the pack")
+        source = cwd / found.path
+        archived = archive.ARCHIVE_DIR / f"TASK_{found.slug}.md"
+        text = source.read_text(encoding="utf-8")
+        text = tasks.set_meta(text, "Status", "complete")
+        text = tasks.set_meta(text, "Completed", date.today().isoformat())
+        if summary:
+            text = tasks.add_to_section(text, "Summary", f"Outcome: {summary}")
+        (cwd / archived).parent.mkdir(parents=True, exist_ok=True)
+        _replace_text(cwd / archived, text)
+        if source != cwd / archived:
+            source.unlink()
+
+        # The task is archived now, so tasks it was blocking count as ready.
+        ready = deps.ready_queue(limit=1, exclude=found.slug, agent_files=cwd).ready
+        upcoming = ready[0] if ready else None
+        _update_status(cwd / "STATUS.md", found.slug, upcoming)
+        synced = _sync_locked(f"complete: {found.slug}", cwd)
+    synced.lock_wait = lock.waited
+    return TaskCompleted(
+        slug=found.slug,
+        path=archived.as_posix(),
+        sync=_queue_push(synced, cwd, push_remote),
+        next=upcoming.slug if upcoming else "",
+        next_path=upcoming.path if upcoming else "",
+    )
+
 
-    sections: list[str] = []
-    for rev in revs:
-        sections.append(f"=== {rev} ===")
-        _, out, _ = run_jj(["diff", "-r", rev, "--", file], cwd)
-        sections.append(out.rstrip())
+def _queue_push(result: SyncResult, cwd: Path, remote: str | None) -> SyncResult:
+    if remote and result.bookmark != "failed":
+        push.enqueue(cwd, result.workspace, remote)
+        push.ensure_worker(cwd)
+        result.push = remote
+    return result
+
+
+# Queue shared by all workspaces for group-commit syncs.
+GROUP_QUEUE_DIR = "sync-queue"
+
+
+def _sync_grouped(reason: str, window: float, cwd: Path) -> SyncResult:
+    # Conflict resolution touches this workspace's files, so it happens
+    # here rather than in the leader.
+    with repo_lock(cwd):
+        auto_merged = _auto_merge_conflicts(cwd)
+    request = {
+        "cwd": str(cwd),
+        "workspace": _current_workspace_name(cwd),
+        "reason": reason,
+    }
+    response = group.submit(
+        taskman_state_dir(cwd) / GROUP_QUEUE_DIR,
+        request,
+        window,
+        _sync_group,
+        timeout=DEFAULT_LOCK_TIMEOUT,
+    )
+    return SyncResult(**{**response, "auto_merged": auto_merged})
 
-    return "\n".join(sections).rstrip()
+
+def _working_copy_parents(workspaces: list[str], cwd: Path) -> dict[str, tuple[str, str]]:
+    """Map workspace name -> (change id, commit id) of the parent of its @."""
+    revset = " | ".join(f"present({ws}@)" for ws in workspaces)
+    _, out, _ = run_jj(
+        [
+            "--ignore-working-copy", "log", "--no-graph", "-r", revset, "-T",
+            'self.working_copies().map(|wc| wc.name()).join(",") ++ "\\t"'
+            ' ++ parents.map(|c| c.change_id().short()).join(",") ++ "\\t"'
+            ' ++ parents.map(|c| c.commit_id()).join(",") ++ "\\n"',
+        ],
+        cwd,
+    )
+    parents: dict[str, tuple[str, str]] = {}
+    for line in out.splitlines():
+        names, change, commit = (line.split("\t") + ["", ""])[:3]
+        for name in names.split(","):
+            if name:
+                parents[name] = (change.split(",")[0], commit.split(",")[0])
+    return parents
 
 
-def history_batch(file: str, start_rev: str, end_rev: str = "@") -> str:
-    """Fetch file content at all revisions in range.
+def _sync_group(requests: list[dict]) -> list[dict]:
+    """Run a batch of queued sync requests in one locked pass.
 
-    1. Get revisions (same as history_diffs)
-    2. For each: jj file show -r {rev} {file}
-    3. Concatenate with === {rev} === headers
+    Each workspace gets a single `jj commit` (snapshot, describe and new in
+    one operation). One read maps every workspace to its new revision, and
+    bookmark moves skip the working-copy snapshot. That is about 2
+    operations per sync instead of 4-5, under one lock acquisition for the
+    whole batch.
+    """
+    # All workspaces share one repo, so any of them can run repo-level commands.
+    leader_cwd = Path(requests[0]["cwd"])
+    responses: dict[str, dict] = {}
+    with repo_lock(leader_cwd):
+        started = time.time()
+        committed = []
+        for req in requests:
+            try:
+                run_jj(["commit", "-m", req["reason"]], Path(req["cwd"]))
+                committed.append(req)
+            except RuntimeError as e:
+                responses[req["id"]] = {"error": str(e)}
+
+        revs = _working_copy_parents([r["workspace"] for r in committed], leader_cwd) if committed else {}
+        for req in committed:
+            workspace = req["workspace"]
+            if workspace not in revs:
+                responses[req["id"]] = {"error": f"workspace {workspace} not found after commit"}
+                continue
+            rev, commit = revs[workspace]
+            try:
+                run_jj(["--ignore-working-copy", "bookmark", "set", workspace, "-r", commit], leader_cwd)
+                bookmark = "moved"
+            except RuntimeError:
+                try:
+                    run_jj(["--ignore-working-copy", "bookmark", "create", workspace, "-r", commit], leader_cwd)
+                    bookmark = "created"
+                except RuntimeError:
+                    bookmark = "failed"
+            responses[req["id"]] = SyncResult(
+                rev=rev,
+                workspace=workspace,
+                bookmark=bookmark,
+                lock_wait=max(0.0, started - req["queued"]),
+                group=len(requests),
+            ).to_dict()
+    return [responses[req["id"]] for req in requests]
+
+
+def _encode_cursor(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, tool: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as exc:
+        raise ValueError(f"invalid cursor for {tool}") from exc
+    if not isinstance(state, dict) or state.get("tool") != tool:
+        raise ValueError(f"invalid cursor for {tool}")
+    return state
+
+
+# Values larger than this (serialized) are left out of a cut section's data.
+_HEAD_VALUE_BYTES = 256
+
+
+def _section_bytes(section: Section) -> int:
+    """What a section adds to a response: its text plus its structured data.
+
+    MCP tools return both (TextContent and structuredContent), so both
+    count against max_bytes.
+    """
+    data = json.dumps(section.data, separators=(",", ":"))
+    return len(section.text.encode()) + len(data.encode()) + 1
+
+
+def _section_head(data: dict) -> dict:
+    """The small fields of a section's data (ids, paths, counts)."""
+    return {
+        key: value for key, value in data.items()
+        if len(json.dumps(value, separators=(",", ":"))) <= _HEAD_VALUE_BYTES
+    }
+
+
+def _cut_text(text: str, room: int) -> tuple[str, int]:
+    """The part of text that fits in room bytes, and how many characters it covers.
+
+    Cuts after the last whole line when there is one; the newline at the
+    cut is consumed, so pages joined with newlines give back the text.
+    Always covers at least one character.
+    """
+    prefix = text.encode()[:max(room, 0)].decode(errors="ignore") or text[:1]
+    if len(prefix) == len(text):
+        return text, len(text)
+    cut = prefix.rfind("\n")
+    if cut > 0:
+        return prefix[:cut], cut + 1
+    return prefix, len(prefix)
+
+
+def _paginate(
+    sections: Iterator[Section],
+    max_bytes: int | None,
+    start: int,
+    make_cursor: Callable[[int], dict],
+    offset: int = 0,
+) -> HistoryResult:
+    """Collect sections until max_bytes is reached, then attach a resume cursor.
+
+    `start` is the index of the first section in the overall result, so the
+    cursor records where the next page begins; `make_cursor(index)` returns
+    the tool's cursor state for it. Sections are consumed lazily: nothing
+    past the first section that does not fit is computed. A section costs
+    its text plus its serialized data (see _section_bytes).
+
+    A single section larger than the whole budget is cut at a line
+    boundary, and the cursor records the character `offset` into its text
+    so the next page resumes inside it. A cut or resumed section keeps only
+    the small fields of its data (_section_head), plus `offset` and
+    `truncated`. `offset` here applies to the first section produced.
+    A generator's return value becomes the page message when it yields nothing.
+    """
+    page = HistoryResult(max_bytes=max_bytes)
+    used = 0
+    index = start
+    while True:
+        try:
+            section = next(sections)
+        except StopIteration as stop:
+            page.message = stop.value or ""
+            break
+        head = None
+        if offset:
+            head = {**_section_head(section.data), "offset": offset}
+            section = Section(section.text[offset:], head)
+        size = _section_bytes(section)
+        if max_bytes is not None and used + size > max_bytes:
+            state = make_cursor(index)
+            if page.sections:
+                page.cursor = _encode_cursor(state)
+                break
+            head = {**(head or _section_head(section.data)), "truncated": True}
+            room = max_bytes - _section_bytes(Section("", head))
+            text, covered = _cut_text(section.text, room)
+            page.sections.append(Section(text, head))
+            if covered < len(section.text):
+                page.cursor = _encode_cursor({**state, "offset": offset + covered})
+                break
+            # The text fit once the large data was left out; go on to the next.
+            section = page.sections[-1]
+            size = _section_bytes(section)
+        else:
+            page.sections.append(section)
+        used += size
+        index += 1
+        offset = 0
+    # Release what an unfinished generator holds (subprocesses, pipes) now.
+    if hasattr(sections, "close"):
+        sections.close()
+    return page
+
+
+def _pinned_range(
+    start_rev: str,
+    end_rev: str,
+    cursor: str | None,
+    tool: str,
+    cwd: Path,
+    since: str | None = None,
+    until: str | None = None,
+) -> tuple[list[tuple[str, str]], dict, int]:
+    """Resolve a history range, pinned to commit ids for later pages.
+
+    The first page records the oldest and newest commit of the range, so
+    follow-up pages see the same revisions even after new checkpoints.
+    since/until (see timeline.parse_time) keep only commits made in that
+    window, looked up in the timeline index; the parsed bounds are pinned
+    too. Returns (revs, pinned state, index of the first section to produce).
+    """
+    if cursor is not None:
+        state = _decode_cursor(cursor, tool)
+        start_rev, end_rev, skip = state["start"], state["end"], state["next"]
+        window = state.get("since"), state.get("until")
+    else:
+        skip = 0
+        window = (
+            parse_time(since) if since else None,
+            parse_time(until) if until else None,
+        )
+    revs = _rev_commit_list(start_rev, end_rev, cwd)
+    if window != (None, None):
+        made = commits_between(cwd, *window)
+        revs = [(change, commit) for change, commit in revs if commit in made]
+    pinned = {}
+    if revs:
+        pinned = {"tool": tool, "start": revs[-1][1], "end": revs[0][1]}
+        if window != (None, None):
+            pinned.update(since=window[0], until=window[1])
+    return revs, pinned, skip
+
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+# `R dir/{old => new}` lines in `jj log --summary`
+_SUMMARY_RENAME_RE = re.compile(r"^(.*)\{(.*) => (.*)\}(.*)$")
+
+
+def _path_args(file: str | list[str]) -> list[str]:
+    return [file] if isinstance(file, str) else list(file)
+
+
+def _glob_pattern(path: str) -> str | None:
+    """The glob in a path argument (bare, glob: or root-glob:), else None."""
+    kind, sep, rest = path.partition(":")
+    if sep and kind in ("glob", "root-glob"):
+        return rest.strip('"')
+    if not sep and _GLOB_CHARS.search(path):
+        return path
+    return None
+
+
+def _plain_path(path: str) -> str:
+    kind, sep, rest = path.partition(":")
+    if sep and kind in ("file", "root-file", "cwd", "root"):
+        return rest.strip('"')
+    return path
+
+
+def _layout_globs(pattern: str) -> list[str]:
+    """The glob plus its sharded-layout twin for task files directly in tasks/.
+
+    `tasks/TASK_auth*.md` also becomes `tasks/??/TASK_auth*.md`, so a glob
+    finds tasks in either layout (a range can span a reshard).
+    """
+    parent, _, name = pattern.rpartition("/")
+    if parent != tasks.TASKS_DIR or "**" in name:
+        return [pattern]
+    return [pattern, f"{parent}/{'?' * tasks.PREFIX_LEN}/{name}"]
+
+
+def _fileset(path: str) -> str:
+    """jj fileset for a path argument; globs become glob:"..." (see _layout_globs)."""
+    pattern = _glob_pattern(path)
+    if pattern is None:
+        return path
+    kind = "root-glob" if path.startswith("root-glob:") else "glob"
+    return " | ".join(
+        f'{kind}:"{_escape_revset_value(glob)}"' for glob in _layout_globs(pattern)
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _glob_regex(pattern: str) -> re.Pattern:
+    """Translate a path glob (see _glob_match) to a regex for fullmatch."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        at_start = i == 0 or pattern[i - 1] == "/"
+        if at_start and pattern.startswith("**/", i):
+            out.append("(?:[^/]*/)*")
+            i += 3
+        elif at_start and pattern[i:] == "**":
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 2)) != -1:
+            stuff = pattern[i + 1:end].replace("\\", "\\\\")
+            if stuff[0] == "!":
+                stuff = "^/" + stuff[1:]
+            elif stuff[0] == "^":
+                stuff = "\\" + stuff
+            out.append(f"[{stuff}]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out))
+
+
+def _glob_match(pattern: str, path: str) -> bool:
+    """Match like jj globs: `*`, `?` and `[...]` stay within one path
+    component; `**` as a whole component matches any number of directories.
+    """
+    return _glob_regex(pattern).fullmatch(path) is not None
+
+
+def _expand_paths(args: list[str], revs: list[tuple[str, str]], cwd: Path) -> list[str]:
+    """Resolve path arguments to concrete paths present anywhere in revs.
+
+    Plain paths are kept as given. Globs are matched against every file
+    present at any revision, read from the git store in-process (shared
+    subtrees are walked once). Without it: the files at the oldest revision
+    plus every path changed in the range (two jj calls).
+    """
+    globs = [
+        glob for g in map(_glob_pattern, args) if g is not None for glob in _layout_globs(g)
+    ]
+    paths = [_plain_path(a) for a in args if _glob_pattern(a) is None]
+    if not globs:
+        return paths
+    present = None
+    store = _git_store(find_git_dir(cwd))
+    if store is not None:
+        try:
+            present = store.paths([commit for _, commit in revs])
+        except (LookupError, ValueError, OSError):
+            present = None
+    if present is None:
+        present = _changed_paths(revs, cwd)
+    for path in sorted(present):
+        if path not in paths and any(_glob_match(g, path) for g in globs):
+            paths.append(path)
+    return paths
+
+
+def _changed_paths(revs: list[tuple[str, str]], cwd: Path) -> set[str]:
+    """Files at the oldest revision plus every path changed up to the newest."""
+    oldest, newest = revs[-1][1], revs[0][1]
+    _, listed, _ = run_jj(["--ignore-working-copy", "file", "list", "-r", oldest], cwd)
+    _, summary, _ = run_jj(
+        [
+            "--ignore-working-copy", "log", "--no-graph", "-r", f"{oldest}::{newest}",
+            "-T", '""', "--summary",
+        ],
+        cwd,
+    )
+    present = set(listed.splitlines())
+    for line in summary.splitlines():
+        _, _, name = line.partition(" ")
+        m = _SUMMARY_RENAME_RE.match(name)
+        if m:
+            present.add(f"{m.group(1)}{m.group(2)}{m.group(4)}".replace("//", "/"))
+            present.add(f"{m.group(1)}{m.group(3)}{m.group(4)}".replace("//", "/"))
+        elif name:
+            present.add(name)
+    return present
+
+
+def _diffs_sections(
+    revs: list[tuple[str, str]], file: str | list[str], cwd: Path
+) -> Iterator[Section]:
+    filesets = [_fileset(p) for p in _path_args(file)]
+    for change, commit in revs:
+        _, out, _ = run_jj(["diff", "--git", "-r", commit, "--", *filesets], cwd)
+        diffs = _split_git_diff(out)
+        header = f"=== {change} === {', '.join(diffs)}".rstrip()
+        yield Section(
+            text=f"{header}\n{out.rstrip()}",
+            data={
+                "rev": change, "commit": commit, "file": file,
+                "paths": list(diffs), "diffs": diffs,
+            },
+        )
+
+
+def iter_history_diffs(
+    file: str | list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    since: str | None = None,
+    until: str | None = None,
+) -> Generator[Section, None, str]:
+    """Yield history_diffs sections one revision at a time.
+
+    Each section is produced only when asked for, so the first revision can
+    be printed before later diffs are computed. Returns (as the generator's
+    return value) the message to show when nothing was yielded.
     """
     cwd = _agent_files_cwd()
-    revs = _rev_list(start_rev, end_rev, cwd)
+    revs, _, _ = _pinned_range(start_rev, end_rev, None, "history_diffs", cwd, since, until)
     if not revs:
         return "No revisions found in range."
+    yield from _diffs_sections(revs, file, cwd)
+    return ""
+
+
+def history_diffs(
+    file: str | list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    max_bytes: int | None = None,
+    cursor: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> HistoryResult:
+    """Get all diffs for one or more paths across revision range.
+
+    `file` is a path, a glob (`tasks/TASK_auth*.md`) or a jj fileset, or a
+    list of them. In globs `*` stays within a directory and `**` crosses
+    directories; a glob for task files directly in tasks/ also matches
+    them under the sharded layout (tasks/<prefix>/).
+
+    1. Get revisions once: jj log --no-graph -r "{start}::{end}"
+    2. For each: jj diff --git -r {rev} -- {paths...} (all paths in one call)
+    3. Group by revision: === {rev} === {changed paths}, then their diffs
+
+    since/until (`2026-01-02`, `yesterday`, `6h`) keep only revisions made
+    in that window. With max_bytes, output stops at the budget and ends
+    with a cursor; pass it back as `cursor` to continue at the next revision.
+    """
+    cwd = _agent_files_cwd()
+    offset = 0
+    if cursor is not None:
+        state = _decode_cursor(cursor, "history_diffs")
+        file, offset = state["file"], state.get("offset", 0)
+    revs, pinned, skip = _pinned_range(
+        start_rev, end_rev, cursor, "history_diffs", cwd, since, until
+    )
+    if not revs:
+        return HistoryResult(message="No revisions found in range.")
+    return _paginate(
+        _diffs_sections(revs[skip:], file, cwd), max_bytes, skip,
+        lambda i: {**pinned, "file": file, "next": i}, offset,
+    )
 
-    sections: list[str] = []
-    for rev in revs:
-        try:
-            _, out, _ = run_jj(["file", "show", "-r", rev, file], cwd)
-        except RuntimeError as exc:
-            if "no such path" in str(exc).lower():
-                sections.append(f"=== {rev} ===")
-                sections.append("(file does not exist at this revision)")
+
+class _BlobReader:
+    """Reads files one revision at a time, for history_batch.
+
+    Uses the in-process git store when it can; otherwise a long-lived
+    `git cat-file` pair (process.Pipe, so timeouts and cancellation apply):
+    `--batch-check` resolves `<commit>:<path>` to a blob id and `--batch`
+    fetches contents. Either way a blob unchanged since the previous
+    revision is not read again, and memory holds one revision's files
+    instead of a whole range. One spec is in flight at a time, so neither
+    pipe can fill up.
+    """
+
+    def __init__(self, git_dir: Path) -> None:
+        self._git_dir = git_dir
+        self._store = _git_store(git_dir)
+        self._check: process.Pipe | None = None
+        self._batch: process.Pipe | None = None
+        # path -> (blob id, content) at the previously read revision
+        self._last: dict[str, tuple[str, str]] = {}
+
+    def _start(self) -> None:
+        base = ["git", "--git-dir", str(self._git_dir), "cat-file"]
+        self._check = process.Pipe([*base, "--batch-check"])
+        self._batch = process.Pipe([*base, "--batch"])
+
+    @staticmethod
+    def _ask(pipe: process.Pipe, request: str) -> bytes:
+        pipe.send(request.encode() + b"\n")
+        return pipe.readline()
+
+    def _blob_id(self, commit: str, path: str) -> str | None:
+        if self._store is not None:
+            try:
+                return self._store.blob_id(commit, path)
+            except (LookupError, ValueError, OSError):
+                self._store = None
+        if self._check is None:
+            self._start()
+        parts = self._ask(self._check, f"{commit}:{path}").split()
+        if len(parts) != 3 or parts[1] != b"blob":
+            return None
+        return parts[0].decode()
+
+    def _content(self, blob: str) -> str:
+        if self._store is not None:
+            try:
+                return self._store.blob(blob).decode("utf-8", errors="replace")
+            except (LookupError, ValueError, OSError):
+                self._store = None
+        if self._batch is None:
+            self._start()
+        size = int(self._ask(self._batch, blob).split()[2])
+        return self._batch.read(size + 1)[:size].decode("utf-8", errors="replace")
+
+    def read(self, commit: str, path: str) -> str | None:
+        """Content of path at commit, or None if it is not a file there."""
+        blob = self._blob_id(commit, path)
+        if blob is None:
+            self._last.pop(path, None)
+            return None
+        last = self._last.get(path)
+        if last is not None and last[0] == blob:
+            return last[1]
+        content = self._content(blob)
+        self._last[path] = (blob, content)
+        return content
+
+    def close(self) -> None:
+        for pipe in (self._check, self._batch):
+            if pipe is not None:
+                pipe.close()
+
+
+def _batch_sections(
+    revs: list[tuple[str, str]],
+    file: str | list[str],
+    all_revs: list[tuple[str, str]],
+    cwd: Path,
+) -> Generator[Section, None, str]:
+    args = _path_args(file)
+    single = isinstance(file, str) and _glob_pattern(file) is None
+    paths = _expand_paths(args, all_revs, cwd)
+    if not paths:
+        return f"No files matching {', '.join(args)} in range."
+    reader = _BlobReader(find_git_dir(cwd))
+    try:
+        for change, commit in revs:
+            files = []
+            for path in paths:
+                content = reader.read(commit, path)
+                files.append({"file": path, "exists": content is not None, "content": content})
+            if single:
+                entry = files[0]
+                body = (
+                    entry["content"].rstrip() if entry["exists"]
+                    else "(file does not exist at this revision)"
+                )
+                yield Section(
+                    text=f"=== {change} ===\n{body}",
+                    data={"rev": change, "commit": commit, **entry},
+                )
                 continue
-            raise
-        sections.append(f"=== {rev} ===")
-        sections.append(out.rstrip())
+            lines = [f"=== {change} ==="]
+            for entry in files:
+                if entry["exists"]:
+                    lines.append(f"--- {entry['file']} ---\n{entry['content'].rstrip()}")
+                else:
+                    lines.append(f"--- {entry['file']} --- (does not exist at this revision)")
+            yield Section(
+                text="\n".join(lines),
+                data={"rev": change, "commit": commit, "files": files},
+            )
+    finally:
+        reader.close()
+    return ""
+
+
+def iter_history_batch(
+    file: str | list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    since: str | None = None,
+    until: str | None = None,
+) -> Generator[Section, None, str]:
+    """Yield history_batch sections one revision at a time.
+
+    Files are read from the git store as each revision is reached, so
+    memory is bounded by one section. Returns the empty-range message.
+    """
+    cwd = _agent_files_cwd()
+    revs, _, _ = _pinned_range(start_rev, end_rev, None, "history_batch", cwd, since, until)
+    if not revs:
+        return "No revisions found in range."
+    return (yield from _batch_sections(revs, file, revs, cwd))
+
+
+def history_batch(
+    file: str | list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    max_bytes: int | None = None,
+    cursor: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> HistoryResult:
+    """Fetch content of one or more paths at all revisions in range.
+
+    `file` is a path or glob (`tasks/TASK_auth*.md`), or a list of them.
+    Globs work as in history_diffs (`**`, both task layouts).
+
+    1. Get revisions once (same as history_diffs)
+    2. Expand globs against the paths present in the range
+    3. Read each rev:path from the git store in-process (gitstore), or
+       through one long-lived `git cat-file` pair; unchanged blobs are not
+       fetched again
+    4. Group by revision: === {rev} ===, then --- {path} --- per path
+
+    A single plain path keeps the one-file layout (no path headers).
+    Supports since/until and max_bytes/cursor like history_diffs.
+    """
+    cwd = _agent_files_cwd()
+    offset = 0
+    if cursor is not None:
+        state = _decode_cursor(cursor, "history_batch")
+        file, offset = state["file"], state.get("offset", 0)
+    revs, pinned, skip = _pinned_range(
+        start_rev, end_rev, cursor, "history_batch", cwd, since, until
+    )
+    if not revs:
+        return HistoryResult(message="No revisions found in range.")
+    return _paginate(
+        _batch_sections(revs[skip:], file, revs, cwd), max_bytes, skip,
+        lambda i: {**pinned, "file": file, "next": i}, offset,
+    )
+
+
+_SEARCH_TEMPLATE = (
+    'change_id.short() ++ "\\t" ++ commit_id ++ "\\t" ++ '
+    'committer.timestamp().format("%Y-%m-%d %H:%M") ++ "\\t" ++ '
+    'description.first_line() ++ "\\n"'
+)
+
+
+def _search_args(pattern: str, file: str | None, limit: int) -> list[str]:
+    escaped_pattern = _escape_revset_value(pattern)
+    if file is None:
+        revset = f'diff_contains("{escaped_pattern}")'
+    else:
+        escaped_file = _escape_revset_value(file)
+        revset = f'diff_contains("{escaped_pattern}", "{escaped_file}")'
+    return [
+        "log", "--no-graph", "-r", revset, "--limit", str(limit),
+        "-T", _SEARCH_TEMPLATE,
+    ]
+
+
+def _search_sections(lines: Iterable[str]) -> Iterator[Section]:
+    for line in lines:
+        parts = line.rstrip("\n").split("\t", 3)
+        if len(parts) == 4:
+            change, commit, timestamp, description = parts
+            # Full commit id in data (and so in the cursor), short in text.
+            yield Section(
+                text=f"{change} {commit[:12]} {timestamp} {description}".rstrip(),
+                data={
+                    "rev": change,
+                    "commit": commit,
+                    "timestamp": timestamp,
+                    "description": description,
+                },
+            )
+
+
+def iter_history_search(
+    pattern: str, file: str | None = None, limit: int = 20
+) -> Generator[Section, None, str]:
+    """Yield history_search matches as jj finds them.
 
-    return "\n".join(sections).rstrip()
+    jj's stdout is read line by line, so the newest match is available
+    while older history is still being scanned.
+    """
+    cwd = _agent_files_cwd()
+    yield from _search_sections(iter_jj_lines(_search_args(pattern, file, limit), cwd))
+    return ""
 
 
-def history_search(pattern: str, file: str | None = None, limit: int = 20) -> str:
+def history_search(
+    pattern: str,
+    file: str | None = None,
+    limit: int = 20,
+    max_bytes: int | None = None,
+    cursor: str | None = None,
+) -> HistoryResult:
     """Search history for pattern in diffs using jj's diff_contains().
 
     Uses: jj log -r 'diff_contains("{pattern}")' --limit {limit}
     Or with file: jj log -r 'diff_contains("{pattern}", "{file}")' --limit {limit}
 
-    Supports jj pattern syntax: exact:, glob:, regex:, substring:
+    Supports jj pattern syntax: exact:, glob:, regex:, substring:. A bare
+    pattern is passed to jj as is, so it uses the installed jj's default
+    kind (substring in older releases, glob in newer ones); prefix it to
+    be explicit.
     Examples:
-      history_search("TODO")                    # glob (default)
+      history_search("substring:TODO")          # substring
       history_search("regex:fix.*bug")          # regex
       history_search("exact:FIXME", "src/")     # exact match in src/
 
-    Returns: Matching revisions with commit info
+    Returns: One line per matching revision (change, commit, time, description).
+    With max_bytes, the cursor carries the remaining matches, so later
+    pages do not re-run the search.
     """
     cwd = _agent_files_cwd()
-    escaped_pattern = _escape_revset_value(pattern)
-    if file is None:
-        revset = f'diff_contains("{escaped_pattern}")'
+    offset = 0
+    if cursor is not None:
+        state = _decode_cursor(cursor, "history_search")
+        remaining, offset = state["revs"], state.get("offset", 0)
+        args = ["log", "--no-graph", "-r", " | ".join(remaining), "-T", _SEARCH_TEMPLATE]
     else:
-        escaped_file = _escape_revset_value(file)
-        revset = f'diff_contains("{escaped_pattern}", "{escaped_file}")'
-    _, out, _ = run_jj(["log", "-r", revset, "--limit", str(limit)], cwd)
-    return out.rstrip()
+        args = _search_args(pattern, file, limit)
+    _, out, _ = run_jj(args, cwd)
+    entries = list(_search_sections(out.splitlines()))
+
+    def make_cursor(i: int) -> dict:
+        return {
+            "tool": "history_search",
+            "revs": [entry.data["commit"] for entry in entries[i:]],
+        }
+
+    return _paginate(iter(entries), max_bytes, 0, make_cursor, offset)
+
+
+def _compile_line_pattern(pattern: str) -> re.Pattern:
+    """Compile a jj-style string pattern for matching single lines.
+
+    Takes jj's prefixes, but a bare pattern is always a substring match,
+    whatever the installed jj's default (glob in newer releases).
+    substring: and regex: search within the line; exact: and glob: must
+    match the whole line.
+    """
+    kind, sep, value = pattern.partition(":")
+    if not sep or kind not in {"substring", "exact", "glob", "regex"}:
+        kind, value = "substring", pattern
+    if kind == "regex":
+        return re.compile(value)
+    if kind == "exact":
+        return re.compile(r"\A" + re.escape(value) + r"\Z")
+    if kind == "glob":
+        return re.compile(r"\A" + fnmatch.translate(value))
+    return re.compile(re.escape(value))
+
+
+def _git_store(git_dir: Path) -> gitstore.GitStore | None:
+    """The in-process object reader, or None to go through git.
+
+    TASKMAN_GITSTORE=0 turns it off.
+    """
+    if os.environ.get("TASKMAN_GITSTORE") == "0":
+        return None
+    try:
+        return gitstore.open_store(git_dir)
+    except (ValueError, OSError):
+        return None
+
+
+def _blob_ids(git_dir: Path, specs: list[str]) -> list[str | None]:
+    """Resolve `<commit>:<path>` specs to blob ids.
+
+    Read in-process from the git store; on anything it cannot read, with
+    one `git cat-file --batch-check` process instead.
+    """
+    if not specs:
+        return []
+    store = _git_store(git_dir)
+    if store is not None:
+        try:
+            return [store.blob_id(*spec.split(":", 1)) for spec in specs]
+        except (LookupError, ValueError, OSError):
+            pass
+    _, out, _ = _run_cmd_check(
+        ["git", "--git-dir", str(git_dir), "cat-file", "--batch-check"],
+        input="\n".join(specs) + "\n",
+    )
+    ids: list[str | None] = []
+    for line in out.splitlines():
+        parts = line.split()
+        ids.append(parts[0] if len(parts) == 3 and parts[1] == "blob" else None)
+    return ids
+
+
+def _read_blobs(git_dir: Path, blobs: list[str]) -> dict[str, str]:
+    """Fetch blob contents, in-process or with one `git cat-file --batch`."""
+    if not blobs:
+        return {}
+    store = _git_store(git_dir)
+    if store is not None:
+        try:
+            return {
+                blob: store.blob(blob).decode("utf-8", errors="replace") for blob in blobs
+            }
+        except (LookupError, ValueError, OSError):
+            pass
+    code, data, err = process.run(
+        ["git", "--git-dir", str(git_dir), "cat-file", "--batch"],
+        input="\n".join(blobs) + "\n",
+        binary=True,
+    )
+    if code != 0:
+        raise RuntimeError(f"git cat-file failed ({code}): {err}")
+    contents: dict[str, str] = {}
+    pos = 0
+    for blob in blobs:
+        header_end = data.index(b"\n", pos)
+        size = int(data[pos:header_end].split()[2])
+        body = data[header_end + 1:header_end + 1 + size]
+        pos = header_end + 1 + size + 1
+        contents[blob] = body.decode("utf-8", errors="replace")
+    return contents
+
+
+def _grep_blobs(
+    git_dir: Path, blobs: list[str], matcher: re.Pattern
+) -> dict[str, list[tuple[int, str]]]:
+    """Scan blobs fetched in one batch and return their matching lines."""
+    matches: dict[str, list[tuple[int, str]]] = {}
+    for blob, text in _read_blobs(git_dir, blobs).items():
+        found = [
+            (lineno, line)
+            for lineno, line in enumerate(text.splitlines(), 1)
+            if matcher.search(line)
+        ]
+        if found:
+            matches[blob] = found
+    return matches
+
+
+def history_grep(
+    pattern: str,
+    paths: list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    max_bytes: int | None = None,
+    cursor: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> HistoryResult:
+    """Find matching lines in every version of paths across a revision range.
+
+    1. Resolve the range to (change_id, commit_id) pairs with one jj query
+    2. Map every commit:path to its blob id, in-process from the git store
+    3. Scan each distinct blob once, in parallel chunks
+    4. Report matching lines, grouping revisions that share a blob
+
+    Patterns take jj's prefixes (substring:, exact:, glob:, regex:), but a
+    bare pattern is always a substring match, unlike history_search where
+    it follows jj's default. since/until filter revisions as in history_diffs. The
+    (path, blob) groups have a fixed order for a pinned range (paths as
+    given, then newest revision first), so with max_bytes the cursor is
+    just a position in that order and later pages rescan only the blobs
+    from there on.
+    """
+    cwd = _agent_files_cwd()
+    skip = offset = 0
+    if cursor is not None:
+        state = _decode_cursor(cursor, "history_grep")
+        pattern, paths, skip = state["pattern"], state["paths"], state["next"]
+        offset = state.get("offset", 0)
+    matcher = _compile_line_pattern(pattern)
+    revs, pinned, _ = _pinned_range(
+        start_rev, end_rev, cursor, "history_grep", cwd, since, until
+    )
+    if not revs:
+        return HistoryResult(message="No revisions found in range.")
+
+    git_dir = find_git_dir(cwd)
+    specs = [(change, commit, path) for change, commit in revs for path in paths]
+    blob_ids = _blob_ids(git_dir, [f"{commit}:{path}" for _, commit, path in specs])
+
+    # (path, blob) -> revisions holding that exact content, newest first
+    versions: dict[tuple[str, str], list[str]] = {}
+    for (change, _, path), blob in zip(specs, blob_ids):
+        if blob is not None:
+            versions.setdefault((path, blob), []).append(change)
+    order = [key for path in dict.fromkeys(paths) for key in versions if key[0] == path]
+    versions = {key: versions[key] for key in order[skip:]}
+
+    unique = sorted({blob for _, blob in versions})
+    workers = min(8, os.cpu_count() or 1, len(unique)) or 1
+    chunks = [unique[i::workers] for i in range(workers)]
+    matches: dict[str, list[tuple[int, str]]] = {}
+    scan = process.in_caller_context(lambda chunk: _grep_blobs(git_dir, chunk, matcher))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for found in pool.map(scan, chunks):
+            matches.update(found)
+
+    # (position in the group order, path, blob, revisions)
+    groups = [
+        (skip + i, path, blob, changes)
+        for i, ((path, blob), changes) in enumerate(versions.items())
+        if blob in matches
+    ]
+    if not groups:
+        return HistoryResult(message="No matches found.")
+
+    def sections() -> Iterator[Section]:
+        for _, path, blob, changes in groups:
+            lines = [f"{path} @ {', '.join(changes)}"]
+            lines.extend(f"  {lineno}: {text}" for lineno, text in matches[blob])
+            yield Section(
+                text="\n".join(lines),
+                data={
+                    "path": path,
+                    "revs": changes,
+                    "blob": blob,
+                    "matches": [
+                        {"line": lineno, "text": text} for lineno, text in matches[blob]
+                    ],
+                },
+            )
+
+    return _paginate(
+        sections(), max_bytes, 0,
+        lambda i: {**pinned, "pattern": pattern, "paths": paths, "next": groups[i][0]},
+        offset,
+    )
+
+
+_BLAME_CACHE_LIMIT = 200
+
+
+def _blame_cache_path(cwd: Path, file: str) -> Path:
+    digest = hashlib.sha1(file.encode()).hexdigest()[:16]
+    return taskman_state_dir(cwd) / "blame" / f"{digest}.json"
+
+
+# jj's root commit: the parent of the first commits, it holds no files.
+_ROOT_COMMIT = "0" * 40
+
+
+def _file_history(file: str, rev: str, cwd: Path) -> list[dict]:
+    """Commits in ::rev that touch file, plus merges, oldest first.
+
+    Merges are listed even when they leave the file as the auto-merge
+    made it, so every parent's content can be traced back to an entry.
+    """
+    escaped_file = _escape_revset_value(file)
+    template = (
+        'commit_id ++ "\\t" ++ change_id.short() ++ "\\t" ++ '
+        'parents.map(|p| p.commit_id()).join(",") ++ "\\t" ++ '
+        'committer.timestamp().format("%Y-%m-%d %H:%M") ++ "\\t" ++ '
+        'description.first_line() ++ "\\n"'
+    )
+    _, out, _ = run_jj(
+        [
+            "log", "--no-graph", "-r", f'::({rev}) & (files("{escaped_file}") | merges())',
+            "-T", template,
+        ],
+        cwd,
+    )
+    history = []
+    for line in out.splitlines():
+        parts = line.split("\t", 4)
+        if len(parts) == 5:
+            commit, change, parents, timestamp, description = parts
+            history.append({
+                "commit": commit,
+                "change": change,
+                "parents": [p for p in parents.split(",") if p and p != _ROOT_COMMIT],
+                "timestamp": timestamp,
+                "description": description,
+            })
+    history.reverse()
+    return history
+
+
+def _blame_lines(
+    history: list[dict],
+    blob_of: dict[str, str | None],
+    texts: dict[str, str],
+    cache: dict[str, list[str]],
+) -> list[str]:
+    """Attribute each line of the newest version to the commit that added it.
+
+    history is oldest first, each entry with its parents; blob_of maps
+    those commits and their parents to the file's blob (None = absent).
+    A line kept from any parent keeps that parent's origin, so lines
+    merged in from a parallel workspace branch stay with the commit that
+    wrote them; other lines go to the commit itself. A parent that did not
+    touch the file has the blob of an earlier entry, whose origins are
+    reused. Cached commits are not diffed again, and every commit visited
+    is written back into cache.
+    """
+    by_blob: dict[str, list[str]] = {}
+    origins: list[str] = []
+    for entry in history:
+        commit = entry["commit"]
+        blob = blob_of.get(commit)
+        if blob is None:
+            origins = []
+            continue
+        lines = texts[blob].splitlines()
+        cached = cache.pop(commit, None)
+        if cached is not None and len(cached) == len(lines):
+            origins = cached
+        else:
+            found: list[str | None] = [None] * len(lines)
+            for parent in entry["parents"]:
+                parent_blob = blob_of.get(parent)
+                if parent_blob is None or parent_blob not in by_blob:
+                    continue
+                parent_origins = by_blob[parent_blob]
+                matcher = difflib.SequenceMatcher(
+                    None, texts[parent_blob].splitlines(), lines, autojunk=False
+                )
+                for i, j, size in matcher.get_matching_blocks():
+                    for k in range(size):
+                        if found[j + k] is None:
+                            found[j + k] = parent_origins[i + k]
+            origins = [origin or commit for origin in found]
+        by_blob[blob] = origins
+        cache[commit] = origins
+    return origins
+
+
+def history_blame(
+    file: str,
+    rev: str = "@",
+    max_bytes: int | None = None,
+    cursor: str | None = None,
+) -> HistoryResult:
+    """Attribute each line of file at rev to the checkpoint that introduced it.
+
+    1. One jj query lists commits in ::rev touching file, plus merges,
+       with their parents and descriptions
+    2. All versions are read in-process from the git store
+    3. Origins are carried forward through line diffs against every
+       parent, oldest first, so merges of parallel workspace branches
+       keep each line's original commit
+    4. Per-commit results are cached, so later calls only diff new commits
+
+    Returns: legend of checkpoints, then `<rev> <lineno>| <line>` rows.
+    With max_bytes, the cursor pins the blamed commit and the next line;
+    resuming is served from the blame cache.
+    """
+    cwd = _agent_files_cwd()
+    skip = offset = 0
+    if cursor is not None:
+        state = _decode_cursor(cursor, "history_blame")
+        file, rev, skip = state["file"], state["rev"], state["next"]
+        offset = state.get("offset", 0)
+    history = _file_history(file, rev, cwd)
+    if not history:
+        return HistoryResult(message=f"No history found for {file}")
+
+    git_dir = find_git_dir(cwd)
+    commits = [h["commit"] for h in history]
+    listed = set(commits)
+    commits += sorted({p for h in history for p in h["parents"] if p not in listed})
+    blob_of = dict(zip(commits, _blob_ids(git_dir, [f"{c}:{file}" for c in commits])))
+    texts = _read_blobs(git_dir, sorted({b for b in blob_of.values() if b is not None}))
+
+    cache_path = _blame_cache_path(cwd, file)
+    cache: dict[str, list[str]] = _load_json(cache_path).get("blame", {})
+    origins = _blame_lines(history, blob_of, texts, cache)
+    # Keep the cache bounded: most recently written commits win.
+    if len(cache) > _BLAME_CACHE_LIMIT:
+        cache = dict(list(cache.items())[-_BLAME_CACHE_LIMIT:])
+    # Shared by every workspace: publish whole files only.
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    _replace_text(cache_path, json.dumps({"file": file, "blame": cache}))
+
+    if not origins:
+        return HistoryResult(message=f"{file} is empty at {rev}")
+
+    info = {h["commit"]: h for h in history}
+    used = set(origins)
+    legend = [h for h in history if h["commit"] in used]
+    width = len(str(len(origins)))
+    # Section 0 is the legend (plus a blank separator); section n is line n.
+    sections = [Section(
+        text="\n".join(
+            f"{h['change']} {h['timestamp']} {h['description']}".rstrip() for h in legend
+        ) + "\n",
+        data={
+            "legend": [
+                {k: h[k] for k in ("change", "commit", "timestamp", "description")}
+                for h in legend
+            ],
+        },
+    )]
+    newest = texts[blob_of[history[-1]["commit"]]].splitlines()
+    for lineno, (commit, text) in enumerate(zip(origins, newest), 1):
+        rev_id = info[commit]["change"]
+        sections.append(Section(
+            text=f"{rev_id} {lineno:>{width}}| {text}",
+            data={"line": lineno, "rev": rev_id, "text": text},
+        ))
+    return _paginate(
+        iter(sections[skip:]), max_bytes, skip,
+        lambda i: {
+            "tool": "history_blame",
+            "file": file,
+            "rev": history[-1]["commit"],
+            "next": i,
+        },
+        offset,
+    )
+
+
+# `Last handoff: <timestamp> (rev <id>)` in STATUS.md (see DESIGN.md)
+_HANDOFF_REV_RE = re.compile(r"Last handoff:[^\n]*?\(rev\s+([^\s)]+)\)", re.IGNORECASE)
+# `commit: <id>` in handoffs/HANDOFF_<slug>.md (see the handoff skill)
+_HANDOFF_COMMIT_RE = re.compile(r"^commit:\s*(\S+)", re.MULTILINE)
+_GIT_DIFF_FILE_RE = re.compile(r"^diff --git a/.* b/(.*)$", re.MULTILINE)
+
+
+def _handoff_revs(agent_slug: str, cwd: Path) -> list[str]:
+    """Revs recorded for agent_slug's last handoff, most specific first.
+
+    The handoff file's `commit:` field comes first, then STATUS.md
+    `Last handoff:` lines on a line or under a heading naming the slug.
+    A single unattributed `Last handoff:` line is used as a fallback.
+    """
+    revs = []
+    handoff = cwd / "handoffs" / f"HANDOFF_{agent_slug}.md"
+    if handoff.exists():
+        m = _HANDOFF_COMMIT_RE.search(handoff.read_text(encoding="utf-8", errors="replace"))
+        if m:
+            revs.append(m.group(1))
+    status = cwd / "STATUS.md"
+    if status.exists():
+        slug_re = re.compile(rf"(?<![\w-]){re.escape(agent_slug)}(?![\w-])")
+        heading = ""
+        others = []
+        for line in status.read_text(encoding="utf-8", errors="replace").splitlines():
+            if line.startswith("#"):
+                heading = line
+            m = _HANDOFF_REV_RE.search(line)
+            if not m:
+                continue
+            if slug_re.search(line) or slug_re.search(heading):
+                revs.append(m.group(1))
+            else:
+                others.append(m.group(1))
+        if len(set(others)) == 1:
+            revs.append(others[0])
+    return revs
+
+
+def _split_git_diff(diff: str) -> dict[str, str]:
+    """Split `jj diff --git` output into per-file chunks."""
+    starts = list(_GIT_DIFF_FILE_RE.finditer(diff))
+    return {
+        m.group(1): diff[m.start():starts[i + 1].start() if i + 1 < len(starts) else len(diff)]
+        for i, m in enumerate(starts)
+    }
+
+
+def _diff_stat(chunk: str) -> tuple[int, int]:
+    added = removed = 0
+    for line in chunk.splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return added, removed
+
+
+# Computed since_handoff results kept for cursor pages (newest files win).
+_HANDOFF_CACHE_LIMIT = 20
+
+
+def _handoff_cache_path(cwd: Path, base: str, heads: dict[str, str]) -> Path:
+    key = json.dumps([base, heads], sort_keys=True)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return taskman_state_dir(cwd) / "since-handoff" / f"{digest}.json"
+
+
+def _save_handoff_variants(path: Path, variants: list[list]) -> None:
+    # Shared by every workspace: publish whole files only, and keep a few.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _replace_text(path, json.dumps({"variants": variants}))
+    try:
+        cached = sorted(path.parent.glob("*.json"), key=lambda p: p.stat().st_mtime_ns)
+        for old in cached[:-_HANDOFF_CACHE_LIMIT]:
+            old.unlink(missing_ok=True)
+    except OSError:
+        pass  # another process pruned it first
+
+
+def _handoff_variants(base: str, heads: dict[str, str], cwd: Path) -> list[list]:
+    """[path, workspaces, added, removed, diff] per distinct net change, by path."""
+    commits = sorted(set(heads.values()))
+
+    def net_diff(commit: str) -> str:
+        _, out, _ = run_jj(
+            ["--ignore-working-copy", "diff", "--git", "--from", base, "--to", commit], cwd
+        )
+        return out
+
+    with ThreadPoolExecutor(max_workers=min(8, len(commits) or 1)) as pool:
+        diffs = dict(zip(commits, pool.map(process.in_caller_context(net_diff), commits)))
+
+    # file -> diff chunk -> workspaces with that net change
+    files: dict[str, dict[str, list[str]]] = {}
+    for name in sorted(heads):
+        for path, chunk in _split_git_diff(diffs[heads[name]]).items():
+            files.setdefault(path, {}).setdefault(chunk, []).append(name)
+    return [
+        [path, names, *_diff_stat(chunk), chunk]
+        for path in sorted(files)
+        for chunk, names in files[path].items()
+    ]
+
+
+def since_handoff(
+    agent_slug: str,
+    max_bytes: int | None = None,
+    cursor: str | None = None,
+) -> HistoryResult:
+    """Net per-file changes in every workspace since agent_slug's last handoff.
+
+    1. Find the handoff rev (handoffs/HANDOFF_<slug>.md `commit:`, else
+       STATUS.md `Last handoff: ... (rev <id>)`)
+    2. One `jj diff --from <rev> --to <ws>@ --git` per workspace, in parallel
+    3. Split per file; workspaces with the same net diff share one entry
+
+    Returns a stat summary, then one diff section per file (per variant
+    when workspaces disagree). The number of jj calls depends on the
+    number of workspaces, not files. max_bytes/cursor page like history_diffs.
+    The first page pins the handoff and workspace commits in the cursor and
+    keeps the computed diffs in .jj/repo/taskman, so later pages show the
+    same changes without running jj again.
+    """
+    cwd = _agent_files_cwd()
+    variants = None
+    if cursor is not None:
+        state = _decode_cursor(cursor, "since_handoff")
+        label, base, heads, skip = state["label"], state["base"], state["heads"], state["next"]
+        offset = state.get("offset", 0)
+        try:
+            variants = _load_json(_handoff_cache_path(cwd, base, heads))["variants"]
+        except (OSError, ValueError, KeyError):
+            variants = None
+    else:
+        skip = offset = 0
+        label = base = None
+        for rev in _handoff_revs(agent_slug, cwd):
+            try:
+                _, out, _ = run_jj(
+                    ["log", "--no-graph", "-r", rev, "-T", 'commit_id ++ "\\n"'], cwd
+                )
+            except RuntimeError:
+                # e.g. a main-repo git sha in the handoff file
+                continue
+            if out.strip():
+                label, base = rev, out.split()[0]
+                break
+        if base is None:
+            raise ValueError(
+                f"No handoff rev found for '{agent_slug}': expected `commit: <id>` in "
+                f"handoffs/HANDOFF_{agent_slug}.md or `Last handoff: <time> (rev <id>)` "
+                "in STATUS.md"
+            )
+        _, out, _ = run_jj(
+            [
+                "log", "--no-graph", "-r", "working_copies()", "-T",
+                'self.working_copies().map(|wc| wc.name()).join(",") ++ "\\t" ++ commit_id ++ "\\n"',
+            ],
+            cwd,
+        )
+        heads = {}
+        for line in out.splitlines():
+            names, _, commit = line.partition("\t")
+            for name in names.split(","):
+                if name:
+                    heads[name] = commit.strip()
+
+    computed = variants is None
+    if computed:
+        variants = _handoff_variants(base, heads, cwd)
+    if not variants:
+        return HistoryResult(message=f"No changes since handoff rev {label}.")
+
+    stats = [
+        {"file": path, "workspaces": names, "added": added, "removed": removed}
+        for path, names, added, removed, _ in variants
+    ]
+    files = {s["file"] for s in stats}
+    summary = [
+        f"since handoff rev {label} ({base[:12]}): {len(files)} file(s) across "
+        f"{len({n for s in stats for n in s['workspaces']})} workspace(s)"
+    ] + [
+        f"  {s['file']} +{s['added']} -{s['removed']} [{', '.join(s['workspaces'])}]"
+        for s in stats
+    ]
+    sections = [Section(
+        text="\n".join(summary) + "\n",
+        data={"base": base, "label": label, "files": stats},
+    )]
+    for path, names, added, removed, chunk in variants:
+        sections.append(Section(
+            text=f"=== {path} [{', '.join(names)}] +{added} -{removed} ===\n{chunk.rstrip()}",
+            data={
+                "file": path, "workspaces": names,
+                "added": added, "removed": removed, "diff": chunk,
+            },
+        ))
+    page = _paginate(
+        iter(sections[skip:]), max_bytes, skip,
+        lambda i: {"tool": "since_handoff", "label": label, "base": base, "heads": heads, "next": i},
+        offset,
+    )
+    if computed and page.cursor is not None:
+        _save_handoff_variants(_handoff_cache_path(cwd, base, heads), variants)
+    return page
 
 
 # Setup functions
 
-def init() -> str:
+def init() -> Message:
     """Create .agent-files/ as a jj workspace.
 
     1. jj git init .agent-files
@@ -238,7 +1643,7 @@ def init() -> str:
     # Start fresh working copy
     run_jj(["new"], agent_files)
 
-    return "Initialized .agent-files"
+    return Message("Initialized .agent-files")
 
 
 def _find_main_agent_files(start: Path | None = None) -> Path:
@@ -435,7 +1840,7 @@ def _is_inside(path: Path, target: Path) -> bool:
         return False
 
 
-def wt_list() -> str:
+def wt_list() -> WorktreeList:
     """List worktrees with health status.
 
     Cross-references git worktrees, jj workspaces, and jj bookmarks
@@ -452,42 +1857,31 @@ def wt_list() -> str:
     # Collect all names (excluding 'default' which is the main workspace)
     all_names = (set(git_wts.keys()) | set(jj_wss.keys())) - {"default"}
 
-    if not all_names:
-        return "No worktrees found"
-
-    lines = []
+    result = WorktreeList()
     for name in sorted(all_names):
         git = git_wts.get(name)
         jj_ws = jj_wss.get(name)
-        has_bm = name in jj_bms
-
-        status = []
 
         # Git worktree status
         if git:
-            if git.get("valid"):
-                status.append("git:ok")
-            else:
-                status.append("git:orphaned")
+            git_status = "ok" if git.get("valid") else "orphaned"
         else:
-            status.append("git:missing")
+            git_status = "missing"
 
         # jj workspace status
         if jj_ws:
-            if jj_ws.get("valid"):
-                status.append("jj-ws:ok")
-            else:
-                status.append("jj-ws:orphaned")
+            jj_status = "ok" if jj_ws.get("valid") else "orphaned"
         else:
-            status.append("jj-ws:missing")
-
-        # Bookmark status
-        if has_bm:
-            status.append("bm:exists")
+            jj_status = "missing"
 
-        lines.append(f"{name}: {' '.join(status)}")
+        result.worktrees.append(WorktreeStatus(
+            name=name,
+            git=git_status,
+            jj_workspace=jj_status,
+            bookmark=name in jj_bms,
+        ))
 
-    return "\n".join(lines)
+    return result
 
 
 def _has_conflicts(rev: str, agent_files: Path) -> bool:
@@ -502,7 +1896,95 @@ def _has_conflicts(rev: str, agent_files: Path) -> bool:
         return False
 
 
-def wt_rm(name: str, *, force: bool = False) -> str:
+_RESOLVE_LIST_RE = re.compile(r"^(.*?)\s+(\d+-sided conflict.*)$")
+
+
+def _conflicted_files(commit: str, cwd: Path) -> list[tuple[str, str]]:
+    """(path, kind) for each conflicted file in a revision."""
+    _, out, _ = run_jj(["--ignore-working-copy", "resolve", "--list", "-r", commit], cwd)
+    files = []
+    for line in out.splitlines():
+        m = _RESOLVE_LIST_RE.match(line.rstrip())
+        if m:
+            files.append((m.group(1), m.group(2)))
+    return files
+
+
+def _auto_merge_conflicts(cwd: Path) -> list[str]:
+    """Resolve conflicted files in @ that mdmerge knows how to merge.
+
+    Each file is read as materialized in the working copy, merged, written
+    back, and picked up by a snapshot. Files with overlapping edits keep
+    their conflict markers. Returns the resolved paths.
+    """
+    if not _has_conflicts("@", cwd):
+        return []
+    resolved = []
+    for path, _ in _conflicted_files("@", cwd):
+        target = cwd / path
+        try:
+            text = target.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        merged = mdmerge.merge_conflicted(path, text)
+        if merged is not None:
+            target.write_text(merged, encoding="utf-8")
+            resolved.append(path)
+    if resolved:
+        run_jj(["status"], cwd)
+    return resolved
+
+
+def conflicts() -> ConflictInventory:
+    """List every conflicted revision and file with parsed conflict regions.
+
+    A single `conflicts()` revset query finds the revisions, including the
+    working copies of all workspaces. Files are then listed and read in
+    parallel without re-snapshotting.
+    """
+    cwd = _agent_files_cwd()
+    _, out, _ = run_jj(
+        [
+            "log", "--no-graph", "-r", "conflicts()", "-T",
+            'change_id.short() ++ "\\t" ++ commit_id ++ "\\t"'
+            ' ++ self.working_copies().map(|wc| wc.name()).join(",") ++ "\\t"'
+            ' ++ description.first_line() ++ "\\n"',
+        ],
+        cwd,
+    )
+    inventory = ConflictInventory()
+    for line in out.splitlines():
+        change, commit, workspaces, description = (line.split("\t", 3) + ["", "", ""])[:4]
+        if commit:
+            inventory.revisions.append(ConflictedRevision(
+                change, commit, [ws for ws in workspaces.split(",") if ws], description,
+            ))
+    if not inventory.revisions:
+        return inventory
+
+    workers = min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        listed = pool.map(
+            process.in_caller_context(lambda rev: _conflicted_files(rev.commit, cwd)),
+            inventory.revisions,
+        )
+        for rev, files in zip(inventory.revisions, listed):
+            rev.files = [ConflictedFile(path, kind) for path, kind in files]
+
+        def regions(item: tuple[ConflictedRevision, ConflictedFile]) -> list[ConflictRegion]:
+            rev, f = item
+            _, text, _ = run_jj(
+                ["--ignore-working-copy", "file", "show", "-r", rev.commit, f.path], cwd
+            )
+            return parse_conflicts(text)
+
+        items = [(rev, f) for rev in inventory.revisions for f in rev.files]
+        for (_, f), found in zip(items, pool.map(process.in_caller_context(regions), items)):
+            f.regions = found
+    return inventory
+
+
+def wt_rm(name: str, *, force: bool = False) -> WorktreeRemoval:
     """Remove a git worktree and merge its jj workspace changes.
 
     Steps:
@@ -530,96 +2012,102 @@ def wt_rm(name: str, *, force: bool = False) -> str:
     if name == "default":
         raise ValueError("Cannot remove default workspace")
 
-    results = []
-    jj_wss = _parse_jj_workspaces(main_agent_files)
-    jj_bms = _parse_jj_bookmarks(main_agent_files)
+    with repo_lock(main_agent_files):
+        result = WorktreeRemoval(name=name, empty=f"Nothing to clean up for '{name}'")
+        results = result.steps
+        jj_wss = _parse_jj_workspaces(main_agent_files)
+        jj_bms = _parse_jj_bookmarks(main_agent_files)
 
-    # Describe workspace changes before removing
-    if name in jj_wss:
-        try:
-            run_jj(["describe", "-r", f"{name}@", "-m", f"wt-{name}"], main_agent_files)
-        except RuntimeError:
-            pass  # Best effort
-
-    # 1. Remove git worktree
-    git_wts = _parse_git_worktrees(main_repo)
-    if name in git_wts:
-        if git_wts[name].get("valid"):
-            cmd = ["git", "worktree", "remove"]
+        # Describe workspace changes before removing
+        if name in jj_wss:
+            try:
+                run_jj(["describe", "-r", f"{name}@", "-m", f"wt-{name}"], main_agent_files)
+            except RuntimeError:
+                pass  # Best effort
+
+        # 1. Remove git worktree
+        git_wts = _parse_git_worktrees(main_repo)
+        if name in git_wts:
+            if git_wts[name].get("valid"):
+                cmd = ["git", "worktree", "remove"]
+                if force:
+                    cmd.append("--force")
+                cmd.append(str(worktree_dir))
+                try:
+                    _run_cmd_check(cmd, cwd=main_repo)
+                    results.append(f"Removed git worktree worktrees/{name}/")
+                except RuntimeError as e:
+                    if "contains modified or untracked files" in str(e):
+                        raise ValueError(
+                            f"Worktree has uncommitted files. Use --force to remove anyway."
+                        ) from e
+                    raise
+            else:
+                # Worktree entry exists but path is gone - prune it
+                _run_cmd_check(["git", "worktree", "prune"], cwd=main_repo)
+                results.append(f"Pruned stale git worktree entry for {name}")
+        elif worktree_dir.exists():
+            # Directory exists but not a git worktree
             if force:
-                cmd.append("--force")
-            cmd.append(str(worktree_dir))
+                shutil.rmtree(worktree_dir)
+                results.append(f"Removed directory worktrees/{name}/ (was not a git worktree)")
+            else:
+                results.append(f"Warning: worktrees/{name}/ exists but is not a git worktree")
+
+        # 2. Forget jj workspace
+        if name in jj_wss:
             try:
-                _run_cmd_check(cmd, cwd=main_repo)
-                results.append(f"Removed git worktree worktrees/{name}/")
+                run_jj(["workspace", "forget", name], main_agent_files)
+                results.append(f"Forgot jj workspace '{name}'")
             except RuntimeError as e:
-                if "contains modified or untracked files" in str(e):
-                    raise ValueError(
-                        f"Worktree has uncommitted files. Use --force to remove anyway."
-                    ) from e
-                raise
-        else:
-            # Worktree entry exists but path is gone - prune it
-            _run_cmd_check(["git", "worktree", "prune"], cwd=main_repo)
-            results.append(f"Pruned stale git worktree entry for {name}")
-    elif worktree_dir.exists():
-        # Directory exists but not a git worktree
-        if force:
-            shutil.rmtree(worktree_dir)
-            results.append(f"Removed directory worktrees/{name}/ (was not a git worktree)")
-        else:
-            results.append(f"Warning: worktrees/{name}/ exists but is not a git worktree")
-
-    # 2. Forget jj workspace
-    if name in jj_wss:
-        try:
-            run_jj(["workspace", "forget", name], main_agent_files)
-            results.append(f"Forgot jj workspace '{name}'")
-        except RuntimeError as e:
-            results.append(f"Warning: failed to forget jj workspace: {e}")
-
-    # 3. Auto-merge changes into default workspace
-    if name in jj_bms:
-        try:
-            run_jj(["squash", "--from", name, "-m", f"merged wt-{name}"], main_agent_files)
-        except RuntimeError as e:
-            results.append(f"Warning: could not auto-merge: {e}")
-            results.append(f"Bookmark '{name}' retained - merge manually: jj squash --from {name}")
-            return "\n".join(results)
-        
-        # Check for conflicts
-        if _has_conflicts("@", main_agent_files):
-            raise ValueError(
-                f"MERGE CONFLICTS after squashing '{name}'!\n"
-                f"\n"
-                f"⚠️  DO NOT use --ours/--theirs blindly - you WILL lose accumulated knowledge.\n"
-                f"\n"
-                f"Resolution steps:\n"
-                f"  cd .agent-files\n"
-                f"  jj resolve              # or edit conflict markers manually\n"
-                f"  jj diff                 # verify result\n"
-                f"  jj bookmark delete {name}  # cleanup after resolving\n"
-                f"\n"
-                f"Guidelines by file type:\n"
-                f"  STATUS.md: merge task lists, keep all active tasks\n"
-                f"  MEDIUMTERM/LONGTERM_MEM.md: combine entries, dedupe, keep all learnings\n"
-                f"  HANDOFF_*.md: keep newer context, check older for unique info\n"
-                f"  TASK_*.md: merge attempt histories and checklists\n"
-                f"\n"
-                f"PRINCIPLE: Err on keeping information. Duplicates can be pruned later. Lost knowledge is gone forever."
-            )
-        
-        # Clean merge - delete bookmark
-        run_jj(["bookmark", "delete", name], main_agent_files)
-        results.append(f"✓ Merged changes from '{name}'")
-
-    if not results:
-        return f"Nothing to clean up for '{name}'"
+                results.append(f"Warning: failed to forget jj workspace: {e}")
 
-    return "\n".join(results)
-
-
-def wt_prune() -> str:
+        # 3. Auto-merge changes into default workspace
+        if name in jj_bms:
+            try:
+                run_jj(["squash", "--from", name, "-m", f"merged wt-{name}"], main_agent_files)
+            except RuntimeError as e:
+                results.append(f"Warning: could not auto-merge: {e}")
+                results.append(f"Bookmark '{name}' retained - merge manually: jj squash --from {name}")
+                return result
+
+            # Merge known markdown formats, then check for what is left
+            auto_merged = _auto_merge_conflicts(main_agent_files)
+            if auto_merged:
+                results.append(f"Auto-merged {', '.join(auto_merged)}")
+            if _has_conflicts("@", main_agent_files):
+                remaining = [path for path, _ in _conflicted_files("@", main_agent_files)]
+                raise ValueError(
+                    f"MERGE CONFLICTS after squashing '{name}'!\n"
+                    f"\n"
+                    f"Not auto-mergeable (overlapping edits): {', '.join(remaining)}\n"
+                    f"\n"
+                    f"⚠️  DO NOT use --ours/--theirs blindly - you WILL lose accumulated knowledge.\n"
+                    f"\n"
+                    f"Resolution steps:\n"
+                    f"  cd .agent-files\n"
+                    f"  jj resolve              # or edit conflict markers manually\n"
+                    f"  jj diff                 # verify result\n"
+                    f"  jj bookmark delete {name}  # cleanup after resolving\n"
+                    f"\n"
+                    f"Guidelines by file type:\n"
+                    f"  STATUS.md: merge task lists, keep all active tasks\n"
+                    f"  MEDIUMTERM/LONGTERM_MEM.md: combine entries, dedupe, keep all learnings\n"
+                    f"  HANDOFF_*.md: keep newer context, check older for unique info\n"
+                    f"  TASK_*.md: merge attempt histories and checklists\n"
+                    f"\n"
+                    f"PRINCIPLE: Err on keeping information. Duplicates can be pruned later. Lost knowledge is gone forever."
+                )
+
+            # Clean merge - delete bookmark
+            run_jj(["bookmark", "delete", name], main_agent_files)
+            results.append(f"✓ Merged changes from '{name}'")
+            result.merged = True
+
+        return result
+
+
+def wt_prune() -> Steps:
     """Clean up all orphaned worktree state.
 
     Detects and removes:
@@ -631,40 +2119,171 @@ def wt_prune() -> str:
     main_repo = _find_main_repo(cwd)
     main_agent_files = _find_main_agent_files(cwd)
 
-    results = []
+    with repo_lock(main_agent_files):
+        result = Steps(empty="No orphaned state found")
+        results = result.steps
 
-    # 1. Prune git worktrees
-    code, out, _ = _run_cmd(["git", "worktree", "prune", "-v"], cwd=main_repo)
-    if code == 0 and out.strip():
-        for line in out.strip().splitlines():
-            results.append(f"git: {line}")
+        # 1. Prune git worktrees
+        code, out, _ = _run_cmd(["git", "worktree", "prune", "-v"], cwd=main_repo)
+        if code == 0 and out.strip():
+            for line in out.strip().splitlines():
+                results.append(f"git: {line}")
 
-    # 2. Find and forget orphaned jj workspaces
-    jj_wss = _parse_jj_workspaces(main_agent_files)
-    jj_bms = _parse_jj_bookmarks(main_agent_files)
+        # 2. Find and forget orphaned jj workspaces
+        jj_wss = _parse_jj_workspaces(main_agent_files)
+        jj_bms = _parse_jj_bookmarks(main_agent_files)
 
-    for name, ws in jj_wss.items():
-        if name == "default":
-            continue
-        if not ws.get("valid"):
+        for name, ws in jj_wss.items():
+            if name == "default":
+                continue
+            if not ws.get("valid"):
+                try:
+                    run_jj(["workspace", "forget", name], main_agent_files)
+                    results.append(f"Forgot orphaned jj workspace '{name}'")
+
+                    # Also delete matching bookmark
+                    if name in jj_bms:
+                        run_jj(["bookmark", "delete", name], main_agent_files)
+                        results.append(f"Deleted orphaned bookmark '{name}'")
+                except RuntimeError as e:
+                    results.append(f"Warning: failed to forget workspace {name}: {e}")
+
+        return result
+
+
+# Commits gc abandons: empty, never described, and nothing a workspace or
+# bookmark still builds on. These are the fresh working-copy commits that
+# forgotten workspaces (wt rm, wt prune) leave behind.
+GC_ABANDON_REVSET = (
+    'empty() & description(exact:"") & mutable()'
+    " & ~::(working_copies() | bookmarks() | remote_bookmarks())"
+)
+
+GC_KEEP_DAYS = 14.0
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
             try:
-                run_jj(["workspace", "forget", name], main_agent_files)
-                results.append(f"Forgot orphaned jj workspace '{name}'")
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
 
-                # Also delete matching bookmark
-                if name in jj_bms:
-                    run_jj(["bookmark", "delete", name], main_agent_files)
-                    results.append(f"Deleted orphaned bookmark '{name}'")
-            except RuntimeError as e:
-                results.append(f"Warning: failed to forget workspace {name}: {e}")
 
-    if not results:
-        return "No orphaned state found"
+def _repo_size(agent_files: Path) -> int:
+    """Bytes used by the jj repo and its backing git store."""
+    repo = find_repo_dir(agent_files)
+    size = _dir_size(repo)
+    try:
+        git_dir = find_git_dir(agent_files)
+    except FileNotFoundError:
+        return size
+    if not _is_inside(git_dir, repo):
+        size += _dir_size(git_dir)
+    return size
 
-    return "\n".join(results)
+
+def _ops_before(cutoff: float, cwd: Path) -> tuple[str | None, int]:
+    """Newest operation that ended before cutoff, and how many ops end there."""
+    _, out, _ = run_jj(
+        [
+            "op", "log", "--no-graph", "--ignore-working-copy",
+            "-T", 'id.short(16) ++ " " ++ time.end().format("%s") ++ "\\n"',
+        ],
+        cwd,
+    )
+    ops = [line.split() for line in out.splitlines() if line.strip()]
+    # Newest first; the last entry is the root operation, which stays.
+    for i, (op_id, ended) in enumerate(ops[:-1]):
+        if int(ended) < cutoff:
+            return op_id, len(ops) - 1 - i
+    return None, 0
+
+
+def _update_stale_workspaces(agent_files: Path) -> list[str]:
+    """Re-attach workspaces whose working-copy operation was abandoned."""
+    warnings = []
+    for name, ws in _parse_jj_workspaces(agent_files).items():
+        if not ws["valid"]:
+            continue
+        try:
+            run_jj(["workspace", "update-stale"], Path(ws["path"]))
+        except RuntimeError as e:
+            warnings.append(f"Warning: workspace {name} needs `jj workspace update-stale`: {e}")
+    return warnings
 
 
-def wt(name: str | None = None, *, new_branch: bool = False) -> str:
+def gc(keep_days: float = GC_KEEP_DAYS, *, dry_run: bool = False) -> GcResult:
+    """Repository maintenance for long-lived .agent-files repos.
+
+    1. Abandon empty, undescribed commits nothing builds on (GC_ABANDON_REVSET)
+    2. Abandon operations older than keep_days: jj op abandon ..<op>
+    3. jj util gc, then pack refs and loose objects in the git store
+
+    Runs under the repo write lock, so it is safe next to active agents.
+    jj util gc only prunes unreachable objects older than two weeks, so
+    objects just written by unlocked readers or the push worker survive.
+    Workspaces idle longer than keep_days lose their working-copy operation
+    and are re-attached with `jj workspace update-stale`.
+    """
+    started = time.monotonic()
+    agent_files = _find_main_agent_files()
+    before = _repo_size(agent_files)
+    result = GcResult(
+        abandoned=0, ops_trimmed=0, bytes_before=before, bytes_after=before,
+        seconds=0.0, dry_run=dry_run,
+    )
+    verb = "would abandon" if dry_run else "abandoned"
+
+    with repo_lock(agent_files) as lock:
+        result.lock_wait = lock.waited
+
+        revs = _rev_list_for_revset(GC_ABANDON_REVSET, agent_files)
+        if revs:
+            if not dry_run:
+                run_jj(["abandon", GC_ABANDON_REVSET], agent_files)
+            result.abandoned = len(revs)
+            result.steps.append(f"{verb} {len(revs)} empty commit(s)")
+
+        op_id, trimmed = _ops_before(time.time() - keep_days * 86400, agent_files)
+        if op_id:
+            if not dry_run:
+                run_jj(["op", "abandon", f"..{op_id}"], agent_files)
+                result.steps.extend(_update_stale_workspaces(agent_files))
+            result.ops_trimmed = trimmed
+            result.steps.append(f"{verb} {trimmed} operation(s) older than {keep_days:g} days")
+
+        if not dry_run:
+            run_jj(["util", "gc"], agent_files)
+            git_dir = str(find_git_dir(agent_files))
+            _run_cmd_check(["git", "--git-dir", git_dir, "pack-refs", "--all"])
+            _run_cmd_check(["git", "--git-dir", git_dir, "repack", "-d", "-q"])
+            result.steps.append("jj util gc; git pack-refs + repack")
+
+    if not dry_run:
+        result.bytes_after = _repo_size(agent_files)
+    result.seconds = round(time.monotonic() - started, 2)
+    return result
+
+
+def doctor(*, perf: bool = False) -> DoctorReport:
+    """Check jj version and workspace bookkeeping; with perf, measure and time.
+
+    See taskman/doctor.py for the metrics, thresholds and remediation.
+    """
+    agent_files = _find_main_agent_files()
+    return doctor_report(
+        agent_files,
+        _parse_jj_workspaces(agent_files),
+        repo_bytes=_repo_size(agent_files) if perf else None,
+        perf=perf,
+    )
+
+
+def wt(name: str | None = None, *, new_branch: bool = False) -> WorkspaceCreated:
     """Create git worktree with jj workspace for .agent-files.
 
     If name is provided (from main repo):
@@ -709,7 +2328,11 @@ def wt(name: str | None = None, *, new_branch: bool = False) -> str:
         # Create bookmark matching workspace name
         run_jj(["bookmark", "create", name, "-r", f"{name}@"], workspace_agent_files)
 
-        return f"Created worktree at worktrees/{name}/ with .agent-files workspace '{name}'"
+        return WorkspaceCreated(
+            name=name,
+            path=str(workspace_agent_files),
+            message=f"Created worktree at worktrees/{name}/ with .agent-files workspace '{name}'",
+        )
     else:
         if in_main_repo:
             raise ValueError("Use 'taskman wt <name>' to create a worktree")
@@ -729,12 +2352,46 @@ def wt(name: str | None = None, *, new_branch: bool = False) -> str:
         # Create bookmark matching workspace name
         run_jj(["bookmark", "create", ws_name, "-r", f"{ws_name}@"], workspace_agent_files)
 
-        return f"Created .agent-files workspace '{ws_name}' (linked to {main_agent_files})"
+        return WorkspaceCreated(
+            name=ws_name,
+            path=str(workspace_agent_files),
+            message=f"Created .agent-files workspace '{ws_name}' (linked to {main_agent_files})",
+        )
 
 
 # Re-export migrate from its own module
 from taskman.migrate import migrate  # noqa: F401
 
+# Re-export watch from its own module
+from taskman.watch import watch  # noqa: F401
+
+# Re-export archive bundle operations from their own module
+from taskman.archive import (  # noqa: F401
+    list_entries as archive_list,
+    pack as archive_pack,
+    show as archive_show,
+)
+
+# Re-export the attempt-similarity index from its own module
+from taskman.attempts import similar_attempts  # noqa: F401
+
+# Re-export the timeline listing from its own module
+from taskman.timeline import timeline  # noqa: F401
+
+# Re-export task path resolution and resharding from their own module
+from taskman.tasks import reshard, task_path  # noqa: F401
+
+# Re-export the working-copy trigram grep from its own module
+from taskman.grep import grep  # noqa: F401
+
+# Re-export the dependency-aware ready queue from its own module
+from taskman.deps import ready_queue  # noqa: F401
+
+
+def push_status() -> PushStatus:
+    """Pending background pushes and whether the worker is running."""
+    return push.status(_agent_files_cwd())
+
 
 def _load_json(path: Path) -> dict:
     if not path.exists():
@@ -810,7 +2467,7 @@ def _toml_dumps(data: dict) -> str:
     return "\n".join(lines).rstrip() + "\n"
 
 
-def install_mcp(agent: str) -> str:
+def install_mcp(agent: str) -> ConfigChange:
     """Install MCP config for agent (claude, cursor, codex).
 
     Config locations:
@@ -830,7 +2487,7 @@ def install_mcp(agent: str) -> str:
             "args": ["stdio"],
         }
         _write_json(path, data)
-        return f"Installed taskman MCP server in {path}"
+        return ConfigChange(agent, str(path), True, f"Installed taskman MCP server in {path}")
 
     if agent == "cursor":
         project_config = Path(".cursor") / "mcp.json"
@@ -843,7 +2500,7 @@ def install_mcp(agent: str) -> str:
             "args": ["stdio"],
         }
         _write_json(path, data)
-        return f"Installed taskman MCP server in {path}"
+        return ConfigChange(agent, str(path), True, f"Installed taskman MCP server in {path}")
 
     if agent == "codex":
         path = home / ".codex" / "config.toml"
@@ -855,12 +2512,12 @@ def install_mcp(agent: str) -> str:
         }
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text(_toml_dumps(data), encoding="utf-8")
-        return f"Installed taskman MCP server in {path}"
+        return ConfigChange(agent, str(path), True, f"Installed taskman MCP server in {path}")
 
     raise ValueError(f"Unknown agent: {agent}")
 
 
-def install_skills(agent: str) -> str:
+def install_skills(agent: str) -> ConfigChange:
     """Copy skill files to agent's skills directory."""
     skills_dir = Path(__file__).resolve().parent / "skills"
     if not skills_dir.is_dir():
@@ -886,17 +2543,19 @@ def install_skills(agent: str) -> str:
         shutil.copytree(skill_src, dest_dir)
         installed.append(skill_src.name)
 
-    return f"Installed skills to {base_dir}: {', '.join(installed)}"
+    return ConfigChange(
+        agent, str(base_dir), True, f"Installed skills to {base_dir}: {', '.join(installed)}"
+    )
 
 
-def uninstall_mcp(agent: str) -> str:
+def uninstall_mcp(agent: str) -> ConfigChange:
     """Remove MCP config for agent (claude, cursor, codex)."""
     home = Path.home()
     if agent == "claude":
         project_config = Path(".mcp.json")
         path = project_config if project_config.exists() else home / ".claude.json"
         if not path.exists():
-            return f"No MCP config found at {path}"
+            return ConfigChange(agent, str(path), False, f"No MCP config found at {path}")
         data = _load_json(path)
         servers = data.get("mcpServers")
         if isinstance(servers, dict) and "taskman" in servers:
@@ -906,14 +2565,16 @@ def uninstall_mcp(agent: str) -> str:
             else:
                 data.pop("mcpServers", None)
             _write_json(path, data)
-            return f"Removed taskman MCP server from {path}"
-        return f"No taskman MCP server entry found in {path}"
+            return ConfigChange(agent, str(path), True, f"Removed taskman MCP server from {path}")
+        return ConfigChange(
+            agent, str(path), False, f"No taskman MCP server entry found in {path}"
+        )
 
     if agent == "cursor":
         project_config = Path(".cursor") / "mcp.json"
         path = project_config if project_config.exists() else home / ".cursor" / "mcp.json"
         if not path.exists():
-            return f"No MCP config found at {path}"
+            return ConfigChange(agent, str(path), False, f"No MCP config found at {path}")
         data = _load_json(path)
         servers = data.get("mcpServers")
         if isinstance(servers, dict) and "taskman" in servers:
@@ -923,13 +2584,15 @@ def uninstall_mcp(agent: str) -> str:
             else:
                 data.pop("mcpServers", None)
             _write_json(path, data)
-            return f"Removed taskman MCP server from {path}"
-        return f"No taskman MCP server entry found in {path}"
+            return ConfigChange(agent, str(path), True, f"Removed taskman MCP server from {path}")
+        return ConfigChange(
+            agent, str(path), False, f"No taskman MCP server entry found in {path}"
+        )
 
     if agent == "codex":
         path = home / ".codex" / "config.toml"
         if not path.exists():
-            return f"No MCP config found at {path}"
+            return ConfigChange(agent, str(path), False, f"No MCP config found at {path}")
         data = _load_toml(path)
         servers = data.get("mcp_servers")
         if isinstance(servers, dict) and "taskman" in servers:
@@ -939,13 +2602,15 @@ def uninstall_mcp(agent: str) -> str:
             else:
                 data.pop("mcp_servers", None)
             path.write_text(_toml_dumps(data), encoding="utf-8")
-            return f"Removed taskman MCP server from {path}"
-        return f"No taskman MCP server entry found in {path}"
+            return ConfigChange(agent, str(path), True, f"Removed taskman MCP server from {path}")
+        return ConfigChange(
+            agent, str(path), False, f"No taskman MCP server entry found in {path}"
+        )
 
     raise ValueError(f"Unknown agent: {agent}")
 
 
-def uninstall_skills(agent: str) -> str:
+def uninstall_skills(agent: str) -> ConfigChange:
     """Remove installed skill directories."""
     skills_dir = Path(__file__).resolve().parent / "skills"
     home = Path.home()
@@ -968,5 +2633,9 @@ def uninstall_skills(agent: str) -> str:
             removed.append(skill_src.name)
 
     if not removed:
-        return f"No skills found to remove in {base_dir}"
-    return f"Removed skills from {base_dir}: {', '.join(removed)}"
+        return ConfigChange(
+            agent, str(base_dir), False, f"No skills found to remove in {base_dir}"
+        )
+    return ConfigChange(
+        agent, str(base_dir), True, f"Removed skills from {base_dir}: {', '.join(removed)}"
+    )
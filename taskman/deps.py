@@ -0,0 +1,288 @@
+"""Task dependency graph and ready queue.
+
+A task names the tasks it waits on in its Meta section:
+
+    Blocked-by: auth, cache-layer
+    Depends-on: TASK_schema.md
+
+Both fields take comma- or space-separated slugs (task file names and
+paths work too); text in parentheses is ignored. A dependency is met
+once its task is complete, either `Status: complete` or archived.
+
+The graph is built from each live task's Meta fields, which are cached in
+.jj/repo/taskman keyed by file mtime and size. The task list comes from
+the tasks/ slug index, so a refresh lists only changed directories, stats
+each task file and re-reads only those that changed. `ready_queue()`
+returns the open tasks whose dependencies are all met, highest priority
+first, along with the blocked ones and any dependency cycles.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+from taskman import archive, tasks
+from taskman.jj import find_agent_files_dir, taskman_state_dir, workspace_key
+from taskman.results import BlockedTask, ReadyQueue, ReadyTask
+
+INDEX_VERSION = 1
+DEP_FIELDS = ("blocked-by", "depends-on")
+
+# Statuses a task can be picked up in, preferred first.
+OPEN_STATUSES = ("in_progress", "planned")
+
+_TITLE_RE = re.compile(r"^#\s*TASK:\s*(.+?)\s*$", re.MULTILINE)
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_SPLIT_RE = re.compile(r"[,\s]+")
+_NONE = frozenset(("", "-", "none", "n/a"))
+
+# In-process cache so a long-running MCP server loads the graph once.
+_cache: dict[Path, "DepGraph"] = {}
+
+
+def parse_deps(value: str) -> list[str]:
+    """Slugs named by a Blocked-by/Depends-on value, in order, deduplicated."""
+    slugs: list[str] = []
+    for token in _SPLIT_RE.split(_PAREN_RE.sub(" ", value)):
+        token = token.strip("[]`'\"").rsplit("/", 1)[-1]
+        if token.lower() in _NONE:
+            continue
+        try:
+            slug = tasks.normalize_slug(token)
+        except ValueError:
+            continue
+        if slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+
+def parse_task(text: str) -> dict:
+    """The fields the graph needs from one task file."""
+    fields = tasks.meta_fields(text)
+    deps: list[str] = []
+    for name, value in fields.items():
+        if name.replace(" ", "-").replace("_", "-") in DEP_FIELDS:
+            deps.extend(slug for slug in parse_deps(value) if slug not in deps)
+    title = _TITLE_RE.search(text)
+    return {
+        "status": fields.get("status", "planned").lower(),
+        "priority": fields.get("priority", ""),
+        "created": fields.get("created", ""),
+        "title": title.group(1) if title else "",
+        "deps": deps,
+    }
+
+
+def _priority(value: str) -> int:
+    m = re.match(r"P(\d)", value.strip(), re.IGNORECASE)
+    return int(m.group(1)) if m else 9
+
+
+class DepGraph:
+    """Parsed Meta of every live task, refreshed by file mtime and size."""
+
+    def __init__(self, agent_files: Path, path: Path) -> None:
+        self.agent_files = agent_files
+        self.path = path
+        # relpath -> {"stamp": [mtime_ns, size], "slug": ..., **parse_task()}
+        self.files: dict[str, dict] = {}
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if data.get("version") == INDEX_VERSION:
+                    self.files = data["files"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                self.files = {}
+        # slug -> parsed entry plus its "path", for the live tasks only
+        self.nodes: dict[str, dict] = {}
+        # (archive dir mtime, (ready, blocked, cycles)) until the next change
+        self._queue: tuple | None = None
+
+    def refresh(self) -> bool:
+        """Re-read changed task files; returns True if anything changed."""
+        slugs = tasks.load(self.agent_files).slugs
+        files: dict[str, dict] = {}
+        changed = False
+        for slug, rel in slugs.items():
+            try:
+                st = os.stat(os.path.join(self.agent_files, rel))
+            except OSError:
+                continue
+            stamp = [st.st_mtime_ns, st.st_size]
+            known = self.files.get(rel)
+            if known is None or known["stamp"] != stamp or known["slug"] != slug:
+                try:
+                    text = (self.agent_files / rel).read_text(encoding="utf-8", errors="replace")
+                except OSError:
+                    continue
+                known = {"stamp": stamp, "slug": slug, **parse_task(text)}
+                changed = True
+            files[rel] = known
+        if changed or files.keys() != self.files.keys():
+            self.files = files
+            self._save()
+            changed = True
+        if changed or not self.nodes:
+            self.nodes = {entry["slug"]: {**entry, "path": rel} for rel, entry in self.files.items()}
+            self._queue = None
+        return changed
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        data = {"version": INDEX_VERSION, "files": self.files}
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _archived(self) -> set[str]:
+        archive_dir = self.agent_files / archive.ARCHIVE_DIR
+        done = set(archive.load_index(self.agent_files))
+        try:
+            names = os.listdir(archive_dir)
+        except OSError:
+            names = []
+        for name in names:
+            if name.endswith(".md"):
+                done.add(name[len("TASK_"):-len(".md")] if name.startswith("TASK_") else name[:-3])
+        return done
+
+    def cycles(self) -> list[list[str]]:
+        """Groups of open tasks that wait on each other (Tarjan's SCC).
+
+        Iterative, so a long dependency chain cannot hit the recursion limit.
+        """
+        graph = {
+            slug: [dep for dep in node["deps"] if dep in self.nodes and self._open(dep)]
+            for slug, node in self.nodes.items()
+            if self._open(slug)
+        }
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        on_stack: set[str] = set()
+        stack: list[str] = []
+        found: list[list[str]] = []
+        for root in sorted(graph):
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                slug, i = work.pop()
+                if i == 0:
+                    index[slug] = low[slug] = len(index)
+                    stack.append(slug)
+                    on_stack.add(slug)
+                edges = graph[slug]
+                if i < len(edges):
+                    work.append((slug, i + 1))
+                    dep = edges[i]
+                    if dep not in index:
+                        work.append((dep, 0))
+                    elif dep in on_stack:
+                        low[slug] = min(low[slug], index[dep])
+                    continue
+                if low[slug] == index[slug]:
+                    group = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        group.append(member)
+                        if member == slug:
+                            break
+                    if len(group) > 1 or slug in graph[slug]:
+                        found.append(sorted(group))
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[slug])
+        return sorted(found)
+
+    def _open(self, slug: str) -> bool:
+        return self.nodes[slug]["status"] != "complete"
+
+    def queue(self) -> tuple[list[ReadyTask], list[BlockedTask], list[list[str]]]:
+        """(ready, blocked, cycles), recomputed only when tasks or the archive changed."""
+        try:
+            # Archiving or packing a task always touches the archive directory.
+            stamp = os.stat(self.agent_files / archive.ARCHIVE_DIR).st_mtime_ns
+        except OSError:
+            stamp = 0
+        if self._queue is not None and self._queue[0] == stamp:
+            return self._queue[1]
+        archived = self._archived()
+        unblocks: dict[str, int] = {}
+        for slug, node in self.nodes.items():
+            if self._open(slug):
+                for dep in node["deps"]:
+                    unblocks[dep] = unblocks.get(dep, 0) + 1
+
+        ranked = []
+        blocked: list[BlockedTask] = []
+        for slug, node in sorted(self.nodes.items()):
+            status = node["status"]
+            if status == "complete":
+                continue
+            waiting = [
+                dep for dep in node["deps"]
+                if dep in self.nodes and self._open(dep)
+            ]
+            missing = [dep for dep in node["deps"] if dep not in self.nodes and dep not in archived]
+            path = node["path"]
+            if waiting or missing or (status == "blocked" and not node["deps"]):
+                blocked.append(BlockedTask(slug, path, waiting, missing))
+                continue
+            if status == "blocked":
+                rank = len(OPEN_STATUSES)  # its blockers are done; behind real open work
+            elif status in OPEN_STATUSES:
+                rank = OPEN_STATUSES.index(status)
+            else:
+                continue
+            ranked.append((
+                (_priority(node["priority"]), rank, -unblocks.get(slug, 0),
+                 node["created"] or "9999", slug),
+                ReadyTask(slug, path, node["priority"], status, node["title"], unblocks.get(slug, 0)),
+            ))
+        ranked.sort(key=lambda pair: pair[0])
+        queue = ([task for _, task in ranked], blocked, self.cycles())
+        self._queue = (stamp, queue)
+        return queue
+
+
+def _graph_path(agent_files: Path) -> Path:
+    # Per workspace, like the slug index it is built from.
+    return taskman_state_dir(agent_files) / f"deps-{workspace_key(agent_files)}.json"
+
+
+def load(agent_files: Path) -> DepGraph:
+    graph = _cache.get(agent_files)
+    if graph is None:
+        graph = DepGraph(agent_files, _graph_path(agent_files))
+        _cache[agent_files] = graph
+    graph.refresh()
+    return graph
+
+
+def ready_queue(
+    limit: int = 10,
+    exclude: str = "",
+    agent_files: Path | None = None,
+) -> ReadyQueue:
+    """Open tasks whose dependencies are all met, highest priority first.
+
+    Ordered by Priority (P0 first), then in_progress before planned
+    (before blocked tasks whose blockers are all done), then by the
+    number of open tasks waiting on each, then oldest Created. Tasks with
+    unmet or unknown dependencies, or `Status: blocked` and no dependency
+    fields, are listed as blocked. `limit` caps the ready list (0 = all).
+    """
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    graph = load(agent_files)
+    ready, blocked, cycles = graph.queue()
+    ready = [task for task in ready if task.slug != exclude]
+    blocked = [task for task in blocked if task.slug != exclude]
+    shown = ready[:limit] if limit > 0 else ready
+    return ReadyQueue(
+        ready=shown,
+        blocked=blocked,
+        cycles=cycles,
+        open=sum(1 for slug in graph.nodes if graph._open(slug) and slug != exclude),
+        truncated=len(ready) - len(shown),
+    )
@@ -0,0 +1,166 @@
+"""Health and performance report for a .agent-files checkout.
+
+`taskman doctor` checks the jj version and workspace bookkeeping.
+`--perf` also measures what makes jj slow on a long-lived repo (commit
+and operation counts, working-copy and archive size, repo size) and times
+a snapshot and a small history query. Every measurement is compared with
+a threshold; warnings name the command that fixes them.
+"""
+
+import os
+import re
+import time
+from pathlib import Path
+
+from taskman import archive
+from taskman.jj import run_jj
+from taskman.results import DoctorCheck, DoctorReport
+
+# Warn above these values. Tuned for agents on a laptop-class machine:
+# past them a single jj command costs noticeably more than it should.
+THRESHOLDS = {
+    "commits": 5000,
+    "operations": 2000,
+    "working_copy_files": 5000,
+    "working_copy_bytes": 50 * 1024 * 1024,
+    "loose_archive_files": 200,
+    "repo_bytes": 500 * 1024 * 1024,
+    "workspaces": 20,
+    "orphaned_workspaces": 0,
+    "snapshot_seconds": 0.5,
+    "history_seconds": 1.0,
+}
+
+REMEDIATION = {
+    "commits": "taskman gc",
+    "operations": "taskman gc --keep-days 7",
+    "working_copy_files": "taskman archive pack",
+    "working_copy_bytes": "move large files out of .agent-files, then taskman gc",
+    "loose_archive_files": "taskman archive pack",
+    "repo_bytes": "taskman gc",
+    "workspaces": "taskman wt-list, then taskman wt-rm <name> for finished worktrees",
+    "orphaned_workspaces": "taskman wt-prune",
+    "snapshot_seconds": "taskman archive pack (fewer files to stat), then taskman gc",
+    "history_seconds": "taskman gc",
+    "jj_version": "upgrade jj: https://martinvonz.github.io/jj/latest/install-and-setup/",
+}
+
+# jj features taskman relies on, with the release that introduced them.
+CAPABILITIES = {
+    "file show": (0, 19),
+    "working_copies() revset": (0, 19),
+    "diff_contains() revset": (0, 20),
+    "ui.conflict-marker-style": (0, 25),
+}
+
+_VERSION_RE = re.compile(r"(\d+)\.(\d+)(?:\.(\d+))?")
+
+_EXCLUDED_DIRS = {".jj", ".git"}
+
+
+def _count(args: list[str], cwd: Path) -> int:
+    """Number of entries printed by a jj listing rendered as one "." each."""
+    _, out, _ = run_jj([*args, "--no-graph", "--ignore-working-copy", "-T", '"."'], cwd)
+    return len(out.strip())
+
+
+def _timed(args: list[str], cwd: Path) -> float:
+    started = time.perf_counter()
+    run_jj(args, cwd)
+    return time.perf_counter() - started
+
+
+def _working_copy_stats(agent_files: Path) -> tuple[int, int]:
+    """(files, bytes) jj snapshots: everything outside .jj/.git."""
+    files = size = 0
+    stack = [str(agent_files)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in _EXCLUDED_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    files += 1
+                    size += entry.stat(follow_symlinks=False).st_size
+    return files, size
+
+
+def jj_version(cwd: Path) -> tuple[str, tuple[int, ...]]:
+    """jj's version string and parsed (major, minor, patch)."""
+    _, out, _ = run_jj(["--version"], cwd)
+    m = _VERSION_RE.search(out)
+    parsed = tuple(int(part or 0) for part in m.groups()) if m else ()
+    return out.strip(), parsed
+
+
+def _check(name: str, value: float, unit: str = "") -> DoctorCheck:
+    limit = THRESHOLDS[name]
+    ok = value <= limit
+    return DoctorCheck(
+        name=name,
+        value=value,
+        unit=unit,
+        threshold=limit,
+        status="ok" if ok else "warn",
+        fix="" if ok else REMEDIATION[name],
+    )
+
+
+def report(
+    agent_files: Path,
+    workspaces: dict[str, dict],
+    repo_bytes: int | None = None,
+    perf: bool = False,
+) -> DoctorReport:
+    """Build the report. The workspace listing and repo size come from core."""
+    version, parsed = jj_version(agent_files)
+    capabilities = {name: parsed >= needed for name, needed in CAPABILITIES.items()}
+    missing = [name for name, ok in capabilities.items() if not ok]
+    checks = [
+        DoctorCheck(
+            name="jj_version",
+            value=version,
+            status="warn" if missing else "ok",
+            fix=REMEDIATION["jj_version"] if missing else "",
+            detail=f"missing: {', '.join(missing)}" if missing else "",
+        ),
+        _check("workspaces", len(workspaces)),
+        # jj workspaces whose working copy directory is gone.
+        _check("orphaned_workspaces", sum(not ws.get("valid") for ws in workspaces.values())),
+    ]
+    if perf:
+        files, size = _working_copy_stats(agent_files)
+        loose = sum(1 for _ in (agent_files / archive.ARCHIVE_DIR).glob("*.md"))
+        pack = agent_files / archive.ARCHIVE_DIR / archive.PACK_NAME
+        checks += [
+            _check("commits", _count(["log", "-r", "all()"], agent_files)),
+            _check("operations", _count(["op", "log"], agent_files)),
+            _check("working_copy_files", files),
+            _check("working_copy_bytes", size, "B"),
+            _check("loose_archive_files", loose),
+            DoctorCheck(
+                name="archive_pack_bytes",
+                value=pack.stat().st_size if pack.exists() else 0,
+                unit="B",
+            ),
+        ]
+        if repo_bytes is not None:
+            checks.append(_check("repo_bytes", repo_bytes, "B"))
+        # A snapshot with nothing changed: what every jj command pays up front.
+        checks.append(_check("snapshot_seconds", round(_timed(
+            ["log", "--no-graph", "-r", "@", "-T", '""'], agent_files
+        ), 3), "s"))
+        checks.append(_check("history_seconds", round(_timed(
+            [
+                "log", "--no-graph", "--ignore-working-copy", "-r", "latest(::@, 20)",
+                "-T", 'change_id.short() ++ " " ++ description.first_line() ++ "\\n"',
+                "--stat",
+            ],
+            agent_files,
+        ), 3), "s"))
+    return DoctorReport(checks=checks, capabilities=capabilities, perf=perf)
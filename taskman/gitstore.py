@@ -0,0 +1,364 @@
+"""In-process reader for the git object store behind .agent-files.
+
+History reads only need blobs and trees at known commit ids. Spawning jj
+for that loads the whole repo and snapshots the working copy, and even
+`git cat-file` costs a process per call. This module reads objects
+directly:
+
+- loose objects: `objects/xx/yyyy…`, zlib-compressed
+- packs: `.idx` (version 2) files are mmap'd and searched through the
+  fanout table, `.pack` files are mmap'd and entries are inflated in
+  place; OFS_DELTA and REF_DELTA chains are resolved with a small cache
+  of recent bases
+- alternates listed in `objects/info/alternates`
+
+Only reads are supported. Anything this reader does not understand
+(SHA-256 repos, v1 indexes, corrupt data) raises ValueError, and callers
+fall back to `git cat-file`. A missing object raises KeyError after one
+rescan of the pack directory, so packs written after the store was
+opened (by jj or `taskman gc`) are found.
+"""
+
+import mmap
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+_IDX_MAGIC = b"\xfftOc"
+_INFLATE_CHUNK = 64 * 1024
+# Recently read objects (delta chains re-read their bases) and parsed trees.
+_CACHE_BYTES = 32 * 1024 * 1024
+_CACHE_TREES = 4096
+
+# One store per git dir, so a long-running MCP server maps each pack once.
+_cache: dict[Path, "GitStore"] = {}
+_cache_guard = threading.Lock()
+
+
+def _inflate(buf, pos: int, size: int) -> bytes:
+    """Decompress the zlib stream starting at buf[pos] (size = inflated size)."""
+    d = zlib.decompressobj()
+    parts = []
+    while not d.eof:
+        chunk = buf[pos:pos + max(_INFLATE_CHUNK, size + 64)]
+        if not chunk:
+            raise ValueError("truncated zlib stream")
+        parts.append(d.decompress(chunk))
+        pos += len(chunk)
+    data = b"".join(parts)
+    if len(data) != size:
+        raise ValueError(f"object size mismatch: {len(data)} != {size}")
+    return data
+
+
+def _varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Little-endian base-128 size used in delta headers."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its base and a git delta."""
+    src_size, pos = _varint(delta, 0)
+    dst_size, pos = _varint(delta, pos)
+    if src_size != len(base):
+        raise ValueError("delta base size mismatch")
+    out = bytearray()
+    end = len(delta)
+    while pos < end:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (1 << (4 + i)):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError("invalid delta opcode 0")
+    if len(out) != dst_size:
+        raise ValueError("delta result size mismatch")
+    return bytes(out)
+
+
+class _Pack:
+    """One mmap'd pack and its version-2 index."""
+
+    def __init__(self, idx_path: Path) -> None:
+        with open(idx_path, "rb") as f:
+            self.idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(idx_path.with_suffix(".pack"), "rb") as f:
+            self.pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:4] != _IDX_MAGIC or struct.unpack(">I", self.idx[4:8])[0] != 2:
+            raise ValueError(f"unsupported pack index {idx_path.name}")
+        self.fanout = struct.unpack(">256I", self.idx[8:8 + 1024])
+        self.count = self.fanout[255]
+        self.names = 8 + 1024
+        self.offsets = self.names + self.count * 24  # after names and CRCs
+        self.large = self.offsets + self.count * 4
+
+    def _name(self, i: int) -> bytes:
+        return self.idx[self.names + i * 20:self.names + i * 20 + 20]
+
+    def offset(self, oid: bytes) -> int | None:
+        """Pack offset of oid, or None if this pack does not have it."""
+        lo = self.fanout[oid[0] - 1] if oid[0] else 0
+        hi = self.fanout[oid[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self._name(mid)
+            if name < oid:
+                lo = mid + 1
+            elif name > oid:
+                hi = mid
+            else:
+                at = self.offsets + mid * 4
+                value = struct.unpack(">I", self.idx[at:at + 4])[0]
+                if value & 0x80000000:
+                    at = self.large + (value & 0x7FFFFFFF) * 8
+                    value = struct.unpack(">Q", self.idx[at:at + 8])[0]
+                return value
+        return None
+
+
+class GitStore:
+    """Read-only access to commits, trees and blobs of one git dir."""
+
+    def __init__(self, git_dir: Path) -> None:
+        self.git_dir = git_dir
+        config = git_dir / "config"
+        if config.is_file():
+            settings = config.read_text(errors="replace").lower().replace(" ", "")
+            if "objectformat=sha256" in settings:
+                raise ValueError("SHA-256 repositories are not supported")
+        objects = git_dir / "objects"
+        self.object_dirs = [objects]
+        alternates = objects / "info" / "alternates"
+        if alternates.is_file():
+            for line in alternates.read_text().splitlines():
+                if line.strip() and not line.startswith("#"):
+                    self.object_dirs.append(objects / line.strip())
+        self._lock = threading.Lock()
+        self._packs: dict[Path, _Pack] = {}
+        self._objects: OrderedDict[bytes, tuple[str, bytes]] = OrderedDict()
+        self._object_bytes = 0
+        self._trees: OrderedDict[bytes, list[tuple[str, str, bytes]]] = OrderedDict()
+        self._scan()
+
+    def _scan(self) -> None:
+        """Open packs not seen yet (packs removed by a repack stay mapped)."""
+        with self._lock:
+            for objects in self.object_dirs:
+                pack_dir = objects / "pack"
+                if not pack_dir.is_dir():
+                    continue
+                for idx in sorted(pack_dir.glob("*.idx")):
+                    if idx in self._packs:
+                        continue
+                    try:
+                        self._packs[idx] = _Pack(idx)
+                    except FileNotFoundError:
+                        continue  # removed by a concurrent repack
+
+    def _recall(self, cache: OrderedDict, key: bytes):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _remember_tree(self, key: bytes, entries: list) -> None:
+        with self._lock:
+            self._trees[key] = entries
+            if len(self._trees) > _CACHE_TREES:
+                self._trees.popitem(last=False)
+
+    def _remember_object(self, key: bytes, value: tuple[str, bytes]) -> None:
+        size = len(value[1])
+        if size > _CACHE_BYTES // 4:
+            return
+        with self._lock:
+            if key in self._objects:
+                return
+            self._objects[key] = value
+            self._object_bytes += size
+            while self._object_bytes > _CACHE_BYTES:
+                _, (_, old) = self._objects.popitem(last=False)
+                self._object_bytes -= len(old)
+
+    def _loose(self, hexid: str) -> tuple[str, bytes] | None:
+        for objects in self.object_dirs:
+            try:
+                raw = zlib.decompress((objects / hexid[:2] / hexid[2:]).read_bytes())
+            except FileNotFoundError:
+                continue
+            header, _, body = raw.partition(b"\0")
+            kind, size = header.decode().split()
+            if int(size) != len(body):
+                raise ValueError(f"loose object {hexid} is truncated")
+            return kind, body
+        return None
+
+    def _packed(self, oid: bytes) -> tuple[str, bytes] | None:
+        for pack in list(self._packs.values()):
+            offset = pack.offset(oid)
+            if offset is not None:
+                return self._unpack(pack, offset)
+        return None
+
+    def _unpack(self, pack: _Pack, offset: int) -> tuple[str, bytes]:
+        key = id(pack).to_bytes(8, "little") + offset.to_bytes(8, "little")
+        cached = self._recall(self._objects, key)
+        if cached is not None:
+            return cached
+        buf = pack.pack
+        byte = buf[offset]
+        kind = (byte >> 4) & 7
+        size = byte & 0x0F
+        pos, shift = offset + 1, 4
+        while byte & 0x80:
+            byte = buf[pos]
+            pos += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        if kind in _TYPES:
+            result = (_TYPES[kind], _inflate(buf, pos, size))
+        elif kind == _OFS_DELTA:
+            byte = buf[pos]
+            pos += 1
+            back = byte & 0x7F
+            while byte & 0x80:
+                byte = buf[pos]
+                pos += 1
+                back = ((back + 1) << 7) | (byte & 0x7F)
+            base_kind, base = self._unpack(pack, offset - back)
+            result = (base_kind, apply_delta(base, _inflate(buf, pos, size)))
+        elif kind == _REF_DELTA:
+            base_kind, base = self._read(bytes(buf[pos:pos + 20]))
+            result = (base_kind, apply_delta(base, _inflate(buf, pos + 20, size)))
+        else:
+            raise ValueError(f"unknown pack object type {kind}")
+        self._remember_object(key, result)
+        return result
+
+    def _read(self, oid: bytes) -> tuple[str, bytes]:
+        found = self._loose(oid.hex()) or self._packed(oid)
+        if found is None:
+            self._scan()
+            found = self._loose(oid.hex()) or self._packed(oid)
+        if found is None:
+            raise KeyError(oid.hex())
+        return found
+
+    def read(self, hexid: str) -> tuple[str, bytes]:
+        """(type, content) of an object by its 40-hex id.
+
+        Raises: KeyError if absent, ValueError if it cannot be decoded here
+        """
+        if len(hexid) != 40:
+            raise ValueError(f"full object id required: {hexid!r}")
+        try:
+            return self._read(bytes.fromhex(hexid))
+        except (zlib.error, struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ValueError(f"cannot decode object {hexid}: {e}") from e
+
+    def _tree(self, hexid: str) -> list[tuple[str, str, bytes]]:
+        """Entries (mode, name, oid) of a tree."""
+        key = bytes.fromhex(hexid)
+        cached = self._recall(self._trees, key)
+        if cached is not None:
+            return cached
+        kind, data = self.read(hexid)
+        if kind != "tree":
+            raise ValueError(f"{hexid} is a {kind}, not a tree")
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            nul = data.index(b"\0", space)
+            entries.append((
+                data[pos:space].decode(),
+                data[space + 1:nul].decode("utf-8", errors="surrogateescape"),
+                data[nul + 1:nul + 21],
+            ))
+            pos = nul + 21
+        self._remember_tree(key, entries)
+        return entries
+
+    def commit_tree(self, commit: str) -> str:
+        kind, data = self.read(commit)
+        if kind != "commit" or not data.startswith(b"tree "):
+            raise ValueError(f"{commit} is not a commit")
+        return data[5:45].decode()
+
+    def blob_id(self, commit: str, path: str) -> str | None:
+        """Blob id of path at commit (`git cat-file <commit>:<path>`), None if absent."""
+        oid = self.commit_tree(commit)
+        parts = [part for part in path.split("/") if part]
+        for depth, name in enumerate(parts):
+            for mode, entry, child in self._tree(oid):
+                if entry == name:
+                    is_tree = mode == "40000"
+                    if is_tree == (depth == len(parts) - 1) or mode == "160000":
+                        return None
+                    oid = child.hex()
+                    break
+            else:
+                return None
+        return oid if parts else None
+
+    def blob(self, hexid: str) -> bytes:
+        kind, data = self.read(hexid)
+        if kind != "blob":
+            raise ValueError(f"{hexid} is a {kind}, not a blob")
+        return data
+
+    def paths(self, commits: list[str]) -> set[str]:
+        """Every file path present at any of commits.
+
+        A subtree shared by several commits (the common case: most of the
+        tree is unchanged between checkpoints) is walked once.
+        """
+        found: set[str] = set()
+        seen: set[tuple[str, str]] = set()
+        stack = [("", self.commit_tree(commit)) for commit in commits]
+        while stack:
+            prefix, oid = stack.pop()
+            if (prefix, oid) in seen:
+                continue
+            seen.add((prefix, oid))
+            for mode, name, child in self._tree(oid):
+                if mode == "40000":
+                    stack.append((f"{prefix}{name}/", child.hex()))
+                elif mode != "160000":
+                    found.add(prefix + name)
+        return found
+
+
+def open_store(git_dir: Path) -> GitStore:
+    """The shared GitStore for git_dir (ValueError if unsupported)."""
+    with _cache_guard:
+        store = _cache.get(git_dir)
+        if store is None:
+            store = GitStore(git_dir)
+            _cache[git_dir] = store
+        return store
@@ -0,0 +1,559 @@
+"""Trigram index over the .agent-files working copy, for fast grep.
+
+Every text file (tasks, topics, handoffs, memory, loose archive files) and
+every entry of the archive pack is broken into the set of its 3-byte
+substrings, lowercased. The index maps each trigram to a bitmap of the
+files containing it, held as a Python int so a query's candidate files
+are the AND of a few bitmaps. Only candidates are read and matched line
+by line, so a selective query over a large corpus reads a handful of files.
+
+Literal queries use all of their trigrams. Regex queries use the literal
+runs every match must contain, read by a small scanner of the pattern; a
+pattern with none, syntax the scanner does not know, or a query shorter
+than three characters, scans every file.
+
+The index lives in .jj/repo/taskman/grep-<workspace>.idx. Before each
+query, files whose mtime or size changed are re-read and their bits
+replaced, so edits are visible to the next search. A one-shot CLI call
+stats every file; a long-running process follows inotify events instead.
+"""
+
+import atexit
+import fnmatch
+import json
+import os
+import re
+import stat
+import struct
+import time
+from collections import defaultdict, deque
+from itertools import repeat
+from pathlib import Path
+
+from taskman import archive
+from taskman.jj import find_agent_files_dir, taskman_state_dir, workspace_key
+from taskman.results import GrepMatch, GrepResult
+from taskman.watch import OVERFLOW, Inotify
+
+INDEX_VERSION = 1
+_MAGIC = b"TMGI"
+# Bytes read to tell binary files (with a NUL) from text.
+_SNIFF = 8192
+# Lines longer than this are cut in results.
+LINE_CHARS = 400
+# Above this share of changed files, rebuilding beats patching bitmaps.
+_REBUILD_SHARE = 0.25
+# Seconds between saves of an index kept current by inotify (MCP server).
+SAVE_INTERVAL = 30.0
+
+# Regex escapes that stand for one known character.
+_CHAR_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a"}
+# Escapes taking a fixed number of characters after them (\x41, \u00e9).
+_CODE_ESCAPES = {"x": 2, "u": 4, "U": 8}
+_QUANTIFIER_RE = re.compile(r"\{(\d*)(?:,(\d*))?\}")
+_FLAGS_RE = re.compile(r"[aiLmsux-]*")
+_ASCII_RUN_RE = re.compile(r"[\x00-\x7f]+")
+
+# In-process cache so a long-running MCP server loads the index once.
+_cache: dict[Path, "TrigramIndex"] = {}
+
+
+def trigrams(data: bytes) -> set[tuple[int, int, int]]:
+    """Distinct lowercased 3-byte substrings of data, as byte triples."""
+    data = data.lower()
+    # zip over shifted copies runs in C; slicing per offset is twice as slow.
+    return set(zip(data, data[1:], data[2:]))
+
+
+def _bitmap(ids: list[int]) -> int:
+    """Int with bit i set for each i in ids.
+
+    Marks one byte per id through C-level map calls, then packs eight
+    strided slices of those bytes into bits, so there is no Python loop
+    per id.
+    """
+    size = max(ids) + 1
+    marks = bytearray(size + 8)
+    deque(map(marks.__setitem__, ids, repeat(1)), maxlen=0)
+    mask = 0
+    for k in range(8):
+        mask |= int.from_bytes(marks[k::8], "little") << k
+    return mask
+
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class _Unsupported(Exception):
+    """Regex syntax the literal scanner does not handle."""
+
+
+class _LiteralScanner:
+    """Reads the literal runs a regex requires, without the regex parser.
+
+    Only syntax it knows contributes literals. Anything else is treated
+    as matching unknown text, or makes required_literals give up, so a
+    run is never reported that a match could lack.
+    """
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern
+        self.pos = 0
+
+    def _take(self, count: int = 1) -> str:
+        text = self.pattern[self.pos:self.pos + count]
+        self.pos += count
+        return text
+
+    def _peek(self, text: str) -> bool:
+        return self.pattern.startswith(text, self.pos)
+
+    def sequence(self) -> list[str]:
+        """Runs required by the alternatives up to the next `)`; none if there are several."""
+        found: list[str] = []
+        run: list[str] = []
+        alternation = False
+
+        def flush() -> None:
+            if run:
+                found.append("".join(run))
+                run.clear()
+
+        while self.pos < len(self.pattern) and not self._peek(")"):
+            if self._peek("|"):
+                self._take()
+                flush()
+                alternation = True
+                continue
+            kind, value = self._atom()
+            low = self._quantifier()
+            if kind == "empty":
+                continue
+            if low is None and kind == "literal":
+                run.append(value)
+                continue
+            flush()
+            if kind == "group" and (low is None or low >= 1):
+                found.extend(value)
+            elif kind == "literal" and low >= 1:
+                found.append(value)
+        flush()
+        return [] if alternation else found
+
+    def _atom(self) -> tuple[str, object]:
+        """("literal", char), ("group", runs), ("empty", None) or ("any", None)."""
+        char = self._take()
+        if char == "\\":
+            return self._escape()
+        if char == "[":
+            self._skip_class()
+            return "any", None
+        if char == "(":
+            return self._group()
+        if char in "^$":
+            return "empty", None
+        if char in ".*+?":
+            return "any", None
+        return "literal", char
+
+    def _escape(self) -> tuple[str, object]:
+        char = self._take()
+        if char in "bBAZ":
+            return "empty", None
+        if char in _CHAR_ESCAPES:
+            return "literal", _CHAR_ESCAPES[char]
+        if char in _CODE_ESCAPES:
+            self._take(_CODE_ESCAPES[char])
+        elif char == "N":
+            self.pos = self.pattern.index("}", self.pos) + 1
+        elif char.isdigit():
+            while self.pos < len(self.pattern) and self.pattern[self.pos].isdigit():
+                self._take()
+        elif not char.isalnum():
+            return "literal", char
+        return "any", None
+
+    def _skip_class(self) -> None:
+        if self._peek("^"):
+            self._take()
+        if self._peek("]"):
+            self._take()
+        while not self._peek("]"):
+            if self.pos >= len(self.pattern):
+                raise _Unsupported
+            if self._take() == "\\":
+                self._take()
+        self._take()
+
+    def _group(self) -> tuple[str, object]:
+        kind = "group"
+        if self._peek("?"):
+            self._take()
+            if self._peek("P<"):
+                self.pos = self.pattern.index(">", self.pos) + 1
+            elif self._peek("<") and not (self._peek("<=") or self._peek("<!")):
+                self.pos = self.pattern.index(">", self.pos) + 1
+            elif self._peek(":"):
+                self._take()
+            elif self._peek("=") or self._peek("!") or self._peek("<"):
+                self._take(2 if self._peek("<") else 1)
+                kind = "empty"  # lookaround: consumes nothing
+            elif self._peek("#"):
+                self.pos = self.pattern.index(")", self.pos) + 1
+                return "empty", None
+            else:
+                flags = _FLAGS_RE.match(self.pattern, self.pos).group()
+                self.pos += len(flags)
+                if "x" in flags or not (self._peek(":") or self._peek(")")):
+                    raise _Unsupported  # verbose mode, conditionals, (?P=name)
+                if self._take() == ")":
+                    return "empty", None
+        runs = self.sequence()
+        if not self._peek(")"):
+            raise _Unsupported
+        self._take()
+        return (kind, runs) if kind == "group" else ("empty", None)
+
+    def _quantifier(self) -> int | None:
+        """Minimum count of the quantifier after an atom, or None if there is none."""
+        if self._peek("*") or self._peek("?"):
+            low = 0
+            self._take()
+        elif self._peek("+"):
+            low = 1
+            self._take()
+        else:
+            match = _QUANTIFIER_RE.match(self.pattern, self.pos)
+            if match is None:
+                return None
+            low = int(match.group(1) or 0)
+            self.pos = match.end()
+        if self._peek("?") or self._peek("+"):
+            self._take()  # lazy or possessive
+        return low
+
+
+def required_literals(pattern: str) -> list[str]:
+    """Literal runs that every match of the regex contains.
+
+    Walks the top-level concatenation of the pattern: groups are entered,
+    repeats with a minimum of one are entered, zero-width assertions are
+    skipped, and anything else (classes, alternation, optional parts) ends
+    the current run. Syntax the scanner does not know (verbose mode,
+    conditionals) gives no runs, so the search scans every file.
+    """
+    scanner = _LiteralScanner(pattern)
+    try:
+        found = scanner.sequence()
+    except (_Unsupported, ValueError):
+        return []
+    return found if scanner.pos == len(pattern) else []
+
+
+def _query_trigrams(fragments: list[str], fold_ascii_only: bool) -> set[tuple[int, int, int]]:
+    """Trigrams a file must contain to match.
+
+    The index folds ASCII case only, so when case is ignored (or a regex
+    may fold case inside), non-ASCII text cannot be used to prefilter.
+    """
+    wanted: set[tuple[int, int, int]] = set()
+    for fragment in fragments:
+        parts = _ASCII_RUN_RE.findall(fragment) if fold_ascii_only else [fragment]
+        for part in parts:
+            wanted |= trigrams(part.encode())
+    return wanted
+
+
+class TrigramIndex:
+    """Trigram -> file bitmap, kept current by file mtimes and sizes."""
+
+    def __init__(self, agent_files: Path, path: Path) -> None:
+        self.agent_files = agent_files
+        self.path = path
+        # file id -> [source, stamp_a, stamp_b, is_text]; None for a free id
+        self.files: list[list | None] = []
+        self.postings: dict[tuple[int, int, int], int] = {}
+        if path.exists():
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError, struct.error):
+                self.files, self.postings = [], {}
+        self.ids = {entry[0]: i for i, entry in enumerate(self.files) if entry}
+        # Ids of deleted files, reused so bitmaps stay short.
+        self.free = [i for i, entry in enumerate(self.files) if entry is None]
+        self.watcher: Inotify | None = None
+        self.scanned = False
+        self.dirty = False
+        self.saved = 0.0
+
+    def _load(self) -> None:
+        data = self.path.read_bytes()
+        magic, version, header_len = struct.unpack_from("<4sII", data)
+        if magic != _MAGIC or version != INDEX_VERSION:
+            return
+        pos = 12
+        self.files = json.loads(data[pos:pos + header_len])["files"]
+        pos += header_len
+        postings = {}
+        while pos < len(data):
+            key, size = data[pos:pos + 3], struct.unpack_from("<I", data, pos + 3)[0]
+            pos += 7
+            postings[tuple(key)] = int.from_bytes(data[pos:pos + size], "little")
+            pos += size
+        self.postings = postings
+
+    def save(self) -> None:
+        """Persist the index; atomic, so readers never see a partial file."""
+        self.saved = time.monotonic()
+        if not self.dirty:
+            return
+        self.dirty = False
+        header = json.dumps({"files": self.files}, separators=(",", ":")).encode()
+        parts = [struct.pack("<4sII", _MAGIC, INDEX_VERSION, len(header)), header]
+        for key, mask in self.postings.items():
+            raw = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+            parts.append(bytes(key) + struct.pack("<I", len(raw)))
+            parts.append(raw)
+        # Per-process temp name: concurrent refreshes must not share it.
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(b"".join(parts))
+        os.replace(tmp, self.path)
+
+    def _current_sources(self) -> dict[str, tuple]:
+        """Source id -> change stamp for every file in the working copy."""
+        stamps: dict[str, tuple] = {}
+        root = str(self.agent_files)
+        archive_dir = archive.ARCHIVE_DIR.as_posix()
+        stack = [root]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue  # .jj, .git, editor and layout files
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                        if rel in (f"{archive_dir}/{archive.PACK_NAME}",
+                                   f"{archive_dir}/{archive.INDEX_NAME}"):
+                            continue
+                        st = entry.stat()
+                        stamps[rel] = (st.st_mtime_ns, st.st_size)
+        for slug, entry in archive.load_index(self.agent_files).items():
+            # A loose archive file for the slug is newer than its packed copy.
+            if f"{archive_dir}/TASK_{slug}.md" in stamps or f"{archive_dir}/{slug}.md" in stamps:
+                continue
+            stamps[f"pack:{slug}"] = (entry["offset"], entry["length"])
+        return stamps
+
+    def read(self, source: str) -> bytes:
+        if source.startswith("pack:"):
+            return archive.show(source[len("pack:"):], self.agent_files).content.encode()
+        return (self.agent_files / source).read_bytes()
+
+    def _index_file(self, source: str, stamp: tuple) -> tuple[int, set[tuple[int, int, int]]]:
+        """Assign source an id; returns it with the file's trigrams."""
+        try:
+            data = self.read(source)
+        except OSError:
+            data = b""
+        is_text = b"\0" not in data[:_SNIFF]
+        file_id = self.ids.get(source)
+        if file_id is None:
+            if self.free:
+                file_id = self.free.pop()
+            else:
+                file_id = len(self.files)
+                self.files.append(None)
+            self.ids[source] = file_id
+        self.files[file_id] = [source, *stamp, is_text]
+        return file_id, trigrams(data) if is_text else set()
+
+    def _watched_sources(self) -> dict[str, tuple] | None:
+        """Stamps from inotify events since the last call; None if none.
+
+        Only reported paths are stat'ed. Changes under tasks/_archive/ can
+        shadow or replace pack entries, so they trigger a full scan, as
+        does an event queue overflow.
+        """
+        changed = self.watcher.read(0)
+        if not changed:
+            return None
+        archive_dir = archive.ARCHIVE_DIR.as_posix() + "/"
+        if OVERFLOW in changed or any(rel.startswith(archive_dir) for rel in changed):
+            return self._current_sources()
+        current = {source: tuple(self.files[i][1:3]) for source, i in self.ids.items()}
+        for rel in changed:
+            if any(part.startswith(".") for part in rel.split("/")):
+                continue
+            try:
+                st = os.stat(self.agent_files / rel)
+            except OSError:
+                current.pop(rel, None)
+                continue
+            if stat.S_ISREG(st.st_mode):
+                current[rel] = (st.st_mtime_ns, st.st_size)
+        return current
+
+    def refresh(self) -> bool:
+        """Re-index changed files; returns True if anything changed.
+
+        The first refresh in a process stats every file. A process that
+        searches again (the MCP server) starts an inotify watch first and
+        from then on only looks at files the watch reported.
+        """
+        if self.watcher is not None:
+            current = self._watched_sources()
+            if current is None:
+                return False
+        else:
+            if self.scanned:
+                try:
+                    self.watcher = Inotify(self.agent_files)
+                except OSError:
+                    pass  # not Linux, or out of watches: keep stat'ing
+            current = self._current_sources()
+            self.scanned = True
+        stale = [
+            i for source, i in self.ids.items()
+            if tuple(self.files[i][1:3]) != current.get(source)
+        ]
+        added = [source for source in current if source not in self.ids]
+        if not stale and not added:
+            return False
+
+        if not self.postings or len(stale) + len(added) > _REBUILD_SHARE * len(current):
+            self._rebuild(current)
+        else:
+            mask = _bitmap(stale) if stale else 0
+            if mask:
+                keep = ~mask
+                postings = {}
+                for key, bits in self.postings.items():
+                    bits &= keep
+                    if bits:
+                        postings[key] = bits
+                self.postings = postings
+            for i in stale:
+                source = self.files[i][0]
+                if source not in current:
+                    del self.ids[source]
+                    self.files[i] = None
+                    self.free.append(i)
+            for source in [self.files[i][0] for i in stale if self.files[i]] + added:
+                file_id, keys = self._index_file(source, current[source])
+                bit = 1 << file_id
+                for key in keys:
+                    self.postings[key] = self.postings.get(key, 0) | bit
+        self.dirty = True
+        if self.watcher is None or time.monotonic() - self.saved > SAVE_INTERVAL:
+            self.save()
+        return True
+
+    def _rebuild(self, current: dict[str, tuple]) -> None:
+        self.files, self.ids, self.free = [], {}, []
+        ids_by_key: defaultdict[tuple, list[int]] = defaultdict(list)
+        for source in sorted(current):
+            file_id, keys = self._index_file(source, current[source])
+            # Append file_id to every key's list without a Python-level loop.
+            deque(map(list.append, map(ids_by_key.__getitem__, keys), repeat(file_id)), maxlen=0)
+        self.postings = {key: _bitmap(ids) for key, ids in ids_by_key.items()}
+
+    def candidates(self, wanted: set[tuple[int, int, int]]) -> list[str]:
+        """Text files containing every trigram in wanted, sorted by path."""
+        mask = -1
+        for key in wanted:
+            mask &= self.postings.get(key, 0)
+            if not mask:
+                return []
+        if mask == -1:
+            ids = range(len(self.files))
+        else:
+            ids = _bits(mask)
+        return sorted(
+            self.files[i][0] for i in ids if self.files[i] and self.files[i][3]
+        )
+
+
+def _index_path(agent_files: Path) -> Path:
+    return taskman_state_dir(agent_files) / f"grep-{workspace_key(agent_files)}.idx"
+
+
+def load(agent_files: Path) -> TrigramIndex:
+    index = _cache.get(agent_files)
+    if index is None:
+        index = TrigramIndex(agent_files, _index_path(agent_files))
+        _cache[agent_files] = index
+        # Watched indexes save at most every SAVE_INTERVAL; flush the rest.
+        atexit.register(index.save)
+    index.refresh()
+    return index
+
+
+def _cut(line: str) -> str:
+    return line if len(line) <= LINE_CHARS else line[:LINE_CHARS] + "..."
+
+
+def grep(
+    pattern: str,
+    regex: bool = False,
+    ignore_case: bool = False,
+    context: int = 0,
+    path: str | None = None,
+    limit: int = 100,
+    agent_files: Path | None = None,
+) -> GrepResult:
+    """Lines matching pattern in the current .agent-files working copy.
+
+    `pattern` is a literal string unless `regex` is set. `path` is a glob
+    over paths relative to .agent-files/ (`topics/*`, `tasks/*auth*`);
+    packed archive entries are named `pack:<slug>`. `context` adds that
+    many lines before and after each match. Stops after `limit` matches.
+    """
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+    except re.error as e:
+        raise ValueError(f"invalid regex {pattern!r}: {e}") from None
+    if regex:
+        wanted = _query_trigrams(required_literals(pattern), fold_ascii_only=True)
+    else:
+        wanted = _query_trigrams([pattern], fold_ascii_only=ignore_case)
+
+    index = load(agent_files)
+    sources = index.candidates(wanted)
+    if path:
+        sources = [source for source in sources if fnmatch.fnmatch(source, path)]
+
+    result = GrepResult(pattern=pattern, files=len(index.ids), candidates=len(sources))
+    for source in sources:
+        try:
+            text = index.read(source).decode("utf-8", errors="replace")
+        except OSError:
+            continue
+        if not regex and not ignore_case and pattern not in text:
+            continue
+        lines = text.splitlines()
+        for n, line in enumerate(lines):
+            if not compiled.search(line):
+                continue
+            if len(result.matches) == limit:
+                result.truncated = True
+                return result
+            result.matches.append(GrepMatch(
+                path=source,
+                line=n + 1,
+                text=_cut(line),
+                before=[_cut(ln) for ln in lines[max(0, n - context):n]],
+                after=[_cut(ln) for ln in lines[n + 1:n + 1 + context]],
+            ))
+    return result
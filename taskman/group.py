@@ -0,0 +1,106 @@
+"""Group commit: coalesce concurrent requests into one batched pass.
+
+Callers drop a request file into a queue directory shared by every
+workspace. Whoever takes the leader flock waits a short window for more
+requests to arrive, processes everything queued in one pass and writes a
+response file per request. Other callers poll for their response and take
+over as leader if theirs was queued after the last pass started.
+
+Requests and responses are written to a temp name and renamed, so a reader
+never sees a partial file. A leader that crashes releases its flock; the
+next caller becomes leader and picks up whatever is still queued.
+"""
+
+import fcntl
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+_POLL = 0.005
+
+
+def _write_atomic(path: Path, data: dict) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _lead(
+    queue: Path,
+    window: float,
+    process: Callable[[list[dict]], list[dict]],
+) -> None:
+    """Collect requests for `window` seconds, then answer all of them."""
+    time.sleep(window)
+    files = sorted(queue.glob("*.req"))
+    requests = []
+    for path in files:
+        try:
+            requests.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError):
+            path.unlink(missing_ok=True)
+    files = [queue / f"{req['id']}.req" for req in requests]
+    if not requests:
+        return
+    try:
+        responses = process(requests)
+    except Exception as e:  # noqa: BLE001 - every waiter must get an answer
+        responses = [{"error": str(e)} for _ in requests]
+    for path, response in zip(files, responses):
+        _write_atomic(path.with_suffix(".res"), response)
+        path.unlink(missing_ok=True)
+
+
+def submit(
+    queue: Path,
+    request: dict,
+    window: float,
+    process: Callable[[list[dict]], list[dict]],
+    timeout: float,
+) -> dict:
+    """Queue one request and return its response.
+
+    `process` receives every queued request (each with an "id" and a
+    "queued" timestamp added) and must return one response dict per request,
+    in order. A response with an "error" key is raised as RuntimeError.
+    """
+    queue.mkdir(parents=True, exist_ok=True)
+    ticket = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    req_path = queue / f"{ticket}.req"
+    res_path = queue / f"{ticket}.res"
+    _write_atomic(req_path, {**request, "id": ticket, "queued": time.time()})
+
+    deadline = time.monotonic() + timeout
+    fd = os.open(queue / "leader.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        while not res_path.exists():
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                pass
+            else:
+                try:
+                    if not res_path.exists():
+                        if not req_path.exists():
+                            raise RuntimeError(
+                                "group sync leader exited before answering; run sync again"
+                            )
+                        _lead(queue, window, process)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                continue
+            if time.monotonic() > deadline:
+                req_path.unlink(missing_ok=True)
+                raise TimeoutError(f"timed out after {timeout:.0f}s waiting for group sync")
+            time.sleep(_POLL)
+    finally:
+        os.close(fd)
+
+    response = json.loads(res_path.read_text(encoding="utf-8"))
+    res_path.unlink(missing_ok=True)
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response
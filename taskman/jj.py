@@ -1,59 +1,122 @@
+import hashlib
+import random
+import re
 import shlex
-import subprocess
+import time
 from pathlib import Path
+from typing import Iterator
 
+from taskman import process
 
-def run_jj(args: list[str], cwd: Path) -> tuple[int, str, str]:
+# Failures caused by another process holding a jj/git lock or racing the
+# same operation. The command made no change, so running it again is safe.
+_TRANSIENT_ERRORS = re.compile(
+    r"failed to lock"
+    r"|could not acquire lock"
+    r"|concurrent checkout"
+    r"|concurrent modification(?!.*resolving automatically)"
+    r"|cannot lock ref"
+    r"|index\.lock'?: file exists"
+    r"|resource temporarily unavailable",
+    re.IGNORECASE,
+)
+
+JJ_RETRIES = 5
+_RETRY_BASE = 0.05
+_RETRY_CAP = 2.0
+
+
+def _is_transient(stderr: str) -> bool:
+    return _TRANSIENT_ERRORS.search(stderr) is not None
+
+
+def _retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff, so retrying agents spread out."""
+    return random.uniform(0, min(_RETRY_CAP, _RETRY_BASE * 2 ** attempt))
+
+
+def run_jj(
+    args: list[str],
+    cwd: Path,
+    *,
+    retries: int = JJ_RETRIES,
+    timeout: float | None = None,
+) -> tuple[int, str, str]:
     """Run jj command with git conflict style.
 
     Uses --config-toml when supported, otherwise falls back to --config.
-    Uses subprocess.run() - no async needed for sequential CLI commands.
+    Runs through taskman.process: jj is killed (with its process group)
+    after `timeout` seconds, by default the limit for the command's class
+    (read/write/network/maintenance, see process.TIMEOUTS), or when the
+    surrounding cancel scope is cancelled. Lock and concurrent-modification
+    errors are retried up to `retries` times with jittered backoff.
 
     Returns: (returncode, stdout, stderr)
-    Raises: RuntimeError if returncode != 0
+    Raises: RuntimeError if returncode != 0 or cancelled, TimeoutError on timeout
     """
-    cmd_toml = [
+    cmd = [
         "jj",
         "--config-toml",
         'ui.conflict-marker-style = "git"',
         *args,
     ]
-    proc = subprocess.run(
-        cmd_toml,
-        cwd=str(cwd),
-        text=True,
-        capture_output=True,
-    )
-    if proc.returncode != 0 and "unexpected argument '--config-toml'" in proc.stderr:
-        cmd_legacy = [
-            "jj",
-            "--config",
-            "ui.conflict-marker-style=git",
-            *args,
-        ]
-        proc = subprocess.run(
-            cmd_legacy,
-            cwd=str(cwd),
-            text=True,
-            capture_output=True,
-        )
-        if proc.returncode != 0:
+    attempt = 0
+    while True:
+        returncode, stdout, stderr = process.run(cmd, cwd, timeout=timeout)
+        if returncode == 0:
+            return returncode, stdout, stderr
+        if cmd[1] == "--config-toml" and "unexpected argument '--config-toml'" in stderr:
+            cmd = [
+                "jj",
+                "--config",
+                "ui.conflict-marker-style=git",
+                *args,
+            ]
+            continue
+        if attempt >= retries or not _is_transient(stderr):
             message = (
-                f"jj command failed ({proc.returncode}): {shlex.join(cmd_legacy)}\n"
-                f"stdout:\n{proc.stdout}\n"
-                f"stderr:\n{proc.stderr}"
+                f"jj command failed ({returncode}): {shlex.join(cmd)}\n"
+                f"stdout:\n{stdout}\n"
+                f"stderr:\n{stderr}"
             )
             raise RuntimeError(message)
-        return proc.returncode, proc.stdout, proc.stderr
+        time.sleep(_retry_delay(attempt))
+        attempt += 1
+
+
+def iter_jj_lines(args: list[str], cwd: Path, *, timeout: float | None = None) -> Iterator[str]:
+    """Run a read-only jj command and yield its stdout line by line.
+
+    Output is consumed as jj produces it, so callers can act on the first
+    line before the command finishes. No retries: lines may already have
+    been handed out. Closing the generator early kills jj. Timeouts and
+    cancellation as in run_jj.
 
-    if proc.returncode != 0:
-        message = (
-            f"jj command failed ({proc.returncode}): {shlex.join(cmd_toml)}\n"
-            f"stdout:\n{proc.stdout}\n"
-            f"stderr:\n{proc.stderr}"
+    Raises: RuntimeError if jj exits non-zero
+    """
+    for config in (["--config-toml", 'ui.conflict-marker-style = "git"'],
+                   ["--config", "ui.conflict-marker-style=git"]):
+        cmd = ["jj", *config, *args]
+        lines = process.iter_lines(cmd, cwd, timeout=timeout)
+        produced = False
+        try:
+            while True:
+                try:
+                    line = next(lines)
+                except StopIteration as stop:
+                    returncode, stderr = stop.value
+                    break
+                produced = True
+                yield line
+        finally:
+            lines.close()
+        if returncode == 0:
+            return
+        if not produced and "unexpected argument '--config-toml'" in stderr:
+            continue
+        raise RuntimeError(
+            f"jj command failed ({returncode}): {shlex.join(cmd)}\nstderr:\n{stderr}"
         )
-        raise RuntimeError(message)
-    return proc.returncode, proc.stdout, proc.stderr
 
 
 def find_agent_files_dir(start: Path | None = None) -> Path:
@@ -74,3 +137,55 @@ def find_agent_files_dir(start: Path | None = None) -> Path:
         current = current.parent
 
     raise FileNotFoundError(".agent-files directory not found")
+
+
+def find_repo_dir(agent_files: Path) -> Path:
+    """Resolve the shared .jj/repo directory for a workspace.
+
+    Main workspaces have .jj/repo as a directory; linked workspaces have a
+    .jj/repo file containing the path to the main one.
+    """
+    repo = agent_files / ".jj" / "repo"
+    if repo.is_file():
+        pointer = Path(repo.read_text().strip())
+        if not pointer.is_absolute():
+            pointer = (repo.parent / pointer).resolve()
+        return pointer
+    if repo.is_dir():
+        return repo
+    raise FileNotFoundError(f"jj repo not found under {agent_files}")
+
+
+def find_git_dir(agent_files: Path) -> Path:
+    """Locate the git object store backing the jj repo.
+
+    Non-colocated repos keep it at .jj/repo/store/git; colocated ones point
+    at the workspace .git via store/git_target.
+    """
+    store = find_repo_dir(agent_files) / "store"
+    target = store / "git_target"
+    if not target.is_file():
+        raise FileNotFoundError(f"jj repo at {store.parent} has no git backend")
+    git_dir = Path(target.read_text().strip())
+    if not git_dir.is_absolute():
+        git_dir = (store / git_dir).resolve()
+    return git_dir
+
+
+def taskman_state_dir(agent_files: Path) -> Path:
+    """Directory for taskman caches and indexes, shared by all workspaces.
+
+    Lives inside .jj/repo so it is never snapshotted into history.
+    """
+    state = find_repo_dir(agent_files) / "taskman"
+    state.mkdir(parents=True, exist_ok=True)
+    return state
+
+
+def workspace_key(agent_files: Path) -> str:
+    """Short stable id of a workspace, for state files that are per workspace.
+
+    Indexes of working-copy files go under taskman_state_dir with this key in
+    their name: workspaces can hold different files until they sync.
+    """
+    return hashlib.sha1(str(agent_files.resolve()).encode()).hexdigest()[:12]
@@ -0,0 +1,143 @@
+"""Repo-wide write lock shared by every workspace of the .agent-files repo.
+
+Mutating sequences (describe, sync, worktree cleanup, auto-checkpoints) run
+under this lock so concurrent agents queue up instead of racing jj into
+divergent operations. Waiters are served in arrival order: each one drops
+a ticket file into the queue directory and proceeds once no live ticket
+sorts ahead of it.
+
+A ticket is "live" while its owner holds a flock on it. The kernel drops
+that flock when the owner exits, so tickets left by crashed processes are
+recognized and removed by the next waiter instead of blocking the queue.
+"""
+
+import fcntl
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from taskman.jj import taskman_state_dir
+
+QUEUE_DIR = "lock-queue"
+DEFAULT_TIMEOUT = float(os.environ.get("TASKMAN_LOCK_TIMEOUT", "300"))
+
+_POLL_MIN = 0.005
+_POLL_MAX = 0.1
+
+# Held locks in this process: queue dir -> (thread id, depth). Lets nested
+# mutating calls (e.g. sync inside a larger sequence) re-enter for free.
+_held: dict[Path, tuple[int, int]] = {}
+_held_guard = threading.Lock()
+
+
+@dataclass
+class LockInfo:
+    # Seconds spent queued before the lock was granted.
+    waited: float = 0.0
+
+
+def _ticket_name() -> str:
+    # Wall-clock nanoseconds order tickets across processes; pid and a
+    # random suffix break ties.
+    return f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _is_live(path: Path) -> bool:
+    """True if some process still holds the flock on a ticket."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+def _take_ticket(queue: Path) -> tuple[Path, int]:
+    """Create a flocked ticket in the queue and return (path, fd).
+
+    The ticket is locked under a temp name and renamed into place, so no
+    waiter ever sees an unlocked ticket and mistakes it for a dead one.
+    """
+    name = _ticket_name()
+    tmp = queue / f".{name}.tmp"
+    fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    ticket = queue / name
+    os.rename(tmp, ticket)
+    return ticket, fd
+
+
+def _ahead(queue: Path, ticket: Path) -> bool:
+    """True while a live ticket sorts before ours; reaps dead ones."""
+    for entry in sorted(queue.iterdir()):
+        if entry.name >= ticket.name:
+            return False
+        if entry.name.startswith("."):
+            continue
+        if _is_live(entry):
+            return True
+        entry.unlink(missing_ok=True)
+    return False
+
+
+@contextmanager
+def repo_lock(agent_files: Path, timeout: float | None = None) -> Iterator[LockInfo]:
+    """Hold the repo-wide write lock for the duration of the block.
+
+    Raises TimeoutError if the lock is not granted within `timeout` seconds
+    (default TASKMAN_LOCK_TIMEOUT, 300).
+    """
+    queue = taskman_state_dir(agent_files) / QUEUE_DIR
+    queue.mkdir(exist_ok=True)
+    me = threading.get_ident()
+
+    with _held_guard:
+        owner, depth = _held.get(queue, (None, 0))
+        if owner == me:
+            _held[queue] = (me, depth + 1)
+            reentered = True
+        else:
+            reentered = False
+    if reentered:
+        try:
+            yield LockInfo()
+        finally:
+            with _held_guard:
+                _, depth = _held[queue]
+                _held[queue] = (me, depth - 1)
+        return
+
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    start = time.monotonic()
+    ticket, fd = _take_ticket(queue)
+    try:
+        delay = _POLL_MIN
+        while _ahead(queue, ticket):
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(
+                    f"timed out after {timeout:.0f}s waiting for the taskman repo lock "
+                    f"({queue})"
+                )
+            time.sleep(delay)
+            delay = min(_POLL_MAX, delay * 2)
+        info = LockInfo(waited=time.monotonic() - start)
+        with _held_guard:
+            _held[queue] = (me, 1)
+        try:
+            yield info
+        finally:
+            with _held_guard:
+                _held.pop(queue, None)
+    finally:
+        ticket.unlink(missing_ok=True)
+        os.close(fd)
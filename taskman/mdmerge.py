@@ -0,0 +1,353 @@
+"""Structure-aware three-way merge for the .agent-files markdown formats.
+
+Concurrent agents mostly add information: new checklist items, new
+attempts, new memory entries, new STATUS rows. Line-based merges turn
+those into conflicts. Here, files are split into `## ` sections and
+section bodies into keyed items, and the sides are merged by key:
+
+- task files: checklist items keyed by their text (a checked box wins),
+  `### Attempt` entries unioned and ordered by timestamp, `Field:` lines
+  keyed by field name
+- memory files (LONGTERM/MEDIUMTERM_MEM.md, topics/): entries unioned and
+  deduplicated ignoring whitespace
+- STATUS.md: task lines keyed by task slug
+
+An item changed differently on both sides is a true overlap, including a
+free-text line each side rewrote differently. The merge
+then returns None and the file keeps jj's conflict markers. The one
+exception is timestamped fields (`updated:`, `Last handoff:`), where the
+newer value wins.
+"""
+
+import re
+from collections import Counter
+from pathlib import PurePosixPath
+from typing import Callable, Hashable, TypeVar
+
+from taskman.conflicts import parse_conflicts
+
+T = TypeVar("T")
+
+_CHECK_RE = re.compile(r"^\s*[-*]\s+\[([ xX])\]\s+(.*\S)\s*$")
+_FIELD_RE = re.compile(r"^([A-Za-z][\w -]{0,40}):(?:\s|$)")
+_TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_ATTEMPT_TIME_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?")
+_TASK_SLUG_RE = re.compile(r"TASK_([\w-]+?)(?:\.md)?\b")
+_TABLE_ROW_RE = re.compile(r"^\|\s*([^|]*?)\s*\|")
+_WORD_RE = re.compile(r"\w")
+# First element of the key of an item identified by its neighbours.
+_BETWEEN = object()
+_BULLET_SLUG_RE = re.compile(r"^\s*[-*]\s+(?:\[[ xX]\]\s+)?\**`?([A-Za-z0-9][\w-]*)`?\**\s*[:\-–]")
+
+
+def file_kind(path: str) -> str | None:
+    """"status", "memory" or "task" for files with a known format, else None."""
+    p = PurePosixPath(path)
+    if p.suffix != ".md":
+        return None
+    if p.name == "STATUS.md":
+        return "status"
+    if p.name in ("LONGTERM_MEM.md", "MEDIUMTERM_MEM.md") or "topics" in p.parts:
+        return "memory"
+    if p.name.startswith("TASK_"):
+        return "task"
+    return None
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _line_key(line: str) -> Hashable | None:
+    if not _WORD_RE.search(line):
+        return None  # blank or separator line: identified by position
+    m = _CHECK_RE.match(line)
+    if m:
+        return ("check", _normalize(m.group(2)))
+    m = _FIELD_RE.match(line)
+    if m:
+        return ("field", m.group(1).lower())
+    return ("text", _normalize(line))
+
+
+def status_task(line: str) -> str | None:
+    """Slug of the task a STATUS.md line is about, or None.
+
+    Recognizes TASK_<slug> references, `- <slug>: ...` bullets and table
+    rows keyed by their first cell.
+    """
+    m = _TASK_SLUG_RE.search(line) or _BULLET_SLUG_RE.match(line)
+    if m:
+        return m.group(1)
+    m = _TABLE_ROW_RE.match(line)
+    if m and m.group(1) and not set(m.group(1)) <= set("-: "):
+        return m.group(1)
+    return None
+
+
+def _status_key(line: str) -> Hashable | None:
+    slug = status_task(line)
+    return ("task", slug) if slug is not None else _line_key(line)
+
+
+def _resolve_line(base: str | None, ours: str, theirs: str) -> str | None:
+    """Settle an item both sides changed, or None if they really disagree."""
+    if _normalize(ours) == _normalize(theirs):
+        return ours
+    a, b = _CHECK_RE.match(ours), _CHECK_RE.match(theirs)
+    if a and b and _normalize(a.group(2)) == _normalize(b.group(2)):
+        return ours if a.group(1) in "xX" else theirs
+    a, b = _FIELD_RE.match(ours), _FIELD_RE.match(theirs)
+    if a and b:
+        va, vb = ours[a.end():].strip(), theirs[b.end():].strip()
+        if _TIMESTAMP_RE.match(va) and _TIMESTAMP_RE.match(vb):
+            return ours if va >= vb else theirs
+    return None
+
+
+def _merge_keyed(
+    base: list[T],
+    ours: list[T],
+    theirs: list[T],
+    key: Callable[[T], Hashable | None],
+    resolve: Callable[[T | None, T, T], T | None],
+) -> list[T] | None:
+    """Three-way merge of item lists matched by key.
+
+    Items keep ours' order; items only theirs added are placed after the
+    nearest preceding item they share with ours (and after anything ours
+    added there). An item deleted on one side and untouched on the other
+    is dropped; deleted on one side and changed on the other, it is kept
+    (losing knowledge is worse than a duplicate). An item both sides
+    replaced with different items is an overlap, so the merge is None.
+
+    `key` returns None for items with no identity of their own (blank and
+    separator lines); those are identified by the keyed items around them.
+    """
+    def keyed(items: list[T], ref: dict | None = None) -> list[tuple[Hashable, T]]:
+        """(key, occurrence) per item.
+
+        A keyless item is keyed by the keyed items around it. On a side
+        (`ref` is the base), one whose neighbours changed takes the key of
+        an unclaimed base item that shares either neighbour, so editing
+        the line next to a separator does not duplicate the separator.
+        """
+        keys = [key(item) for item in items]
+        seen: Counter = Counter()
+        real: list[Hashable] = []
+        for k in keys:
+            real.append(None if k is None else (k, seen[k]))
+            if k is not None:
+                seen[k] += 1
+        following: list[Hashable] = []
+        after: Hashable = None
+        for k in reversed(real):
+            following.append(after)
+            after = k if k is not None else after
+        following.reverse()
+
+        # base items identified by position, by each of their neighbours
+        spare: dict[tuple, list] = {}
+        for rk in ref or ():
+            if isinstance(rk[0], tuple) and rk[0][:1] == (_BETWEEN,):
+                spare.setdefault((0, rk[0][1]), []).append(rk)
+                spare.setdefault((1, rk[0][2]), []).append(rk)
+        before: Hashable = None
+        for i, (k, after) in enumerate(zip(real, following)):
+            if k is None:
+                k = (_BETWEEN, before, after)
+                real[i] = (k, seen[k])
+                seen[k] += 1
+            else:
+                before = k
+        claimed = set(real) & set(ref or ())
+        out = []
+        for item, k in zip(items, real):
+            if k[0][:1] == (_BETWEEN,) and ref is not None and k not in ref:
+                _, before, after = k[0]
+                candidates = spare.get((0, before), []) + spare.get((1, after), [])
+                k = next((rk for rk in candidates if rk not in claimed), k)
+                claimed.add(k)
+            out.append((k, item))
+        return out
+
+    base_keyed = keyed(base)
+    b = dict(base_keyed)
+    o = keyed(ours, b)
+    t = keyed(theirs, b)
+    o_map, t_map = dict(o), dict(t)
+
+    def added(side: list[tuple[Hashable, T]]) -> dict[int, set]:
+        """Keys a side added, by the index of the base item they follow."""
+        gaps: dict[int, set] = {}
+        after = -1
+        for k, _ in side:
+            if k in b:
+                after = base_index[k]
+            else:
+                gaps.setdefault(after, set()).add(k)
+        return gaps
+
+    # An item gone from both sides, where each side put something different
+    # in its place, was edited two ways (keys follow the text).
+    base_index = {k: i for i, (k, _) in enumerate(base_keyed)}
+    o_added, t_added = added(o), added(t)
+    o_after = t_after = -1
+    for i, (k, _) in enumerate(base_keyed):
+        if k not in o_map and k not in t_map and k[0][:1] != (_BETWEEN,):
+            mine, other = o_added.get(o_after, set()), t_added.get(t_after, set())
+            if mine - other and other - mine:
+                return None
+        if k in o_map:
+            o_after = i
+        if k in t_map:
+            t_after = i
+
+    result: list[tuple[Hashable, T]] = []
+    for k, item in o:
+        if k in t_map:
+            other = t_map[k]
+            if other == item or other == b.get(k):
+                result.append((k, item))
+            elif item == b.get(k):
+                result.append((k, other))
+            else:
+                merged = resolve(b.get(k), item, other)
+                if merged is None:
+                    return None
+                result.append((k, merged))
+        elif k in b and item == b[k]:
+            continue
+        else:
+            result.append((k, item))
+
+    def past_ours_additions(position: int) -> int:
+        while position + 1 < len(result) and result[position + 1][0] not in t_map:
+            position += 1
+        return position
+
+    position = past_ours_additions(-1)
+    for k, item in t:
+        if k in o_map:
+            keys = [rk for rk, _ in result]
+            if k in keys:
+                position = past_ours_additions(keys.index(k))
+            continue
+        if k in b and item == b[k]:
+            continue
+        position += 1
+        result.insert(position, (k, item))
+    return [item for _, item in result]
+
+
+def _split(lines: list[str], prefix: str) -> list[tuple[str, tuple[str, ...]]]:
+    """Split lines into (heading, body) chunks; the preamble has heading ""."""
+    chunks: list[tuple[str, list[str]]] = [("", [])]
+    for line in lines:
+        if line.startswith(prefix):
+            chunks.append((line, []))
+        else:
+            chunks[-1][1].append(line)
+    return [(heading, tuple(body)) for heading, body in chunks if heading or body]
+
+
+def _join(chunks: list[tuple[str, tuple[str, ...]]]) -> list[str]:
+    lines: list[str] = []
+    for heading, body in chunks:
+        if heading:
+            lines.append(heading)
+        lines.extend(body)
+    return lines
+
+
+def _chunk_key(chunk: tuple[str, tuple[str, ...]]) -> Hashable:
+    return _normalize(chunk[0])
+
+
+def _attempt_time(chunk: tuple[str, tuple[str, ...]]) -> str:
+    m = _ATTEMPT_TIME_RE.search(chunk[0])
+    return m.group(0).replace("T", " ") if m else ""
+
+
+def _merge_lines(kind: str, base: list[str], ours: list[str], theirs: list[str]) -> list[str] | None:
+    key = _status_key if kind == "status" else _line_key
+    return _merge_keyed(base, ours, theirs, key, _resolve_line)
+
+
+def _merge_attempts(base: list[str], ours: list[str], theirs: list[str]) -> list[str] | None:
+    def resolve(b, o, t):
+        body = _merge_lines("task", list(b[1]) if b else [], list(o[1]), list(t[1]))
+        return None if body is None else (o[0], tuple(body))
+
+    chunks = _merge_keyed(
+        _split(base, "### "), _split(ours, "### "), _split(theirs, "### "), _chunk_key, resolve
+    )
+    if chunks is None:
+        return None
+    preamble = [c for c in chunks if not c[0]]
+    entries = [c for c in chunks if c[0]]
+    if entries and all(_attempt_time(c) for c in entries):
+        entries.sort(key=_attempt_time)
+        # Keep a blank line between entries when one side's last entry lacked it.
+        for i, (heading, body) in enumerate(entries[:-1]):
+            if body and body[-1].strip():
+                entries[i] = (heading, body + ("",))
+    return _join(preamble + entries)
+
+
+def merge(kind: str, base: str, ours: str, theirs: str) -> str | None:
+    """Merge three versions of a file of the given kind; None on overlap."""
+    def resolve(b, o, t):
+        base_body = list(b[1]) if b else []
+        if kind == "task" and o[0].strip().lower().startswith("## attempts"):
+            body = _merge_attempts(base_body, list(o[1]), list(t[1]))
+        else:
+            body = _merge_lines(kind, base_body, list(o[1]), list(t[1]))
+        return None if body is None else (o[0], tuple(body))
+
+    chunks = _merge_keyed(
+        _split(base.splitlines(), "## "),
+        _split(ours.splitlines(), "## "),
+        _split(theirs.splitlines(), "## "),
+        _chunk_key,
+        resolve,
+    )
+    if chunks is None:
+        return None
+    text = "\n".join(_join(chunks))
+    return text + "\n" if ours.endswith("\n") or theirs.endswith("\n") else text
+
+
+def rebuild_sides(text: str) -> tuple[str, str, str] | None:
+    """Recover (base, ours, theirs) from a file with git-style conflict markers."""
+    regions = parse_conflicts(text)
+    if not regions:
+        return None
+    lines = text.splitlines()
+    base: list[str] = []
+    ours: list[str] = []
+    theirs: list[str] = []
+    i = 0
+    for region in regions:
+        common = lines[i:region.start - 1]
+        for side in (base, ours, theirs):
+            side.extend(common)
+        base.extend(region.base.lines if region.base else [])
+        ours.extend(region.ours.lines)
+        theirs.extend(region.theirs.lines)
+        i = region.end
+    for side in (base, ours, theirs):
+        side.extend(lines[i:])
+    end = "\n" if text.endswith("\n") else ""
+    return "\n".join(base) + end, "\n".join(ours) + end, "\n".join(theirs) + end
+
+
+def merge_conflicted(path: str, text: str) -> str | None:
+    """Resolve a conflicted file of a known format, or None to leave it."""
+    kind = file_kind(path)
+    if kind is None:
+        return None
+    sides = rebuild_sides(text)
+    if sides is None:
+        return None
+    return merge(kind, *sides)
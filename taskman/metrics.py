@@ -0,0 +1,170 @@
+"""Per-tool metrics for the MCP server.
+
+Every tool call records its outcome (ok, error, cancelled), latency and
+the size of the result it returned (text and structured content), in
+bytes and approximate tokens (4 bytes per token, the same rule as the
+history output budgets). The
+registry is read through the `taskman://metrics` resource and can be
+written periodically to a Prometheus textfile for node-exporter's
+textfile collector (`taskman stdio --metrics-file PATH`).
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+# Latency histogram bounds in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Response size histogram bounds in bytes.
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 50_000, 100_000, 500_000)
+BYTES_PER_TOKEN = 4
+OUTCOMES = ("ok", "error", "cancelled")
+
+
+class _Histogram:
+    def __init__(self, bounds: tuple) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last: +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """(le, count) pairs as Prometheus expects, ending with +Inf."""
+        total = 0
+        rows = []
+        for bound, count in zip([*map(_number, self.bounds), "+Inf"], self.counts):
+            total += count
+            rows.append((bound, total))
+        return rows
+
+
+class _ToolStats:
+    def __init__(self) -> None:
+        self.calls = dict.fromkeys(OUTCOMES, 0)
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.size = _Histogram(SIZE_BUCKETS)
+
+
+def _number(value: float) -> str:
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """Thread-safe per-tool counters and histograms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tools: dict[str, _ToolStats] = {}
+        self.started = time.time()
+
+    def observe(self, tool: str, seconds: float, response_bytes: int, outcome: str) -> None:
+        with self._lock:
+            stats = self._tools.setdefault(tool, _ToolStats())
+            stats.calls[outcome] += 1
+            stats.latency.observe(seconds)
+            if outcome == "ok":
+                stats.size.observe(response_bytes)
+
+    def snapshot(self) -> dict:
+        """Plain-data view, served by the taskman://metrics resource."""
+        with self._lock:
+            tools = {}
+            for name, stats in sorted(self._tools.items()):
+                calls = sum(stats.calls.values())
+                tools[name] = {
+                    "calls": calls,
+                    **{outcome: stats.calls[outcome] for outcome in OUTCOMES},
+                    "seconds_total": round(stats.latency.sum, 6),
+                    "seconds_avg": round(stats.latency.sum / calls, 6) if calls else 0.0,
+                    "response_bytes": int(stats.size.sum),
+                    "response_tokens": int(stats.size.sum) // BYTES_PER_TOKEN,
+                    "latency_buckets": dict(stats.latency.cumulative()),
+                }
+            return {"started": self.started, "tools": tools}
+
+    def render_prometheus(self, labels: dict[str, str] | None = None) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        base = "".join(f',{key}="{_escape(value)}"' for key, value in (labels or {}).items())
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            tools = sorted(self._tools.items())
+            metric("taskman_tool_calls_total", "counter", "MCP tool calls by outcome.")
+            for name, stats in tools:
+                for outcome in OUTCOMES:
+                    lines.append(
+                        f'taskman_tool_calls_total{{tool="{name}",outcome="{outcome}"{base}}} '
+                        f"{stats.calls[outcome]}"
+                    )
+            for prefix, attr, help_text in (
+                ("taskman_tool_duration_seconds", "latency", "MCP tool call latency."),
+                ("taskman_tool_response_bytes", "size", "Bytes returned per call (text and structured content)."),
+            ):
+                metric(prefix, "histogram", help_text)
+                for name, stats in tools:
+                    hist = getattr(stats, attr)
+                    for le, count in hist.cumulative():
+                        lines.append(
+                            f'{prefix}_bucket{{tool="{name}",le="{le}"{base}}} {count}'
+                        )
+                    lines.append(f'{prefix}_sum{{tool="{name}"{base}}} {_number(hist.sum)}')
+                    lines.append(f'{prefix}_count{{tool="{name}"{base}}} {sum(hist.counts)}')
+            metric(
+                "taskman_tool_response_tokens_total", "counter",
+                f"Approximate tokens returned ({BYTES_PER_TOKEN} bytes per token).",
+            )
+            for name, stats in tools:
+                lines.append(
+                    f'taskman_tool_response_tokens_total{{tool="{name}"{base}}} '
+                    f"{int(stats.size.sum) // BYTES_PER_TOKEN}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path, labels: dict[str, str] | None = None) -> None:
+        """Write atomically, so the collector never reads a partial file."""
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.render_prometheus(labels), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+
+
+def start_textfile_writer(
+    path: Path,
+    interval: float,
+    labels: dict[str, str] | None = None,
+    registry: Registry = REGISTRY,
+) -> threading.Event:
+    """Rewrite `path` every `interval` seconds in a daemon thread.
+
+    Returns an event that stops the writer.
+    """
+    stop = threading.Event()
+
+    def loop() -> None:
+        while not stop.wait(interval):
+            try:
+                registry.write_textfile(path, labels)
+            except OSError:
+                pass  # a full disk or missing dir must not take the server down
+
+    threading.Thread(target=loop, name="taskman-metrics", daemon=True).start()
+    return stop
@@ -4,6 +4,7 @@ import shutil
 from pathlib import Path
 
 from taskman.jj import run_jj
+from taskman.results import Steps
 
 
 def _has_stale_remote(repo_path: Path) -> bool:
@@ -169,7 +170,7 @@ def _migrate_worktree(
         pass  # Bookmark may already exist
 
 
-def migrate() -> str:
+def migrate() -> Steps:
     """Migrate from old clone/push model to jj workspaces model.
 
     Old model: .agent-files.git/ (bare) + .agent-files/ (clone)
@@ -190,7 +191,7 @@ def migrate() -> str:
     agent_files = cwd / ".agent-files"
 
     if not agent_files.exists():
-        return "Error: .agent-files/ not found - cannot migrate"
+        return Steps(empty="Error: .agent-files/ not found - cannot migrate")
 
     # Check if there's anything to migrate
     has_bare = bare.exists()
@@ -201,7 +202,7 @@ def migrate() -> str:
     has_worktree_issues = bool(worktree_clones) or bool(worktree_broken) or bool(worktree_missing_git)
 
     if not has_bare and not has_stale_remote and not has_worktree_issues:
-        return "No migration needed - .agent-files.git/ not found"
+        return Steps(empty="No migration needed - .agent-files.git/ not found")
 
     # Sync worktree clones to bare before deleting (preserve their commits)
     result = ["Migration complete:"]
@@ -276,4 +277,4 @@ def migrate() -> str:
         for name, err in failed:
             result.append(f"  - worktrees/{name}: {err}")
 
-    return "\n".join(result)
+    return Steps(steps=result)
@@ -0,0 +1,392 @@
+"""Subprocess layer for every jj/git call: timeouts, cancellation, streaming.
+
+Each command runs in its own process group, so a timeout or a cancelled
+MCP request kills jj together with the git/ssh children it started.
+stdout and stderr are read as the command produces them through one
+selector loop (no full second copy of large output), and the deadline and
+cancellation flag are checked between reads.
+
+Timeouts depend on the kind of operation, see TIMEOUTS. Cancellation is
+scoped with `cancel_on(event)`: commands started inside the scope (in the
+same thread, or in pool workers wrapped with `in_caller_context`) are
+killed soon after the event is set.
+
+Long-lived request/response commands (`git cat-file --batch`) run through
+`Pipe`, under the same process groups, timeouts and cancellation.
+"""
+
+import codecs
+import contextvars
+import os
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Generator, Iterator
+
+# Seconds before a command is killed, per operation class. Override one
+# class with TASKMAN_TIMEOUT_<CLASS>, e.g. TASKMAN_TIMEOUT_NETWORK=1800;
+# 0 disables the timeout for that class.
+TIMEOUTS = {
+    "read": 300.0,          # log, diff, file show, cat-file, op log
+    "write": 600.0,         # describe, new, rebase, workspace/worktree add
+    "network": 900.0,       # git fetch, push, clone
+    "maintenance": 3600.0,  # jj util gc, op abandon, git repack
+}
+
+# Seconds between SIGTERM and SIGKILL for the process group.
+KILL_GRACE = 2.0
+# How often a blocked read wakes up to check the deadline and cancellation.
+_POLL = 0.1
+_CHUNK = 64 * 1024
+
+# Options of jj/git that take a separate value, skipped when classifying.
+_VALUE_FLAGS = {
+    "--config-toml", "--config", "--config-file", "-R", "--repository",
+    "--at-op", "--at-operation", "--git-dir", "--work-tree", "-C", "-c",
+}
+_NETWORK = {"fetch", "push", "clone", "pull"}
+_MAINTENANCE = {"gc", "repack", "pack-refs", "prune", ("util", "gc"), ("op", "abandon")}
+_READS = {
+    "log", "diff", "show", "status", "st", "evolog", "interdiff", "version", "root",
+    "cat-file", "rev-parse", "ls-files", "for-each-ref",
+    ("op", "log"), ("op", "show"), ("workspace", "list"), ("worktree", "list"),
+    ("bookmark", "list"), ("file", "show"), ("file", "list"), ("file", "annotate"),
+    ("git", "remote"),
+}
+
+_cancel: contextvars.ContextVar[threading.Event | None] = contextvars.ContextVar(
+    "taskman_cancel", default=None
+)
+
+
+def classify(cmd: list[str]) -> str:
+    """Operation class of a jj or git command line (see TIMEOUTS)."""
+    words: list[str] = []
+    skip = False
+    for arg in cmd[1:]:
+        if skip:
+            skip = False
+        elif arg in _VALUE_FLAGS:
+            skip = True
+        elif not arg.startswith("-"):
+            words.append(arg)
+            if len(words) == 2:
+                break
+    if not words:
+        return "read"  # --version, --help
+    first, pair = words[0], tuple(words)
+    if first in _NETWORK or (first == "git" and len(words) > 1 and words[1] in _NETWORK):
+        return "network"
+    if first in _MAINTENANCE or pair in _MAINTENANCE:
+        return "maintenance"
+    if first in _READS or pair in _READS:
+        return "read"
+    return "write"
+
+
+def timeout_for(kind: str) -> float | None:
+    """Timeout in seconds for an operation class, None for no limit."""
+    value = os.environ.get(f"TASKMAN_TIMEOUT_{kind.upper()}")
+    seconds = float(value) if value else TIMEOUTS[kind]
+    return seconds if seconds > 0 else None
+
+
+@contextmanager
+def cancel_on(event: threading.Event) -> Iterator[None]:
+    """Kill commands started inside this scope once `event` is set."""
+    token = _cancel.set(event)
+    try:
+        yield
+    finally:
+        _cancel.reset(token)
+
+
+def in_caller_context(fn: Callable) -> Callable:
+    """Wrap fn so pool workers run it in the caller's context (and cancel scope)."""
+    ctx = contextvars.copy_context()
+    return lambda *args: ctx.copy().run(fn, *args)
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    """SIGTERM the command's process group, SIGKILL it after KILL_GRACE."""
+    for sig, grace in ((signal.SIGTERM, KILL_GRACE), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            proc.wait(grace)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    for pipe in (proc.stdin, proc.stdout, proc.stderr):
+        if pipe is not None:
+            pipe.close()
+
+
+def _check(
+    cmd: list[str],
+    deadline: float | None,
+    limit: float | None,
+    cancel: threading.Event | None,
+) -> float:
+    """Raise on timeout/cancellation; returns how long the next wait may block."""
+    if cancel is not None and cancel.is_set():
+        raise RuntimeError(f"command cancelled: {shlex.join(cmd)}")
+    if deadline is None:
+        return _POLL
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError(f"command timed out after {limit:g}s: {shlex.join(cmd)}")
+    return min(_POLL, left)
+
+
+def _pump(
+    proc: subprocess.Popen,
+    cmd: list[str],
+    input: bytes | None,
+    limit: float | None,
+    stderr: list[bytes],
+) -> Iterator[bytes]:
+    """Yield stdout chunks as they arrive; stderr chunks go to `stderr`.
+
+    Feeds `input` to stdin in the same loop, so neither side can block the
+    other on a full pipe.
+    """
+    deadline = None if limit is None else time.monotonic() + limit
+    cancel = _cancel.get()
+    pending = memoryview(input) if input is not None else None
+    with selectors.DefaultSelector() as sel:
+        if pending is not None:
+            if pending:
+                os.set_blocking(proc.stdin.fileno(), False)
+                sel.register(proc.stdin, selectors.EVENT_WRITE)
+            else:
+                proc.stdin.close()
+        sel.register(proc.stdout, selectors.EVENT_READ)
+        sel.register(proc.stderr, selectors.EVENT_READ)
+        while sel.get_map():
+            wait = _check(cmd, deadline, limit, cancel)
+            for key, _ in sel.select(wait):
+                if key.fileobj is proc.stdin:
+                    try:
+                        pending = pending[os.write(key.fd, pending[:_CHUNK]):]
+                    except BlockingIOError:
+                        continue
+                    except BrokenPipeError:
+                        pending = pending[:0]
+                    if not pending:
+                        sel.unregister(proc.stdin)
+                        proc.stdin.close()
+                    continue
+                chunk = os.read(key.fd, _CHUNK)
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                elif key.fileobj is proc.stdout:
+                    yield chunk
+                else:
+                    stderr.append(chunk)
+    while True:
+        wait = _check(cmd, deadline, limit, cancel)
+        try:
+            proc.wait(wait)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _start(cmd: list[str], cwd, input) -> subprocess.Popen:
+    return subprocess.Popen(
+        cmd,
+        cwd=str(cwd) if cwd is not None else None,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+
+
+def run(
+    cmd: list[str],
+    cwd=None,
+    *,
+    input: str | bytes | None = None,
+    timeout: float | None = None,
+    kind: str | None = None,
+    binary: bool = False,
+) -> tuple[int, str | bytes, str]:
+    """Run a command to completion; returns (returncode, stdout, stderr).
+
+    `timeout` defaults to the limit for the command's class (`kind`, or
+    classify(cmd)). stdout is collected in one buffer and decoded as
+    UTF-8 at the end unless `binary` is set.
+
+    Raises: TimeoutError past the deadline, RuntimeError when cancelled;
+    the whole process group is killed first in both cases.
+    """
+    limit = timeout if timeout is not None else timeout_for(kind or classify(cmd))
+    if isinstance(input, str):
+        input = input.encode()
+    proc = _start(cmd, cwd, input)
+    stderr: list[bytes] = []
+    raw = bytearray()
+    try:
+        for chunk in _pump(proc, cmd, input, limit, stderr):
+            raw += chunk
+    except BaseException:
+        _kill_group(proc)
+        raise
+    proc.stdout.close()
+    proc.stderr.close()
+    # One buffer grows in place; it is decoded once, with no list of parts.
+    out: str | bytes = bytes(raw) if binary else raw.decode("utf-8", errors="replace")
+    return proc.returncode, out, b"".join(stderr).decode(errors="replace")
+
+
+def iter_lines(
+    cmd: list[str],
+    cwd=None,
+    *,
+    timeout: float | None = None,
+    kind: str | None = None,
+) -> Generator[str, None, tuple[int, str]]:
+    """Yield stdout lines as the command prints them.
+
+    Returns (returncode, stderr) as the generator's value. Closing the
+    generator early kills the process group.
+    """
+    limit = timeout if timeout is not None else timeout_for(kind or classify(cmd))
+    proc = _start(cmd, cwd, None)
+    stderr: list[bytes] = []
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    tail = ""
+    try:
+        for chunk in _pump(proc, cmd, None, limit, stderr):
+            lines = (tail + decoder.decode(chunk)).splitlines(keepends=True)
+            tail = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+            yield from lines
+        tail += decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    except BaseException:
+        _kill_group(proc)
+        raise
+    proc.stdout.close()
+    proc.stderr.close()
+    return proc.returncode, b"".join(stderr).decode(errors="replace")
+
+
+class Pipe:
+    """A long-lived command answering requests on stdin/stdout.
+
+    For request/response commands such as `git cat-file --batch`. The
+    command runs in its own process group like every other call here.
+    Each exchange (a send and the reads that follow it) gets the command
+    class's timeout, and the cancel scope active while it runs applies.
+    On timeout or cancellation the process group is killed and the error
+    is raised, as in run().
+    """
+
+    def __init__(
+        self,
+        cmd: list[str],
+        cwd=None,
+        *,
+        timeout: float | None = None,
+        kind: str | None = None,
+    ) -> None:
+        self.cmd = cmd
+        self._limit = timeout if timeout is not None else timeout_for(kind or classify(cmd))
+        self._proc = subprocess.Popen(
+            cmd,
+            cwd=str(cwd) if cwd is not None else None,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        os.set_blocking(self._proc.stdin.fileno(), False)
+        self._buf = bytearray()
+        self._deadline: float | None = None
+        self._closed = False
+
+    def _wait(self, fileobj, event: int) -> None:
+        cancel = _cancel.get()
+        with selectors.DefaultSelector() as sel:
+            sel.register(fileobj, event)
+            while not sel.select(_check(self.cmd, self._deadline, self._limit, cancel)):
+                pass
+
+    def send(self, data: bytes) -> None:
+        """Write a request; starts the exchange's deadline."""
+        if self._limit is not None:
+            self._deadline = time.monotonic() + self._limit
+        pending = memoryview(data)
+        try:
+            while pending:
+                self._wait(self._proc.stdin, selectors.EVENT_WRITE)
+                try:
+                    pending = pending[os.write(self._proc.stdin.fileno(), pending[:_CHUNK]):]
+                except BlockingIOError:
+                    continue
+        except BaseException:
+            self.kill()
+            raise
+
+    def _fill(self) -> None:
+        self._wait(self._proc.stdout, selectors.EVENT_READ)
+        chunk = os.read(self._proc.stdout.fileno(), _CHUNK)
+        if not chunk:
+            raise RuntimeError(f"command exited ({self._proc.poll()}): {shlex.join(self.cmd)}")
+        self._buf += chunk
+
+    def _take(self, size: int) -> bytes:
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def readline(self) -> bytes:
+        """The next line of the response, with its newline."""
+        try:
+            while (end := self._buf.find(b"\n")) < 0:
+                self._fill()
+        except BaseException:
+            self.kill()
+            raise
+        return self._take(end + 1)
+
+    def read(self, size: int) -> bytes:
+        """Exactly `size` bytes of the response."""
+        try:
+            while len(self._buf) < size:
+                self._fill()
+        except BaseException:
+            self.kill()
+            raise
+        return self._take(size)
+
+    def kill(self) -> None:
+        if not self._closed:
+            self._closed = True
+            _kill_group(self._proc)
+
+    def close(self) -> int | None:
+        """Close stdin and wait for the command to exit; killed if it does not."""
+        if self._closed:
+            return self._proc.returncode
+        self._closed = True
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            _kill_group(self._proc)
+        else:
+            self._proc.stdout.close()
+        return self._proc.returncode
@@ -0,0 +1,221 @@
+"""Background push queue: ship workspace bookmarks to a git remote.
+
+`sync --push <remote>` only records "push bookmark X to remote R" in a
+queue file and makes sure a detached worker is running; the agent never
+waits on the network. Repeated syncs of the same bookmark coalesce into
+one queue entry, and the push sends wherever the bookmark points at that
+moment. Failed pushes are retried with capped exponential backoff; after
+MAX_ATTEMPTS failures the entry is parked as failed (shown by
+push-status) until the bookmark is synced again, so an unreachable remote
+does not keep the worker alive forever.
+
+The worker does not take the repo write lock: a slow remote must not
+block describe/sync. jj merges the push operation with concurrent ones,
+and run_jj retries transient lock errors.
+"""
+
+import fcntl
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+from taskman.jj import run_jj, taskman_state_dir
+from taskman.results import PushEntry, PushStatus
+
+QUEUE_NAME = "push-queue.json"
+QUEUE_LOCK = "push-queue.lock"
+WORKER_LOCK = "push-worker.lock"
+
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 300.0
+# Failures before an entry is parked (about 20 minutes of retries).
+MAX_ATTEMPTS = 12
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+@contextmanager
+def _queue(agent_files: Path) -> Iterator[dict]:
+    """Lock, load and (on exit) save the queue: bookmark -> entry."""
+    state = taskman_state_dir(agent_files)
+    fd = os.open(state / QUEUE_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        path = state / QUEUE_NAME
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            entries = {}
+        before = json.dumps(entries, sort_keys=True)
+        yield entries
+        if json.dumps(entries, sort_keys=True) != before:
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(entries, indent=1, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, path)
+    finally:
+        os.close(fd)
+
+
+def enqueue(agent_files: Path, bookmark: str, remote: str) -> int:
+    """Queue a push of bookmark to remote; returns the queue depth."""
+    now = time.time()
+    with _queue(agent_files) as entries:
+        entry = entries.get(bookmark)
+        if entry is None:
+            entries[bookmark] = {
+                "remote": remote,
+                "seq": 1,
+                "queued": now,
+                "attempts": 0,
+                "next_try": now,
+                "last_error": "",
+            }
+        elif entry.get("failed"):
+            # A new sync of a parked bookmark gets a fresh round of retries.
+            entry.update(remote=remote, seq=entry["seq"] + 1, attempts=0, next_try=now)
+            entry.pop("failed")
+        else:
+            # Coalesce: one push sends the latest position. Keep any backoff.
+            entry["remote"] = remote
+            entry["seq"] += 1
+            entry["coalesced"] = entry.get("coalesced", 0) + 1
+        return len(entries)
+
+
+def _jj_push(agent_files: Path, bookmark: str, remote: str) -> None:
+    run_jj(["git", "push", "--remote", remote, "-b", bookmark, "--allow-new"], agent_files)
+
+
+def run_due(
+    agent_files: Path,
+    push: Callable[[Path, str, str], None] = _jj_push,
+    now: float | None = None,
+) -> float | None:
+    """Push every due entry once.
+
+    Returns seconds until the next entry is due, or None if nothing is left
+    to retry (the queue is empty or holds only parked entries).
+    """
+    now = time.time() if now is None else now
+    with _queue(agent_files) as entries:
+        due = [
+            (bookmark, entry["remote"], entry["seq"])
+            for bookmark, entry in sorted(entries.items())
+            if not entry.get("failed") and entry["next_try"] <= now
+        ]
+
+    outcomes = []
+    for bookmark, remote, seq in due:
+        try:
+            push(agent_files, bookmark, remote)
+            outcomes.append((bookmark, seq, None))
+        except (RuntimeError, TimeoutError) as e:
+            outcomes.append((bookmark, seq, str(e)))
+
+    with _queue(agent_files) as entries:
+        for bookmark, seq, error in outcomes:
+            entry = entries.get(bookmark)
+            if entry is None:
+                continue
+            if error is None:
+                if entry["seq"] == seq:
+                    del entries[bookmark]
+                else:
+                    # Re-queued while pushing; push again right away.
+                    entry["attempts"] = 0
+                    entry["last_error"] = ""
+                continue
+            entry["attempts"] += 1
+            entry["next_try"] = now + _backoff(entry["attempts"])
+            lines = [line for line in error.splitlines() if line.strip()]
+            entry["last_error"] = lines[-1] if lines else error
+            if entry["attempts"] >= MAX_ATTEMPTS and entry["seq"] == seq:
+                entry["failed"] = True
+        pending = [entry["next_try"] for entry in entries.values() if not entry.get("failed")]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - time.time())
+
+
+def _try_worker_lock(agent_files: Path) -> int | None:
+    fd = os.open(taskman_state_dir(agent_files) / WORKER_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def worker_running(agent_files: Path) -> bool:
+    fd = _try_worker_lock(agent_files)
+    if fd is None:
+        return True
+    os.close(fd)
+    return False
+
+
+def work(agent_files: Path) -> None:
+    """Drain the queue, then exit. Only one worker runs per repo.
+
+    Parked entries do not keep the worker running.
+    """
+    while True:
+        fd = _try_worker_lock(agent_files)
+        if fd is None:
+            return
+        try:
+            while (wait := run_due(agent_files)) is not None:
+                time.sleep(wait)
+        finally:
+            os.close(fd)
+        # An enqueue may have landed after the last check while we still held
+        # the lock (its worker exited at once); look again before leaving.
+        with _queue(agent_files) as entries:
+            if all(entry.get("failed") for entry in entries.values()):
+                return
+
+
+def ensure_worker(agent_files: Path) -> None:
+    """Start a detached worker unless one is already draining the queue."""
+    if worker_running(agent_files):
+        return
+    subprocess.Popen(
+        [sys.executable, "-m", "taskman.push", str(agent_files)],
+        cwd=str(agent_files),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def status(agent_files: Path) -> PushStatus:
+    now = time.time()
+    with _queue(agent_files) as entries:
+        queued = [
+            PushEntry(
+                bookmark=bookmark,
+                remote=entry["remote"],
+                attempts=entry["attempts"],
+                coalesced=entry.get("coalesced", 0),
+                retry_in=round(max(0.0, entry["next_try"] - now), 1),
+                last_error=entry["last_error"],
+                failed=entry.get("failed", False),
+            )
+            for bookmark, entry in sorted(entries.items())
+        ]
+    return PushStatus(entries=queued, worker=worker_running(agent_files))
+
+
+if __name__ == "__main__":
+    work(Path(sys.argv[1]))
@@ -0,0 +1,658 @@
+"""Typed results for core operations.
+
+Every core operation returns one of these. str() renders the text agents
+and skills have always seen; to_dict() exposes the same data for
+`--json` output and MCP structured content.
+"""
+
+import abc
+from dataclasses import asdict, dataclass, field
+
+
+# Lock waits shorter than this are noise and left out of the text.
+LOCK_WAIT_SHOWN = 0.05
+
+
+def _lock_note(waited: float) -> str:
+    return f" (waited {waited:.2f}s for repo lock)" if waited >= LOCK_WAIT_SHOWN else ""
+
+
+@dataclass
+class Result(abc.ABC):
+    @abc.abstractmethod
+    def render(self) -> str:
+        ...
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+@dataclass
+class Message(Result):
+    """Plain confirmation with no further structure."""
+
+    message: str
+
+    def render(self) -> str:
+        return self.message
+
+
+@dataclass
+class Checkpoint(Result):
+    rev: str
+    reason: str
+    # Seconds spent queued for the repo write lock.
+    lock_wait: float = 0.0
+
+    def render(self) -> str:
+        return f"checkpoint {self.rev}: {self.reason}" + _lock_note(self.lock_wait)
+
+
+@dataclass
+class SyncResult(Result):
+    rev: str
+    workspace: str
+    # "moved", "created" or "failed"
+    bookmark: str
+    lock_wait: float = 0.0
+    # Number of syncs coalesced into the same pass (group commit).
+    group: int = 1
+    # Conflicted files resolved by the markdown merge before describing.
+    auto_merged: list[str] = field(default_factory=list)
+    # Remote the bookmark push was queued for ("" = no push).
+    push: str = ""
+
+    def render(self) -> str:
+        steps = [f"rev: {self.rev}"]
+        if self.bookmark == "moved":
+            steps.append(f"bookmark: {self.workspace} -> @")
+        elif self.bookmark == "created":
+            steps.append(f"bookmark: created {self.workspace}")
+        else:
+            steps.append("bookmark: failed")
+        if self.auto_merged:
+            steps.append(f"auto-merged: {', '.join(self.auto_merged)}")
+        if self.push:
+            steps.append(f"push: queued to {self.push}")
+        if self.lock_wait >= LOCK_WAIT_SHOWN:
+            steps.append(f"lock wait: {self.lock_wait:.2f}s")
+        return "\n".join(steps)
+
+
+@dataclass
+class Steps(Result):
+    """Multi-step operation report, one line per step taken."""
+
+    steps: list[str] = field(default_factory=list)
+    empty: str = ""
+
+    def render(self) -> str:
+        return "\n".join(self.steps) if self.steps else self.empty
+
+
+@dataclass
+class WorktreeRemoval(Steps):
+    name: str = ""
+    merged: bool = False
+
+
+@dataclass
+class WorkspaceCreated(Result):
+    name: str
+    path: str
+    message: str
+
+    def render(self) -> str:
+        return self.message
+
+
+@dataclass
+class WorktreeStatus(Result):
+    name: str
+    # "ok", "orphaned" or "missing"
+    git: str
+    jj_workspace: str
+    bookmark: bool
+
+    def render(self) -> str:
+        status = [f"git:{self.git}", f"jj-ws:{self.jj_workspace}"]
+        if self.bookmark:
+            status.append("bm:exists")
+        return f"{self.name}: {' '.join(status)}"
+
+
+@dataclass
+class WorktreeList(Result):
+    worktrees: list[WorktreeStatus] = field(default_factory=list)
+
+    def render(self) -> str:
+        if not self.worktrees:
+            return "No worktrees found"
+        return "\n".join(wt.render() for wt in self.worktrees)
+
+
+@dataclass
+class ConfigChange(Result):
+    """Install/uninstall of MCP config or skills."""
+
+    agent: str
+    path: str
+    changed: bool
+    message: str
+
+    def render(self) -> str:
+        return self.message
+
+
+@dataclass
+class Section:
+    """One unit of history output: its rendered text and its data."""
+
+    text: str
+    data: dict
+
+
+@dataclass
+class HistoryResult(Result):
+    """A page of history output.
+
+    `cursor` is set when output stopped at `max_bytes`; pass it back to
+    the same tool to continue. `message` is shown when there are no entries.
+    """
+
+    sections: list[Section] = field(default_factory=list)
+    cursor: str | None = None
+    max_bytes: int | None = None
+    message: str = ""
+
+    def render(self) -> str:
+        if not self.sections:
+            return self.message
+        lines = [section.text for section in self.sections]
+        if self.cursor is not None:
+            lines.append(
+                f"[truncated at {self.max_bytes} bytes; resume with cursor: {self.cursor}]"
+            )
+        return "\n".join(lines).rstrip()
+
+    def to_dict(self) -> dict:
+        data: dict = {"entries": [section.data for section in self.sections]}
+        if self.cursor is not None:
+            data["cursor"] = self.cursor
+        if self.message and not self.sections:
+            data["message"] = self.message
+        return data
+
+
+@dataclass
+class ArchivePack(Result):
+    count: int
+    raw_bytes: int
+    packed_bytes: int
+    pack: str
+    rev: str = ""
+    lock_wait: float = 0.0
+
+    def render(self) -> str:
+        if not self.count:
+            return "No archived tasks to pack"
+        return (
+            f"checkpoint {self.rev}: packed {self.count} archived task(s) into {self.pack} "
+            f"({self.raw_bytes} -> {self.packed_bytes} bytes)" + _lock_note(self.lock_wait)
+        )
+
+
+@dataclass
+class ArchivedTask(Result):
+    slug: str
+    content: str
+
+    def render(self) -> str:
+        return self.content
+
+
+@dataclass
+class ArchiveEntry(Result):
+    slug: str
+    title: str
+    completed: str
+
+    def render(self) -> str:
+        return f"{self.completed or '-':<10}  {self.slug}  {self.title}".rstrip()
+
+
+@dataclass
+class ArchiveList(Result):
+    entries: list[ArchiveEntry] = field(default_factory=list)
+
+    def render(self) -> str:
+        if not self.entries:
+            return "No archived tasks found"
+        return "\n".join(entry.render() for entry in self.entries)
+
+
+@dataclass
+class ConflictSide:
+    """One side of a conflict region; `start` is its first content line."""
+
+    label: str
+    start: int
+    lines: list[str]
+
+
+@dataclass
+class ConflictRegion:
+    """A conflict region spanning lines start..end (the marker lines)."""
+
+    start: int
+    end: int
+    ours: ConflictSide
+    theirs: ConflictSide
+    base: ConflictSide | None = None
+
+    def render(self) -> str:
+        def side(marker: str, s: ConflictSide) -> list[str]:
+            span = f"lines {s.start}-{s.start + len(s.lines) - 1}" if s.lines else "empty"
+            label = f" {s.label}" if s.label else ""
+            return [f"{marker}{label} ({span})", *s.lines]
+
+        out = side("<<<", self.ours)
+        if self.base is not None:
+            out += side("|||", self.base)
+        out += side(">>>", self.theirs)
+        return "\n".join(out)
+
+
+@dataclass
+class ConflictedFile(Result):
+    path: str
+    # jj's summary, e.g. "2-sided conflict"
+    kind: str
+    regions: list[ConflictRegion] = field(default_factory=list)
+
+    def render(self) -> str:
+        lines = [f"--- {self.path} ({self.kind})"]
+        for region in self.regions:
+            lines.append(f"@@ lines {region.start}-{region.end}")
+            lines.append(region.render())
+        return "\n".join(lines)
+
+
+@dataclass
+class ConflictedRevision(Result):
+    change: str
+    commit: str
+    workspaces: list[str]
+    description: str
+    files: list[ConflictedFile] = field(default_factory=list)
+
+    def render(self) -> str:
+        header = f"=== {self.change} ({self.commit[:12]})"
+        if self.workspaces:
+            header += f" [@ {', '.join(self.workspaces)}]"
+        if self.description:
+            header += f" {self.description}"
+        return "\n".join([header + " ==="] + [f.render() for f in self.files])
+
+
+@dataclass
+class ConflictInventory(Result):
+    revisions: list[ConflictedRevision] = field(default_factory=list)
+
+    def render(self) -> str:
+        if not self.revisions:
+            return "No conflicts"
+        return "\n\n".join(rev.render() for rev in self.revisions)
+
+
+@dataclass
+class AttemptMatch(Result):
+    source: str
+    title: str
+    header: str
+    approach: str
+    result: str
+    # Estimated Jaccard similarity of the attempt text, 0..1
+    score: float
+
+    def render(self) -> str:
+        lines = [f"{self.score:.2f}  {self.source}  {self.header}"]
+        if self.title:
+            lines.append(f"      task: {self.title}")
+        if self.approach:
+            lines.append(f"      approach: {self.approach}")
+        if self.result:
+            lines.append(f"      result: {self.result}")
+        return "\n".join(lines)
+
+
+@dataclass
+class AttemptMatches(Result):
+    query: str
+    indexed: int
+    matches: list[AttemptMatch] = field(default_factory=list)
+
+    def render(self) -> str:
+        if not self.matches:
+            return f"No similar attempts among {self.indexed} indexed"
+        return "\n".join(match.render() for match in self.matches)
+
+
+def _size(n: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+@dataclass
+class GcResult(Result):
+    # Empty, undescribed commits no workspace or bookmark builds on.
+    abandoned: int
+    # Operations older than the retention window dropped from the op log.
+    ops_trimmed: int
+    bytes_before: int
+    bytes_after: int
+    seconds: float
+    steps: list[str] = field(default_factory=list)
+    dry_run: bool = False
+    lock_wait: float = 0.0
+
+    def render(self) -> str:
+        lines = list(self.steps)
+        if self.dry_run:
+            lines.append(f"dry run: repo is {_size(self.bytes_before)}")
+        else:
+            reclaimed = self.bytes_before - self.bytes_after
+            lines.append(
+                f"reclaimed {_size(reclaimed)} ({_size(self.bytes_before)} -> "
+                f"{_size(self.bytes_after)}) in {self.seconds:.1f}s"
+                + _lock_note(self.lock_wait)
+            )
+        return "\n".join(lines)
+
+
+@dataclass
+class DoctorCheck(Result):
+    name: str
+    value: float | str
+    unit: str = ""
+    # Warn above this value (None = informational only).
+    threshold: float | None = None
+    # "ok" or "warn"
+    status: str = "ok"
+    # Command that brings the value back under the threshold.
+    fix: str = ""
+    detail: str = ""
+
+    def _fmt(self, value: float | str) -> str:
+        if self.unit == "B":
+            return _size(int(value))
+        if self.unit == "s":
+            return f"{value:.3f}s"
+        return str(value)
+
+    def render(self) -> str:
+        line = f"{self.status:<5} {self.name}: {self._fmt(self.value)}"
+        if self.threshold is not None:
+            line += f" (limit {self._fmt(self.threshold)})"
+        if self.detail:
+            line += f" [{self.detail}]"
+        if self.fix:
+            line += f"\n      fix: {self.fix}"
+        return line
+
+
+@dataclass
+class DoctorReport(Result):
+    checks: list[DoctorCheck] = field(default_factory=list)
+    # jj feature -> available in the installed jj
+    capabilities: dict[str, bool] = field(default_factory=dict)
+    perf: bool = False
+
+    @property
+    def warnings(self) -> int:
+        return sum(check.status == "warn" for check in self.checks)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "warnings": self.warnings}
+
+    def render(self) -> str:
+        lines = [check.render() for check in self.checks]
+        lines.append(f"{self.warnings} warning(s)" if self.warnings else "all checks ok")
+        return "\n".join(lines)
+
+
+@dataclass
+class PushEntry(Result):
+    bookmark: str
+    remote: str
+    attempts: int
+    # Extra syncs folded into this push since it was queued
+    coalesced: int
+    # Seconds until the next try (0 = due now)
+    retry_in: float
+    last_error: str
+    # Gave up after push.MAX_ATTEMPTS; retried only after the next sync
+    failed: bool = False
+
+    def render(self) -> str:
+        line = f"{self.bookmark} -> {self.remote}"
+        if self.coalesced:
+            line += f" (+{self.coalesced} coalesced)"
+        if self.failed:
+            line += f"  gave up after {self.attempts} attempts: {self.last_error}"
+        elif self.attempts:
+            line += f"  failed {self.attempts}x, retry in {self.retry_in:.0f}s: {self.last_error}"
+        return line
+
+
+@dataclass
+class PushStatus(Result):
+    entries: list[PushEntry] = field(default_factory=list)
+    worker: bool = False
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "depth": len(self.entries)}
+
+    def render(self) -> str:
+        worker = "running" if self.worker else "idle"
+        failed = sum(1 for entry in self.entries if entry.failed)
+        lines = [f"push queue: {len(self.entries) - failed} pending, worker {worker}"]
+        if failed:
+            lines[0] += f", {failed} failed (sync again to retry)"
+        lines += [f"  {entry.render()}" for entry in self.entries]
+        return "\n".join(lines)
+
+
+@dataclass
+class TimelineEntry(Result):
+    rev: str
+    commit: str
+    # Committer time (when the checkpoint was made), local "YYYY-MM-DD HH:MM"
+    time: str
+    author_time: str
+    # Workspaces whose working copy descended from the commit when indexed
+    workspaces: list[str]
+    description: str
+
+    def render(self) -> str:
+        where = f" [{', '.join(self.workspaces)}]" if self.workspaces else ""
+        return f"{self.time} {self.rev}{where} {self.description}".rstrip()
+
+
+@dataclass
+class TimelineResult(Result):
+    entries: list[TimelineEntry] = field(default_factory=list)
+    # Commits in the window, including any beyond the limit
+    total: int = 0
+
+    def render(self) -> str:
+        if not self.entries:
+            return "No checkpoints in that time range."
+        lines = [entry.render() for entry in self.entries]
+        if self.total > len(self.entries):
+            lines.append(f"... {self.total - len(self.entries)} older checkpoint(s) not shown")
+        return "\n".join(lines)
+
+
+@dataclass
+class TaskPath(Result):
+    slug: str
+    # Relative to .agent-files/; empty for a task that only exists in the pack
+    path: str
+    exists: bool
+    archived: bool = False
+    # "flat" or "sharded"
+    layout: str = "flat"
+
+    def render(self) -> str:
+        if self.archived and not self.path:
+            return f"{self.slug}: archived (taskman archive show {self.slug})"
+        if self.archived:
+            return f"{self.path} (archived)"
+        return self.path if self.exists else f"{self.path} (new)"
+
+
+@dataclass
+class TaskCompleted(Result):
+    slug: str
+    # Archived file, relative to .agent-files/
+    path: str
+    sync: SyncResult
+    # Open task to pick up next ("" = none left)
+    next: str = ""
+    next_path: str = ""
+
+    def render(self) -> str:
+        nxt = f"next: {self.next} ({self.next_path})" if self.next else "next: no open tasks"
+        return f"completed {self.slug} -> {self.path}\n{self.sync.render()}\n{nxt}"
+
+
+@dataclass
+class ReadyTask(Result):
+    slug: str
+    path: str
+    priority: str
+    status: str
+    title: str = ""
+    # Open tasks that list this one in Blocked-by/Depends-on
+    unblocks: int = 0
+
+    def render(self) -> str:
+        line = f"{self.priority or '-':<3} {self.slug}  {self.path}  [{self.status}]"
+        if self.unblocks:
+            line += f"  unblocks {self.unblocks}"
+        return line
+
+
+@dataclass
+class BlockedTask(Result):
+    slug: str
+    path: str
+    # Open tasks it still waits on
+    waiting_on: list[str] = field(default_factory=list)
+    # Dependencies naming no live or archived task
+    missing: list[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        reasons = []
+        if self.waiting_on:
+            reasons.append("waiting on " + ", ".join(self.waiting_on))
+        if self.missing:
+            reasons.append("unknown " + ", ".join(self.missing))
+        return f"{self.slug}  " + ("; ".join(reasons) or "Status: blocked")
+
+
+@dataclass
+class ReadyQueue(Result):
+    ready: list[ReadyTask] = field(default_factory=list)
+    blocked: list[BlockedTask] = field(default_factory=list)
+    # Groups of tasks that wait on each other
+    cycles: list[list[str]] = field(default_factory=list)
+    # Live tasks that are not complete
+    open: int = 0
+    # Ready tasks left out by the limit
+    truncated: int = 0
+
+    def render(self) -> str:
+        if not self.ready:
+            lines = [f"No ready tasks ({self.open} open)"]
+        else:
+            lines = [f"ready ({len(self.ready) + self.truncated} of {self.open} open):"]
+            lines += [f"  {task.render()}" for task in self.ready]
+            if self.truncated:
+                lines.append(f"  ... {self.truncated} more")
+        if self.blocked:
+            lines.append(f"blocked ({len(self.blocked)}):")
+            lines += [f"  {task.render()}" for task in self.blocked]
+        for cycle in self.cycles:
+            lines.append("dependency cycle: " + ", ".join(cycle))
+        return "\n".join(lines)
+
+
+@dataclass
+class ReshardResult(Result):
+    layout: str
+    # Task files moved to their path in the new layout
+    moved: int
+    # Markdown files whose tasks/... references were rewritten
+    rewritten: int
+    rev: str = ""
+    dry_run: bool = False
+    lock_wait: float = 0.0
+
+    def render(self) -> str:
+        if not self.moved and not self.rewritten and not self.rev:
+            return f"tasks/ already uses the {self.layout} layout"
+        if self.dry_run:
+            return (
+                f"would move {self.moved} task(s) to the {self.layout} layout "
+                f"and rewrite references in {self.rewritten} file(s)"
+            )
+        return (
+            f"checkpoint {self.rev}: moved {self.moved} task(s) to the {self.layout} layout, "
+            f"rewrote references in {self.rewritten} file(s)" + _lock_note(self.lock_wait)
+        )
+
+
+@dataclass
+class GrepMatch(Result):
+    # Relative to .agent-files/, or pack:<slug> for a packed archive entry
+    path: str
+    line: int
+    text: str
+    before: list[str] = field(default_factory=list)
+    after: list[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        first = self.line - len(self.before)
+        lines = [f"{self.path}-{first + i}-{text}" for i, text in enumerate(self.before)]
+        lines.append(f"{self.path}:{self.line}:{self.text}")
+        lines += [f"{self.path}-{self.line + 1 + i}-{text}" for i, text in enumerate(self.after)]
+        return "\n".join(lines)
+
+
+@dataclass
+class GrepResult(Result):
+    pattern: str
+    # Files in the index
+    files: int
+    # Files that passed the trigram prefilter and were read
+    candidates: int
+    matches: list[GrepMatch] = field(default_factory=list)
+    # Stopped at the match limit
+    truncated: bool = False
+
+    def render(self) -> str:
+        if not self.matches:
+            return f"No matches for {self.pattern!r} in {self.files} file(s)"
+        context = any(match.before or match.after for match in self.matches)
+        lines = ("\n--\n" if context else "\n").join(match.render() for match in self.matches)
+        if self.truncated:
+            lines += f"\n... stopped at {len(self.matches)} matches"
+        return lines
@@ -1,7 +1,48 @@
 import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from mcp.server.fastmcp import FastMCP
+from mcp.types import CallToolResult, TextContent
 
-from taskman import core
+from taskman import core, metrics, process
+from taskman.results import Result
+
+# Tools run one at a time, as before, but off the event loop: the server
+# keeps reading messages and can act on a client's cancellation.
+_tool_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="taskman-tool")
+
+
+async def _call_cancellable(fn, *args, **kwargs):
+    """Run a blocking tool in the tool thread.
+
+    If the request is cancelled, the jj/git command the tool is running is
+    killed (process.cancel_on) and the tool fails fast instead of finishing
+    work nobody will read.
+    """
+    cancelled = threading.Event()
+
+    def call():
+        with process.cancel_on(cancelled):
+            return fn(*args, **kwargs)
+
+    future = asyncio.get_running_loop().run_in_executor(_tool_thread, call)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+def _response_bytes(result) -> int:
+    """Bytes a tool result puts on the wire: text and structured content."""
+    if isinstance(result, CallToolResult):
+        return len(result.model_dump_json(exclude_none=True).encode())
+    return len(str(result).encode())
 
 
 class _SyncMCP:
@@ -11,6 +52,32 @@ class _SyncMCP:
     def list_tools(self):
         return asyncio.run(self._inner.list_tools())
 
+    def tool(self, *args, **kwargs):
+        """Register a plain function as a cancellable tool (see _call_cancellable)."""
+        register = self._inner.tool(*args, **kwargs)
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def run(*call_args, **call_kwargs):
+                started = time.perf_counter()
+                outcome, size = "error", 0
+                try:
+                    result = await _call_cancellable(fn, *call_args, **call_kwargs)
+                    outcome, size = "ok", _response_bytes(result)
+                    return result
+                except asyncio.CancelledError:
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    metrics.REGISTRY.observe(
+                        fn.__name__, time.perf_counter() - started, size, outcome
+                    )
+
+            register(run)
+            return fn
+
+        return decorator
+
     def __getattr__(self, name):
         return getattr(self._inner, name)
 
@@ -18,38 +85,274 @@ class _SyncMCP:
 mcp = _SyncMCP(FastMCP("taskman"))
 
 
+def _structured(result: Result) -> CallToolResult:
+    """Return the rendered text plus the same data as structured content."""
+    return CallToolResult(
+        content=[TextContent(type="text", text=str(result))],
+        structuredContent=result.to_dict(),
+    )
+
+
 @mcp.tool()
-def describe(reason: str) -> str:
+def describe(reason: str) -> CallToolResult:
     """Create named checkpoint."""
-    return core.describe(reason)
+    return _structured(core.describe(reason))
+
+
+# Seconds to collect concurrent syncs into one group-commit pass; 0 disables.
+# Set with `taskman stdio --group-window`.
+SYNC_GROUP_WINDOW = 0.0
+
+# Remote to queue background bookmark pushes to after each sync; None disables.
+# Set with `taskman stdio --push REMOTE`.
+PUSH_REMOTE: str | None = None
 
 
 @mcp.tool()
-def sync(reason: str) -> str:
+def sync(reason: str) -> CallToolResult:
     """Full sync: describe, fetch, rebase, push."""
-    return core.sync(reason)
+    return _structured(core.sync(
+        reason, group_window=SYNC_GROUP_WINDOW, push_remote=PUSH_REMOTE
+    ))
+
+
+@mcp.tool()
+def complete_task(slug: str, summary: str = "") -> CallToolResult:
+    """Complete a task in one checkpoint: mark it complete, archive it, update STATUS.md, sync.
+
+    summary is added to the task's ## Summary. Returns the new rev and the
+    next open task to pick up."""
+    return _structured(core.complete_task(slug, summary, push_remote=PUSH_REMOTE))
+
+
+@mcp.tool()
+def push_status() -> CallToolResult:
+    """Show pending background pushes (queue depth, retries, last errors)."""
+    return _structured(core.push_status())
 
 
 @mcp.tool()
-def history_diffs(file: str, start_rev: str, end_rev: str = "@") -> str:
-    """Get all diffs for file across revision range."""
-    return core.history_diffs(file, start_rev, end_rev)
+def conflicts() -> CallToolResult:
+    """List every conflicted revision and file across all workspaces.
+
+    Each file includes its parsed conflict regions (sides, base, line ranges)."""
+    return _structured(core.conflicts())
+
+
+# Default output budget for history tools, so one call cannot flood the
+# agent's context. Truncated results end with a cursor to fetch the rest.
+DEFAULT_MAX_BYTES = 50_000
 
 
 @mcp.tool()
-def history_batch(file: str, start_rev: str, end_rev: str = "@") -> str:
-    """Fetch file content at all revisions in range."""
-    return core.history_batch(file, start_rev, end_rev)
+def history_diffs(
+    file: str | list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cursor: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> CallToolResult:
+    """Get all diffs for file across revision range, grouped by revision.
+
+    file may be a path, a glob (tasks/TASK_auth*.md), a jj fileset, or a
+    list of them. `**` in a glob crosses directories, and tasks/TASK_*
+    globs also match sharded tasks/<prefix>/TASK_* files.
+    since/until ("yesterday", "6h", "2026-01-02 14:00") keep only
+    revisions made in that window.
+    Output is capped at max_bytes; pass the returned cursor to continue."""
+    return _structured(core.history_diffs(
+        file, start_rev, end_rev, max_bytes, cursor, since, until
+    ))
 
 
 @mcp.tool()
-def history_search(pattern: str, file: str | None = None, limit: int = 20) -> str:
-    """Search history for pattern in diffs."""
-    return core.history_search(pattern, file, limit)
+def history_batch(
+    file: str | list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cursor: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> CallToolResult:
+    """Fetch file content at all revisions in range, grouped by revision.
+
+    file may be a path or glob (tasks/TASK_auth*.md), or a list of them;
+    globs work as in history_diffs (`**`, both task layouts).
+    since/until filter revisions by time as in history_diffs.
+    Output is capped at max_bytes; pass the returned cursor to continue."""
+    return _structured(core.history_batch(
+        file, start_rev, end_rev, max_bytes, cursor, since, until
+    ))
+
+
+@mcp.tool()
+def history_search(
+    pattern: str,
+    file: str | None = None,
+    limit: int = 20,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cursor: str | None = None,
+) -> CallToolResult:
+    """Search history for pattern in diffs.
+
+    pattern takes jj's prefixes (substring:, exact:, glob:, regex:); a bare
+    pattern uses the installed jj's default kind.
+    Output is capped at max_bytes; pass the returned cursor to continue."""
+    return _structured(core.history_search(pattern, file, limit, max_bytes, cursor))
+
+
+@mcp.tool()
+def history_grep(
+    pattern: str,
+    paths: list[str],
+    start_rev: str = "root()",
+    end_rev: str = "@",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cursor: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> CallToolResult:
+    """Find matching lines (with rev ids and line numbers) in all versions of paths.
+
+    pattern takes substring:, exact:, glob: or regex:; a bare pattern is a
+    substring match (exact: and glob: match the whole line).
+    since/until filter revisions by time as in history_diffs.
+    Output is capped at max_bytes; pass the returned cursor to continue."""
+    return _structured(core.history_grep(
+        pattern, paths, start_rev, end_rev, max_bytes, cursor, since, until
+    ))
+
+
+@mcp.tool()
+def timeline(since: str | None = None, until: str | None = None, limit: int = 50) -> CallToolResult:
+    """List checkpoints made in a time window, newest first.
+
+    since/until accept ISO dates/times, "today", "yesterday" or ages like "6h", "2d"."""
+    return _structured(core.timeline(since, until, limit))
+
+
+@mcp.tool()
+def history_blame(
+    file: str,
+    rev: str = "@",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cursor: str | None = None,
+) -> CallToolResult:
+    """Attribute each line of file to the checkpoint that introduced it.
+
+    Output is capped at max_bytes; pass the returned cursor to continue."""
+    return _structured(core.history_blame(file, rev, max_bytes, cursor))
+
+
+@mcp.tool()
+def since_handoff(
+    agent_slug: str,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cursor: str | None = None,
+) -> CallToolResult:
+    """Per-file net diffs and stats in every workspace since agent_slug's last handoff.
+
+    Output is capped at max_bytes; pass the returned cursor to continue."""
+    return _structured(core.since_handoff(agent_slug, max_bytes, cursor))
+
+
+@mcp.tool()
+def grep(
+    pattern: str,
+    regex: bool = False,
+    ignore_case: bool = False,
+    context: int = 0,
+    path: str | None = None,
+    limit: int = 100,
+) -> CallToolResult:
+    """Search the current .agent-files (tasks, topics, handoffs, memory, archive).
+
+    pattern is literal unless regex is set. path is a glob relative to
+    .agent-files/ (e.g. "topics/*"). Uses a trigram index, so repeated
+    searches only re-read files that changed."""
+    return _structured(core.grep(pattern, regex, ignore_case, context, path, limit))
+
+
+@mcp.tool()
+def next_tasks(limit: int = 10) -> CallToolResult:
+    """Tasks ready to start: open, with every Blocked-by/Depends-on task complete.
+
+    Highest priority first, then in_progress before planned. Also lists
+    blocked tasks with what they wait on, and dependency cycles. Use this
+    to choose work instead of reading task files. limit caps the ready
+    list (0 = all)."""
+    return _structured(core.ready_queue(limit))
+
+
+@mcp.tool()
+def task_path(slug: str) -> CallToolResult:
+    """Resolve a task slug to its file path relative to .agent-files/.
+
+    Works for flat and sharded tasks/ layouts and archived tasks. For a new
+    slug, returns the path to create it at (exists=false)."""
+    return _structured(core.task_path(slug))
+
+
+@mcp.tool()
+def archive_show(slug: str) -> CallToolResult:
+    """Read one archived (completed) task by slug."""
+    return _structured(core.archive_show(slug))
+
+
+@mcp.tool()
+def archive_list(query: str | None = None) -> CallToolResult:
+    """List archived tasks, filtered by slug, title or completion date prefix."""
+    return _structured(core.archive_list(query))
+
+
+@mcp.tool()
+def similar_attempts(text: str, k: int = 5) -> CallToolResult:
+    """Find past task attempts similar to a planned approach.
+
+    Call before trying something, to see whether it was tried and how it
+    turned out. Covers live and archived tasks."""
+    return _structured(core.similar_attempts(text, k))
+
+
+@mcp.resource("taskman://metrics", mime_type="application/json")
+def tool_metrics() -> str:
+    """Per-tool call counts by outcome, latency and response size (bytes, ~tokens)."""
+    return json.dumps(metrics.REGISTRY.snapshot(), indent=2)
+
+
+def _agent_label() -> str:
+    """Who the metrics belong to: TASKMAN_AGENT, else the jj workspace name."""
+    agent = os.environ.get("TASKMAN_AGENT")
+    if agent:
+        return agent
+    try:
+        return core._current_workspace_name(core._agent_files_cwd())
+    except (FileNotFoundError, RuntimeError, TimeoutError):
+        return "unknown"
 
 
-def main() -> None:
-    mcp.run()
+def main(
+    group_window: float = 0.0,
+    push_remote: str | None = None,
+    metrics_file: Path | None = None,
+    metrics_interval: float = 15.0,
+) -> None:
+    global SYNC_GROUP_WINDOW, PUSH_REMOTE
+    SYNC_GROUP_WINDOW = group_window
+    PUSH_REMOTE = push_remote
+    if metrics_file is None:
+        mcp.run()
+        return
+    labels = {"agent": _agent_label()}
+    stop = metrics.start_textfile_writer(metrics_file, metrics_interval, labels)
+    try:
+        mcp.run()
+    finally:
+        stop.set()
+        metrics.REGISTRY.write_textfile(metrics_file, labels)
 
 
 if __name__ == "__main__":
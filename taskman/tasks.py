@@ -0,0 +1,347 @@
+"""Task file layout: flat or sharded tasks/, slug -> path resolution.
+
+Flat (the default) keeps every task in tasks/TASK_<slug>.md. The sharded
+layout, enabled by a `tasks/.layout` file containing "sharded", puts each
+task under a directory named after the first two characters of its slug:
+tasks/<prefix>/TASK_<slug>.md. Directory listings and jj snapshots then
+touch one small shard instead of thousands of entries.
+
+`task_path(slug)` checks the canonical path for the current layout first
+(one stat). Tasks that live anywhere else under tasks/ are found through
+a slug -> path index in .jj/repo/taskman, refreshed by comparing
+directory mtimes so only directories that changed are listed again.
+`reshard()` moves an existing repo between layouts in one checkpoint.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+from taskman import archive
+from taskman.jj import find_agent_files_dir, run_jj, taskman_state_dir, workspace_key
+from taskman.lock import repo_lock
+from taskman.results import ReshardResult, TaskPath
+
+TASKS_DIR = "tasks"
+LAYOUT_FILE = ".layout"
+LAYOUTS = ("flat", "sharded")
+INDEX_VERSION = 1
+PREFIX_LEN = 2
+
+# tasks/TASK_<slug>.md or tasks/<dir>/TASK_<slug>.md inside markdown text.
+# Live task references; tasks/_archive/ is not a shard and is left alone.
+_REF_RE = re.compile(r"\btasks/(?:(?!_archive/)[^/\s()\[\]`'\"]+/)?TASK_([\w.-]+?)\.md\b")
+_PREFIX_RE = re.compile(r"[^a-z0-9]")
+_META_RE = re.compile(r"^##\s+Meta\s*$")
+_META_FIELD_RE = re.compile(r"^([A-Za-z][\w -]*?):\s*(.*)$")
+
+# In-process cache so a long-running MCP server loads the index once.
+_cache: dict[Path, "TaskIndex"] = {}
+
+
+def normalize_slug(slug: str) -> str:
+    """Accept `x`, `TASK_x` or `TASK_x.md`; reject anything path-like."""
+    slug = slug.strip()
+    if slug.endswith(".md"):
+        slug = slug[:-3]
+    if slug.startswith("TASK_"):
+        slug = slug[len("TASK_"):]
+    if not slug or "/" in slug or "\\" in slug or slug.startswith("."):
+        raise ValueError(f"invalid task slug: {slug!r}")
+    return slug
+
+
+def shard_of(slug: str) -> str:
+    """Shard directory for a slug: its first two characters, lowercased."""
+    return _PREFIX_RE.sub("_", slug[:PREFIX_LEN].lower()).ljust(PREFIX_LEN, "_")
+
+
+def relpath(slug: str, layout: str) -> str:
+    """Canonical path of a live task, relative to .agent-files/."""
+    name = f"TASK_{slug}.md"
+    if layout == "sharded":
+        return f"{TASKS_DIR}/{shard_of(slug)}/{name}"
+    return f"{TASKS_DIR}/{name}"
+
+
+def layout(agent_files: Path) -> str:
+    try:
+        value = (agent_files / TASKS_DIR / LAYOUT_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return "flat"
+    return value if value in LAYOUTS else "flat"
+
+
+class TaskIndex:
+    """Live task slugs -> paths, refreshed by directory mtimes."""
+
+    def __init__(self, agent_files: Path, path: Path) -> None:
+        self.agent_files = agent_files
+        self.path = path
+        # dir relpath -> {"mtime": ns, "tasks": {slug: file name}, "dirs": [child relpaths]}
+        self.dirs: dict[str, dict] = {}
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if data.get("version") == INDEX_VERSION:
+                    self.dirs = data["dirs"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                self.dirs = {}
+        self.slugs: dict[str, str] = {}
+        self._rebuild()
+
+    def _scan(self, rel: str, mtime: int) -> dict:
+        tasks: dict[str, str] = {}
+        dirs: list[str] = []
+        with os.scandir(os.path.join(self.agent_files, rel)) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if rel == TASKS_DIR and entry.name == archive.ARCHIVE_DIR.name:
+                        continue
+                    dirs.append(f"{rel}/{entry.name}")
+                elif entry.name.startswith("TASK_") and entry.name.endswith(".md"):
+                    tasks[entry.name[len("TASK_"):-len(".md")]] = entry.name
+        return {"mtime": mtime, "tasks": tasks, "dirs": sorted(dirs)}
+
+    def refresh(self) -> bool:
+        """List directories whose mtime changed; returns True if anything did."""
+        seen: dict[str, dict] = {}
+        changed = False
+        stack = [TASKS_DIR]
+        while stack:
+            rel = stack.pop()
+            try:
+                mtime = os.stat(os.path.join(self.agent_files, rel)).st_mtime_ns
+            except OSError:
+                continue
+            known = self.dirs.get(rel)
+            if known is None or known["mtime"] != mtime:
+                try:
+                    known = self._scan(rel, mtime)
+                except OSError:
+                    continue
+                changed = True
+            seen[rel] = known
+            stack.extend(known["dirs"])
+        if changed or seen.keys() != self.dirs.keys():
+            self.dirs = seen
+            self._rebuild()
+            self._save()
+            return True
+        return False
+
+    def _rebuild(self) -> None:
+        current = layout(self.agent_files)
+        slugs: dict[str, str] = {}
+        for rel in sorted(self.dirs):
+            for slug, name in self.dirs[rel]["tasks"].items():
+                path = f"{rel}/{name}"
+                # With duplicates, the canonical location wins.
+                if slug not in slugs or path == relpath(slug, current):
+                    slugs[slug] = path
+        self.slugs = slugs
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        data = {"version": INDEX_VERSION, "dirs": self.dirs}
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def _index_path(agent_files: Path) -> Path:
+    # One index per workspace: workspaces may be on different layouts
+    # until a reshard is merged everywhere.
+    return taskman_state_dir(agent_files) / f"task-index-{workspace_key(agent_files)}.json"
+
+
+def load(agent_files: Path) -> TaskIndex:
+    index = _cache.get(agent_files)
+    if index is None:
+        index = TaskIndex(agent_files, _index_path(agent_files))
+        _cache[agent_files] = index
+    index.refresh()
+    return index
+
+
+def task_path(slug: str, agent_files: Path | None = None) -> TaskPath:
+    """Where the task file for `slug` is, or should be created.
+
+    Looks at the canonical path for the current layout, then the other
+    layout's, then the index, then the archive (loose, then packed).
+    Unknown slugs get the canonical path with exists=False.
+    """
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    slug = normalize_slug(slug)
+    current = layout(agent_files)
+    for candidate in (current, *(other for other in LAYOUTS if other != current)):
+        path = relpath(slug, candidate)
+        if (agent_files / path).is_file():
+            return TaskPath(slug, path, exists=True, layout=current)
+
+    path = load(agent_files).slugs.get(slug)
+    if path and (agent_files / path).is_file():
+        return TaskPath(slug, path, exists=True, layout=current)
+
+    for name in (f"TASK_{slug}.md", f"{slug}.md"):
+        loose = archive.ARCHIVE_DIR / name
+        if (agent_files / loose).is_file():
+            return TaskPath(slug, loose.as_posix(), exists=True, archived=True, layout=current)
+    if slug in archive.load_index(agent_files):
+        return TaskPath(slug, "", exists=True, archived=True, layout=current)
+
+    return TaskPath(slug, relpath(slug, current), exists=False, layout=current)
+
+
+def meta_fields(text: str) -> dict[str, str]:
+    """`Key: value` lines of the ## Meta section, keys lowercased."""
+    fields: dict[str, str] = {}
+    in_meta = False
+    for line in text.splitlines():
+        if line.startswith("#"):
+            in_meta = _META_RE.match(line) is not None
+            continue
+        m = _META_FIELD_RE.match(line) if in_meta else None
+        if m:
+            fields.setdefault(m.group(1).lower(), m.group(2).strip())
+    return fields
+
+
+def set_meta(text: str, name: str, value: str) -> str:
+    """Set one ## Meta field, replacing it or appending it to the section.
+
+    A task without a Meta section gets one after its title.
+    """
+    lines = text.splitlines()
+    start = next((i for i, line in enumerate(lines) if _META_RE.match(line)), None)
+    if start is None:
+        at = 1 if lines and lines[0].startswith("# ") else 0
+        lines[at:at] = ["", "## Meta", f"{name}: {value}", ""][1 - at:]
+        return "\n".join(lines) + "\n"
+    end = next((i for i in range(start + 1, len(lines)) if lines[i].startswith("#")), len(lines))
+    last = start
+    for i in range(start + 1, end):
+        m = _META_FIELD_RE.match(lines[i])
+        if m and m.group(1).lower() == name.lower():
+            lines[i] = f"{name}: {value}"
+            return "\n".join(lines) + "\n"
+        if lines[i].strip():
+            last = i
+    lines.insert(last + 1, f"{name}: {value}")
+    return "\n".join(lines) + "\n"
+
+
+def add_to_section(text: str, heading: str, line: str) -> str:
+    """Append a line at the end of a ## section, creating it if missing."""
+    lines = text.rstrip("\n").splitlines()
+    start = next((i for i, ln in enumerate(lines) if ln.strip() == f"## {heading}"), None)
+    if start is None:
+        return "\n".join([*lines, "", f"## {heading}", line]) + "\n"
+    end = next((i for i in range(start + 1, len(lines)) if lines[i].startswith("## ")), len(lines))
+    while end > start + 1 and not lines[end - 1].strip():
+        end -= 1
+    lines.insert(end, line)
+    return "\n".join(lines) + "\n"
+
+
+def _is_empty(cwd: Path) -> bool:
+    _, out, _ = run_jj(["log", "--no-graph", "-r", "@", "-T", 'if(empty, "1", "0")'], cwd)
+    return out.strip() == "1"
+
+
+def _checkpoint(reason: str, cwd: Path) -> str:
+    run_jj(["describe", "-m", reason], cwd)
+    _, out, _ = run_jj(["log", "--no-graph", "-r", "@", "-T", "change_id.short()"], cwd)
+    run_jj(["new"], cwd)
+    return out.strip()
+
+
+def _rewrite_refs(agent_files: Path, moves: dict[str, str], dry_run: bool) -> int:
+    """Point tasks/.../TASK_<slug>.md references in markdown at the new paths."""
+
+    def replace(m: re.Match) -> str:
+        return moves.get(m.group(1), m.group(0))
+
+    rewritten = 0
+    for dirpath, dirnames, filenames in os.walk(agent_files):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for name in filenames:
+            if not name.endswith(".md"):
+                continue
+            path = Path(dirpath) / name
+            try:
+                text = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            new = _REF_RE.sub(replace, text)
+            if new != text:
+                rewritten += 1
+                if not dry_run:
+                    path.write_text(new, encoding="utf-8")
+    return rewritten
+
+
+def reshard(
+    flat: bool = False,
+    *,
+    dry_run: bool = False,
+    agent_files: Path | None = None,
+) -> ReshardResult:
+    """Move every live task to its path in the sharded (or flat) layout.
+
+    1. Checkpoint pending edits, so the move commit holds only moves
+    2. Rename each task file and set or remove tasks/.layout
+    3. Rewrite tasks/.../TASK_<slug>.md references in markdown files
+    4. Checkpoint the result as one commit
+
+    Runs under the repo write lock. Renames keep file content unchanged,
+    so jj reports them as moves and history-diffs across the reshard shows
+    no content changes. Other workspaces still on the old layout pick the
+    moves up on their next rebase; edits they made to a moved file there
+    show up as a conflict to resolve with `taskman conflicts`.
+    """
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    target = "flat" if flat else "sharded"
+    marker = agent_files / TASKS_DIR / LAYOUT_FILE
+
+    with repo_lock(agent_files) as lock:
+        index = load(agent_files)
+        moves = {
+            slug: relpath(slug, target)
+            for slug, path in index.slugs.items()
+            if path != relpath(slug, target) and not (agent_files / relpath(slug, target)).exists()
+        }
+        result = ReshardResult(layout=target, moved=len(moves), rewritten=0, dry_run=dry_run)
+        result.lock_wait = lock.waited
+        if dry_run:
+            result.rewritten = _rewrite_refs(agent_files, moves, dry_run=True)
+            return result
+        if not moves and layout(agent_files) == target:
+            return result
+
+        run_jj(["status"], agent_files)
+        if not _is_empty(agent_files):
+            _checkpoint("checkpoint before reshard", agent_files)
+
+        for slug, new in moves.items():
+            old = agent_files / index.slugs[slug]
+            (agent_files / new).parent.mkdir(parents=True, exist_ok=True)
+            os.rename(old, agent_files / new)
+            if old.parent.name != TASKS_DIR:
+                try:
+                    old.parent.rmdir()  # only succeeds once the shard is empty
+                except OSError:
+                    pass
+        if target == "sharded":
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.write_text("sharded\n", encoding="utf-8")
+        elif marker.exists():
+            marker.unlink()
+        result.rewritten = _rewrite_refs(agent_files, moves, dry_run=False)
+        result.rev = _checkpoint(
+            f"reshard tasks/: {len(moves)} task(s) to {target} layout", agent_files
+        )
+    index.refresh()
+    return result
@@ -0,0 +1,224 @@
+"""Persistent commit timeline: time -> commit, for date-based history ranges.
+
+Each visible commit is stored once with its committer and author time,
+change id, description and the workspaces whose working copy it was an
+ancestor of when indexed. Entries are kept sorted by committer time, so a
+`since`/`until` window is two bisects.
+
+The index lives in .jj/repo/taskman/timeline.json. It records the op
+heads it was built at; when .jj/repo/op_heads is unchanged nothing is run
+at all. Otherwise only commits that are not ancestors of the previously
+indexed heads are listed, and commits hidden since then are dropped.
+"""
+
+import bisect
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from taskman.jj import find_agent_files_dir, find_repo_dir, run_jj, taskman_state_dir
+from taskman.results import TimelineEntry, TimelineResult
+
+INDEX_NAME = "timeline.json"
+INDEX_VERSION = 1
+
+_TEMPLATE = (
+    'commit_id ++ "\\t" ++ change_id.short() ++ "\\t" ++ '
+    'committer.timestamp().format("%s") ++ "\\t" ++ '
+    'author.timestamp().format("%s") ++ "\\t" ++ '
+    'description.first_line() ++ "\\n"'
+)
+
+_RELATIVE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw])(?:\s+ago)?$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+# In-process cache so a long-running MCP server loads the index once.
+_cache: dict[Path, "Timeline"] = {}
+
+
+def parse_time(text: str, now: float | None = None) -> float:
+    """Parse an absolute or relative time into a Unix timestamp.
+
+    Accepts ISO dates and times (`2026-01-02`, `2026-01-02 14:30`),
+    `today`, `yesterday`, `now`, and ages such as `90m`, `6h`, `2d`, `1w`
+    (optionally followed by `ago`). Dates without a zone are local time.
+    """
+    now_dt = datetime.fromtimestamp(time.time() if now is None else now)
+    value = text.strip().lower()
+    midnight = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if value == "now":
+        return now_dt.timestamp()
+    if value == "today":
+        return midnight.timestamp()
+    if value == "yesterday":
+        return (midnight - timedelta(days=1)).timestamp()
+    m = _RELATIVE_RE.match(value)
+    if m:
+        return now_dt.timestamp() - float(m.group(1)) * _UNITS[m.group(2)]
+    try:
+        return datetime.fromisoformat(text.strip()).timestamp()
+    except ValueError:
+        raise ValueError(
+            f"unrecognized time {text!r}: use an ISO date/time, today, yesterday, "
+            "or an age like 6h, 2d, 1w"
+        ) from None
+
+
+def _op_heads(agent_files: Path) -> list[str]:
+    try:
+        return sorted(os.listdir(find_repo_dir(agent_files) / "op_heads" / "heads"))
+    except OSError:
+        return []
+
+
+def _workspace_names(agent_files: Path) -> list[str]:
+    _, out, _ = run_jj(["--ignore-working-copy", "workspace", "list"], agent_files)
+    return [line.split(":", 1)[0] for line in out.splitlines() if ": " in line]
+
+
+class Timeline:
+    """Commits sorted by committer time, refreshed incrementally."""
+
+    def __init__(self, agent_files: Path, path: Path) -> None:
+        self.agent_files = agent_files
+        self.path = path
+        self.op_heads: list[str] = []
+        self.heads: list[str] = []
+        # [committer_ts, author_ts, commit, change, workspaces, description]
+        self.entries: list[list] = []
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if data.get("version") == INDEX_VERSION:
+                    self.op_heads = data["op_heads"]
+                    self.heads = data["heads"]
+                    self.entries = data["entries"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                self.op_heads, self.heads, self.entries = [], [], []
+        self.times = [entry[0] for entry in self.entries]
+
+    def _list(self, revset: str) -> list[list]:
+        _, out, _ = run_jj(
+            ["--ignore-working-copy", "log", "--no-graph", "-r", revset, "-T", _TEMPLATE],
+            self.agent_files,
+        )
+        rows = []
+        for line in out.splitlines():
+            parts = line.split("\t", 4)
+            if len(parts) == 5:
+                commit, change, committed, authored, description = parts
+                rows.append([int(committed), int(authored), commit, change, [], description])
+        return rows
+
+    def _ids(self, revset: str) -> set[str]:
+        _, out, _ = run_jj(
+            ["--ignore-working-copy", "log", "--no-graph", "-r", revset,
+             "-T", 'commit_id ++ "\\n"'],
+            self.agent_files,
+        )
+        return set(out.split())
+
+    def refresh(self) -> bool:
+        """Bring the index up to date; returns True if it changed."""
+        op_heads = _op_heads(self.agent_files)
+        if op_heads and op_heads == self.op_heads:
+            return False
+        heads = sorted(self._ids("heads(all())"))
+        known = " | ".join(self.heads)
+        try:
+            if known:
+                new_revset = f"~::({known}) ~ root()"
+                hidden = self._ids(f"::({known}) ~ ::visible_heads()")
+            else:
+                new_revset, hidden = "~root()", set()
+            added = self._list(new_revset)
+        except RuntimeError:
+            # A previously indexed head was garbage collected: rebuild.
+            self.entries, hidden = [], set()
+            new_revset = "~root()"
+            added = self._list(new_revset)
+        if added:
+            by_commit = {row[2]: row for row in added}
+            for name in _workspace_names(self.agent_files):
+                try:
+                    reachable = self._ids(f"({new_revset}) & ::present({name}@)")
+                except RuntimeError:
+                    continue
+                for commit in reachable:
+                    if commit in by_commit:
+                        by_commit[commit][4].append(name)
+        entries = [entry for entry in self.entries if entry[2] not in hidden]
+        entries.extend(added)
+        entries.sort(key=lambda entry: (entry[0], entry[2]))
+        changed = entries != self.entries or heads != self.heads
+        self.entries, self.heads, self.op_heads = entries, heads, op_heads
+        self.times = [entry[0] for entry in entries]
+        self._save()
+        return changed
+
+    def _save(self) -> None:
+        # Per-process temp name: concurrent refreshes must not share it.
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        data = {
+            "version": INDEX_VERSION,
+            "op_heads": self.op_heads,
+            "heads": self.heads,
+            "entries": self.entries,
+        }
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def between(self, since: float | None, until: float | None) -> list[list]:
+        """Entries with since <= committer time <= until, oldest first."""
+        lo = 0 if since is None else bisect.bisect_left(self.times, since)
+        hi = len(self.times) if until is None else bisect.bisect_right(self.times, until)
+        return self.entries[lo:hi]
+
+
+def load(agent_files: Path) -> Timeline:
+    index = _cache.get(agent_files)
+    if index is None:
+        index = Timeline(agent_files, taskman_state_dir(agent_files) / INDEX_NAME)
+        _cache[agent_files] = index
+    index.refresh()
+    return index
+
+
+def commits_between(agent_files: Path, since: float | None, until: float | None) -> set[str]:
+    """Commit ids made within [since, until]."""
+    return {entry[2] for entry in load(agent_files).between(since, until)}
+
+
+def _format(ts: int) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+
+
+def timeline(
+    since: str | None = None,
+    until: str | None = None,
+    limit: int | None = 50,
+    agent_files: Path | None = None,
+) -> TimelineResult:
+    """Checkpoints made in a time window, newest first."""
+    agent_files = find_agent_files_dir() if agent_files is None else agent_files
+    start = parse_time(since) if since else None
+    end = parse_time(until) if until else None
+    found = load(agent_files).between(start, end)
+    shown = found[::-1][:limit] if limit else found[::-1]
+    return TimelineResult(
+        entries=[
+            TimelineEntry(
+                rev=change,
+                commit=commit,
+                time=_format(committed),
+                author_time=_format(authored),
+                workspaces=list(workspaces),
+                description=description,
+            )
+            for committed, authored, commit, change, workspaces, description in shown
+        ],
+        total=len(found),
+    )
@@ -0,0 +1,255 @@
+"""Background auto-checkpointing of .agent-files driven by Linux inotify.
+
+`taskman watch` tracks which files agents touch and folds bursts of edits
+into a single jj checkpoint, so snapshot work happens here instead of in
+every agent-facing command.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from taskman.jj import run_jj, find_agent_files_dir
+from taskman.lock import repo_lock
+from taskman.results import Checkpoint
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# jj and git internals change on every snapshot; watching them would make
+# each checkpoint trigger the next one.
+_IGNORED_DIRS = {".jj", ".git"}
+
+# Marker for "events were dropped, anything may have changed".
+OVERFLOW = "*"
+
+
+class Inotify:
+    """Recursive inotify watch over a directory tree.
+
+    Directories created after start are picked up automatically. Paths are
+    reported relative to the root.
+    """
+
+    def __init__(self, root: Path) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("taskman watch requires Linux inotify")
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self.root = Path(root)
+        self._dirs: dict[int, Path] = {}
+        self._add_tree(self.root)
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(str(directory)), _WATCH_MASK
+        )
+        if wd < 0:
+            # Directory vanished between listing and watching; nothing to track.
+            return
+        self._dirs[wd] = directory
+
+    def _add_tree(self, directory: Path) -> None:
+        self._add_watch(directory)
+        for dirpath, dirnames, _ in os.walk(directory):
+            dirnames[:] = [d for d in dirnames if d not in _IGNORED_DIRS]
+            for d in dirnames:
+                self._add_watch(Path(dirpath) / d)
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def read(self, timeout: float | None) -> set[str]:
+        """Wait up to timeout seconds and return the set of changed paths."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed: set[str] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            changed |= self._parse(data)
+        return changed
+
+    def _parse(self, data: bytes) -> set[str]:
+        changed: set[str] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changed.add(OVERFLOW)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            if name in _IGNORED_DIRS:
+                continue
+
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                    # Files may land before the watch exists; report them too.
+                    for dirpath, dirnames, filenames in os.walk(path):
+                        dirnames[:] = [d for d in dirnames if d not in _IGNORED_DIRS]
+                        for f in filenames:
+                            changed.add(self._relative(Path(dirpath) / f))
+                continue
+            changed.add(self._relative(path))
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> "Inotify":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Debouncer:
+    """Collect dirty paths and decide when a batch is ready to checkpoint.
+
+    A batch is due once no edits arrived for `quiet` seconds, or `interval`
+    seconds after its first edit even if edits keep coming.
+    """
+
+    def __init__(
+        self,
+        quiet: float,
+        interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.quiet = quiet
+        self.interval = interval
+        self._clock = clock
+        self._dirty: set[str] = set()
+        self._first: float | None = None
+        self._last: float | None = None
+
+    @property
+    def dirty(self) -> set[str]:
+        return set(self._dirty)
+
+    def add(self, paths: set[str]) -> None:
+        if not paths:
+            return
+        now = self._clock()
+        if self._first is None:
+            self._first = now
+        self._last = now
+        self._dirty |= paths
+
+    def timeout(self) -> float | None:
+        """Seconds until the pending batch is due, or None if nothing is dirty."""
+        if self._first is None or self._last is None:
+            return None
+        now = self._clock()
+        deadline = min(self._last + self.quiet, self._first + self.interval)
+        return max(0.0, deadline - now)
+
+    def due(self) -> bool:
+        remaining = self.timeout()
+        return remaining is not None and remaining <= 0.0
+
+    def drain(self) -> set[str]:
+        dirty = self._dirty
+        self._dirty = set()
+        self._first = None
+        self._last = None
+        return dirty
+
+
+def _checkpoint_message(paths: set[str], limit: int = 5) -> str:
+    if OVERFLOW in paths:
+        return "auto-checkpoint: many files (event queue overflowed)"
+    names = sorted(paths)
+    shown = ", ".join(names[:limit])
+    if len(names) > limit:
+        shown += f" (+{len(names) - limit} more)"
+    noun = "file" if len(names) == 1 else "files"
+    return f"auto-checkpoint: {len(names)} {noun}: {shown}"
+
+
+def checkpoint(cwd: Path, paths: set[str]) -> Checkpoint | None:
+    """Snapshot and checkpoint the working copy for a batch of dirty paths.
+
+    Returns the checkpoint, or None if the batch produced no net change
+    (e.g. an editor wrote and then removed a temp file).
+    """
+    with repo_lock(cwd) as lock:
+        # Reading @ snapshots the working copy first.
+        _, out, _ = run_jj(["log", "--no-graph", "-r", "@", "-T", "empty"], cwd)
+        if out.strip() == "true":
+            return None
+        message = _checkpoint_message(paths)
+        run_jj(["describe", "-m", message], cwd)
+        _, rev, _ = run_jj(
+            ["log", "--no-graph", "-r", "@", "-T", "change_id.short()"], cwd
+        )
+        run_jj(["new"], cwd)
+    return Checkpoint(rev=rev.strip(), reason=message, lock_wait=lock.waited)
+
+
+def watch(
+    quiet: float = 2.0,
+    interval: float = 60.0,
+    on_checkpoint: Callable[[Checkpoint], None] = print,
+) -> None:
+    """Watch .agent-files and create debounced checkpoints until interrupted."""
+    cwd = find_agent_files_dir()
+    debouncer = Debouncer(quiet, interval)
+    with Inotify(cwd) as inotify:
+        try:
+            while True:
+                debouncer.add(inotify.read(debouncer.timeout()))
+                if debouncer.due():
+                    result = checkpoint(cwd, debouncer.drain())
+                    if result:
+                        on_checkpoint(result)
+        except KeyboardInterrupt:
+            pending = debouncer.drain()
+            if pending:
+                result = checkpoint(cwd, pending)
+                if result:
+                    on_checkpoint(result)
@@ -0,0 +1,98 @@
+import pytest
+from taskman import archive, tasks
+
+
+@pytest.fixture
+def jj_calls(monkeypatch):
+    """Record jj invocations instead of running them"""
+    calls = []
+
+    def fake_run_jj(args, cwd):
+        calls.append(args)
+        if args[:1] == ["log"]:
+            return 0, "0" if "empty" in args[-1] else "abc123", ""
+        return 0, "", ""
+
+    monkeypatch.setattr(tasks, "run_jj", fake_run_jj)
+    return calls
+
+
+@pytest.fixture
+def agent_dir(tmp_path, jj_calls):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    return agent_dir
+
+
+def _archived(agent_dir, slug, title, completed):
+    path = agent_dir / "tasks" / "_archive" / f"TASK_{slug}.md"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        f"# TASK: {title}\n\n## Meta\nStatus: complete\nCompleted: {completed}\n"
+    )
+    return path
+
+
+def test_pack_moves_tasks_into_bundle(agent_dir, jj_calls):
+    """pack() compresses archived tasks, removes the loose files and checkpoints"""
+    a = _archived(agent_dir, "auth", "Fix auth", "2024-05-01")
+    b = _archived(agent_dir, "cache", "Add cache", "2024-06-02")
+
+    result = archive.pack(agent_dir)
+    assert "checkpoint abc123: packed 2" in str(result)
+    assert result.rev == "abc123"
+    assert not a.exists() and not b.exists()
+    # Pending edits are checkpointed first, then the pack gets its own commit.
+    described = [args[2] for args in jj_calls if args[0] == "describe"]
+    assert described == ["checkpoint before archive pack", "archive pack: 2 task(s)"]
+
+    index = archive.load_index(agent_dir)
+    assert index["auth"]["title"] == "Fix auth"
+    assert index["cache"]["completed"] == "2024-06-02"
+    assert "Add cache" in str(archive.show("cache", agent_dir))
+
+
+def test_pack_is_append_only(agent_dir):
+    """Re-packing appends entries and keeps earlier offsets valid"""
+    _archived(agent_dir, "one", "First", "2024-01-01")
+    archive.pack(agent_dir)
+    first = archive.load_index(agent_dir)["one"]
+
+    _archived(agent_dir, "two", "Second", "2024-01-02")
+    archive.pack(agent_dir)
+    index = archive.load_index(agent_dir)
+
+    assert index["one"] == first
+    assert index["two"]["offset"] == first["offset"] + first["length"]
+    assert "First" in str(archive.show("one", agent_dir))
+    assert "Second" in str(archive.show("two", agent_dir))
+
+
+def test_show_missing_slug(tmp_path):
+    """show() raises FileNotFoundError for unknown slugs"""
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / "tasks" / "_archive").mkdir(parents=True)
+    with pytest.raises(FileNotFoundError):
+        archive.show("nope", agent_dir)
+
+
+def test_show_rejects_paths(tmp_path):
+    """show() refuses slugs that would read files outside the archive"""
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / "tasks" / "_archive").mkdir(parents=True)
+    (agent_dir / "LONGTERM_MEM.md").write_text("secret\n")
+    for slug in ("../../LONGTERM_MEM", "..\\..\\LONGTERM_MEM", ".hidden", ""):
+        with pytest.raises(ValueError, match="invalid task slug"):
+            archive.show(slug, agent_dir)
+
+
+def test_list_filters_by_title_and_date(agent_dir):
+    """list_entries() covers packed and loose tasks with filters"""
+    _archived(agent_dir, "auth", "Fix auth", "2024-05-01")
+    archive.pack(agent_dir)
+    _archived(agent_dir, "cache", "Add cache", "2024-06-02")
+
+    assert "auth" in str(archive.list_entries(None, agent_dir))
+    assert "cache" in str(archive.list_entries(None, agent_dir))
+    assert "cache" not in str(archive.list_entries("auth", agent_dir))
+    assert "cache" in str(archive.list_entries("2024-06", agent_dir))
@@ -0,0 +1,91 @@
+import os
+import pytest
+from taskman import archive, attempts, tasks
+
+
+@pytest.fixture
+def agent_dir(tmp_path):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    (agent_dir / "tasks" / "_archive").mkdir(parents=True)
+    attempts._cache.clear()
+    return agent_dir
+
+
+def _task(title, *entries):
+    body = [f"# TASK: {title}\n\n## Attempts\n"]
+    for i, (approach, result) in enumerate(entries, 1):
+        body.append(f"### Attempt {i} (2024-01-0{i} 10:00)\nApproach: {approach}\nResult: {result}\n\n")
+    return "".join(body) + "## Notes\n- unrelated notes\n"
+
+
+def test_parse_attempts_extracts_fields():
+    """Attempt entries stop at the next heading and keep Approach/Result"""
+    entries = attempts.parse_attempts(_task("Cache", ("use redis lru", "failed: eviction storms")))
+    assert len(entries) == 1
+    assert entries[0]["header"] == "Attempt 1 (2024-01-01 10:00)"
+    assert entries[0]["approach"] == "use redis lru"
+    assert entries[0]["result"] == "failed: eviction storms"
+    assert entries[0]["title"] == "Cache"
+
+
+def test_similarity_tracks_overlap():
+    """MinHash similarity is 1 for equal text and low for unrelated text"""
+    a = attempts.signature(attempts.shingles("retry the sync with exponential backoff and jitter"))
+    b = attempts.signature(attempts.shingles("retry the sync with exponential backoff and jitter"))
+    c = attempts.signature(attempts.shingles("parse markdown headings into sections"))
+    assert attempts.similarity(a, b) == 1.0
+    assert attempts.similarity(a, c) < 0.2
+
+
+def test_similar_attempts_finds_live_and_archived(agent_dir, monkeypatch):
+    """Matches come from live tasks, loose archive files and the pack"""
+    (agent_dir / "tasks" / "TASK_sync.md").write_text(_task(
+        "Sync", ("retry sync with exponential backoff and jitter", "failed: lock storms"),
+        ("parse markdown headings", "ok"),
+    ))
+    (agent_dir / "tasks" / "_archive" / "TASK_old.md").write_text(_task(
+        "Old", ("retry sync with exponential backoff", "ok after tuning"),
+    ))
+    monkeypatch.setattr(tasks, "run_jj", lambda args, cwd: (0, "", ""))
+    archive.pack(agent_dir)
+
+    result = attempts.similar_attempts("retry sync using exponential backoff", 5, agent_dir)
+    top = result.matches[:2]
+    assert {m.source for m in top} == {"pack:old", "tasks/TASK_sync.md"}
+    assert {m.result for m in top} == {"failed: lock storms", "ok after tuning"}
+    assert all(m.approach != "parse markdown headings" for m in top)
+    assert result.indexed == 3
+
+
+def test_index_refreshes_only_changed_sources(agent_dir, monkeypatch):
+    """The persisted index re-reads only files whose stamp changed"""
+    task = agent_dir / "tasks" / "TASK_a.md"
+    task.write_text(_task("A", ("first approach with caching", "failed")))
+    attempts.similar_attempts("caching", 5, agent_dir)
+    attempts._cache.clear()
+
+    reads = []
+    original = attempts.AttemptIndex._read
+    monkeypatch.setattr(attempts.AttemptIndex, "_read",
+                        lambda self, source: reads.append(source) or original(self, source))
+
+    attempts.similar_attempts("caching", 5, agent_dir)
+    assert reads == []
+
+    task.write_text(_task("A", ("first approach with caching", "failed"), ("second approach sharding", "ok")))
+    os.utime(task, ns=(1, 1))
+    result = attempts.similar_attempts("sharding approach", 5, agent_dir)
+    assert reads == ["tasks/TASK_a.md"]
+    assert result.indexed == 2
+
+
+
+def test_index_is_per_workspace(agent_dir):
+    """Each workspace keeps its own attempt index, saved atomically"""
+    from taskman.jj import workspace_key
+
+    (agent_dir / "tasks" / "TASK_a.md").write_text(_task("A", ("caching", "failed")))
+    attempts.similar_attempts("caching", 5, agent_dir)
+    state = agent_dir / ".jj" / "repo" / "taskman"
+    assert sorted(p.name for p in state.iterdir()) == [f"attempts-{workspace_key(agent_dir)}.json"]
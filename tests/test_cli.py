@@ -1,6 +1,10 @@
 import subprocess
 import sys
 
+import pytest
+
+from taskman.results import Section
+
 
 def test_cli_help():
     """taskman --help works"""
@@ -28,3 +32,75 @@ def test_cli_history_search(jj_repo):
         capture_output=True, text=True, cwd=jj_repo
     )
     assert result.returncode == 0
+
+
+def test_cli_json_output(tmp_path, monkeypatch, capsys):
+    """--json prints the result's structured form"""
+    import json
+    from taskman import cli
+    archive_dir = tmp_path / ".agent-files" / "tasks" / "_archive"
+    archive_dir.mkdir(parents=True)
+    (archive_dir / "TASK_a.md").write_text("# TASK: A\n\nCompleted: 2024-01-02\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["taskman", "archive", "list", "--json"])
+    cli.main()
+    assert json.loads(capsys.readouterr().out) == {
+        "entries": [{"slug": "a", "title": "A", "completed": "2024-01-02"}]
+    }
+
+
+def _fake_sections(log):
+    for i in range(3):
+        log.append(i)
+        yield Section(f"=== rev{i} ===\nbody {i}", {"rev": f"rev{i}"})
+    return ""
+
+
+def test_cli_history_streams_sections(monkeypatch, capsys):
+    """history-diffs without a budget prints each section as it is produced"""
+    from taskman import cli, core
+    log = []
+    monkeypatch.setattr(core, "iter_history_diffs", lambda *args: _fake_sections(log))
+    monkeypatch.setattr(sys, "argv", ["taskman", "history-diffs", "a.md"])
+    cli.main()
+    assert capsys.readouterr().out.splitlines() == [
+        "=== rev0 ===", "body 0", "=== rev1 ===", "body 1", "=== rev2 ===", "body 2",
+    ]
+
+    def empty(*args):
+        return "No revisions found in range."
+        yield
+
+    monkeypatch.setattr(core, "iter_history_batch", empty)
+    monkeypatch.setattr(sys, "argv", ["taskman", "history-batch", "a.md"])
+    cli.main()
+    assert capsys.readouterr().out == "No revisions found in range.\n"
+
+
+def test_cli_history_stream_stops_on_broken_pipe(tmp_path, monkeypatch):
+    """A closed stdout stops the generator and exits without a traceback"""
+    from taskman import cli, core
+
+    class ClosedPipe:
+        def __init__(self, fd):
+            self.fd = fd
+
+        def write(self, text):
+            raise BrokenPipeError
+
+        def flush(self):
+            pass
+
+        def fileno(self):
+            return self.fd
+
+    log = []
+    gen = _fake_sections(log)
+    monkeypatch.setattr(core, "iter_history_diffs", lambda *args: gen)
+    monkeypatch.setattr(sys, "argv", ["taskman", "history-diffs", "a.md"])
+    with open(tmp_path / "out", "w") as out:
+        monkeypatch.setattr(sys, "stdout", ClosedPipe(out.fileno()))
+        with pytest.raises(SystemExit):
+            cli.main()
+    assert log == [0]
+    assert gen.gi_frame is None
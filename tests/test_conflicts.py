@@ -0,0 +1,48 @@
+from taskman.conflicts import parse_conflicts
+
+
+def test_parses_sides_base_and_line_ranges():
+    """Regions carry both sides, the base, and 1-based line numbers"""
+    text = (
+        "# Status\n"
+        "<<<<<<< Side #1 (Conflict 1 of 1)\n"
+        "- task-a\n"
+        "||||||| Base\n"
+        "- old\n"
+        "=======\n"
+        "- task-b\n"
+        "- task-c\n"
+        ">>>>>>> Side #2 (Conflict 1 of 1 ends)\n"
+        "tail\n"
+    )
+    [region] = parse_conflicts(text)
+    assert (region.start, region.end) == (2, 9)
+    assert region.ours.label == "Side #1 (Conflict 1 of 1)"
+    assert (region.ours.start, region.ours.lines) == (3, ["- task-a"])
+    assert (region.base.start, region.base.lines) == (5, ["- old"])
+    assert (region.theirs.start, region.theirs.lines) == (7, ["- task-b", "- task-c"])
+    assert region.theirs.label == "Side #2 (Conflict 1 of 1 ends)"
+
+
+def test_parses_multiple_regions_without_base():
+    """Two-way regions have no base; each region is found"""
+    text = "<<<<<<< a\nx\n=======\ny\n>>>>>>> b\nmid\n<<<<<<< a\n=======\nz\n>>>>>>> b\n"
+    first, second = parse_conflicts(text)
+    assert first.base is None
+    assert (first.ours.lines, first.theirs.lines) == (["x"], ["y"])
+    assert (second.start, second.end) == (7, 10)
+    assert second.ours.lines == []
+
+
+def test_long_markers_ignore_shorter_lookalikes():
+    """Lengthened markers treat 7-char marker lines inside as content"""
+    text = "<<<<<<<<< a\n=======\nours\n=========\ntheirs\n>>>>>>>>> b\n"
+    [region] = parse_conflicts(text)
+    assert region.ours.lines == ["=======", "ours"]
+    assert region.theirs.lines == ["theirs"]
+
+
+def test_unterminated_region_is_ignored():
+    """Text that merely starts like a conflict is not a region"""
+    assert parse_conflicts("<<<<<<< a\nx\n=======\ny\n") == []
+    assert parse_conflicts("no conflicts here\n") == []
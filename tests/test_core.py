@@ -1,12 +1,13 @@
 import subprocess
 import pytest
 from taskman import core
+from taskman.results import Section
 
 
 def test_describe_creates_checkpoint(jj_repo, monkeypatch):
     """describe() creates a named checkpoint"""
     monkeypatch.chdir(jj_repo)
-    result = core.describe("test checkpoint")
+    result = str(core.describe("test checkpoint"))
     assert "test checkpoint" in result or "checkpoint" in result.lower()
 
 
@@ -15,11 +16,27 @@ def test_describe_triggers_snapshot(jj_repo, monkeypatch):
     monkeypatch.chdir(jj_repo)
     # Make a change
     (jj_repo / "STATUS.md").write_text("# Updated\n")
-    result = core.describe("after edit")
+    result = str(core.describe("after edit"))
     # Change should be captured
     assert "after edit" in result or result  # Just verify it runs
 
 
+def test_sync_group_window_commits_and_moves_bookmark(jj_repo, monkeypatch):
+    """sync() with a group window commits @ and moves the workspace bookmark"""
+    monkeypatch.chdir(jj_repo)
+    (jj_repo / "STATUS.md").write_text("# Grouped\n")
+    result = core.sync("grouped sync", group_window=0.01)
+    assert result.workspace == "default"
+    assert result.bookmark in ("moved", "created")
+    assert result.group == 1
+
+    out = subprocess.run(
+        ["jj", "log", "--no-graph", "-r", "default", "-T", "description"],
+        cwd=jj_repo, capture_output=True, text=True, check=True,
+    ).stdout
+    assert "grouped sync" in out
+
+
 def test_history_search_uses_diff_contains(jj_repo, monkeypatch):
     """history_search() uses jj diff_contains"""
     monkeypatch.chdir(jj_repo)
@@ -27,7 +44,7 @@ def test_history_search_uses_diff_contains(jj_repo, monkeypatch):
     (jj_repo / "STATUS.md").write_text("# Status\nTODO: fix this\n")
     core.describe("add todo")
 
-    result = core.history_search("TODO")
+    result = str(core.history_search("TODO"))
     # Should find the commit
     assert result  # Non-empty result
 
@@ -41,7 +58,7 @@ def test_history_diffs_returns_diffs(jj_repo, monkeypatch):
     (jj_repo / "STATUS.md").write_text("v2\n")
     core.describe("v2")
 
-    result = core.history_diffs("STATUS.md", "@--", "@")
+    result = str(core.history_diffs("STATUS.md", "@--", "@"))
     assert "v1" in result or "v2" in result
 
 
@@ -53,7 +70,7 @@ def test_history_batch_returns_content(jj_repo, monkeypatch):
     (jj_repo / "STATUS.md").write_text("content2\n")
     core.describe("c2")
 
-    result = core.history_batch("STATUS.md", "@--", "@")
+    result = str(core.history_batch("STATUS.md", "@--", "@"))
     assert "content" in result
 
 
@@ -93,7 +110,7 @@ def test_wt_creates_workspace(tmp_path, monkeypatch):
     )
 
     # Create worktree via wt()
-    result = core.wt("test-wt", new_branch=True)
+    result = str(core.wt("test-wt", new_branch=True))
     assert "worktrees/test-wt" in result
 
     # Verify workspace was created in the new worktree
@@ -106,3 +123,451 @@ def test_wt_creates_workspace(tmp_path, monkeypatch):
     # Files should be visible in the workspace
     assert (wt_agent / "STATUS.md").exists()
     assert (wt_agent / "STATUS.md").read_text() == "# Test Status\n"
+
+
+def test_history_grep_reports_matching_lines(jj_repo, monkeypatch):
+    """history_grep() returns matching lines with rev ids, deduping blobs"""
+    monkeypatch.chdir(jj_repo)
+    (jj_repo / "STATUS.md").write_text("# Status\nlearned: use jj\n")
+    core.describe("g1")
+    (jj_repo / "STATUS.md").write_text("# Status\nlearned: use jj\nother\n")
+    core.describe("g2")
+
+    result = str(core.history_grep("learned", ["STATUS.md"]))
+    assert "STATUS.md @" in result
+    assert "2: learned: use jj" in result
+    assert "other" not in result
+
+    # Pages resume at a position in the group order; the cursor stays small.
+    (jj_repo / "STATUS.md").write_text("# Status\nlearned: use jj more\n")
+    core.describe("g3")
+    full = core.history_grep("learned", ["STATUS.md"])
+    first = core.history_grep("learned", ["STATUS.md"], max_bytes=core._section_bytes(full.sections[0]))
+    assert core._decode_cursor(first.cursor, "history_grep")["next"] == 1
+    rest = core.history_grep("learned", ["STATUS.md"], cursor=first.cursor)
+    assert [s.data for s in first.sections + rest.sections] == [s.data for s in full.sections]
+
+
+def test_line_pattern_kinds():
+    """_compile_line_pattern() follows jj string pattern prefixes"""
+    assert core._compile_line_pattern("TODO").search("x TODO y")
+    # A bare pattern is a substring match, even with glob characters.
+    assert core._compile_line_pattern("a*b").search("x a*b y")
+    assert not core._compile_line_pattern("a*b").search("axxb")
+    assert core._compile_line_pattern("regex:fix.*bug").search("fix the bug")
+    assert not core._compile_line_pattern("exact:TODO").search("x TODO")
+    assert core._compile_line_pattern("glob:learned: *").search("learned: use jj")
+
+
+def test_grep_blobs_scans_git_objects(tmp_path):
+    """_grep_blobs() reads blobs in one git batch and returns matching lines"""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    blobs = []
+    for text in ["a\nneedle here\n", "nothing\n"]:
+        proc = subprocess.run(
+            ["git", "hash-object", "-w", "--stdin"],
+            cwd=tmp_path, input=text, capture_output=True, text=True, check=True,
+        )
+        blobs.append(proc.stdout.strip())
+
+    matcher = core._compile_line_pattern("needle")
+    found = core._grep_blobs(tmp_path / ".git", blobs, matcher)
+    assert found == {blobs[0]: [(2, "needle here")]}
+
+
+def test_blame_lines_tracks_origins():
+    """_blame_lines() keeps origins of unchanged lines and reuses the cache"""
+    def linear(*commits):
+        return [
+            {"commit": c, "parents": [commits[i - 1]] if i else []} for i, c in enumerate(commits)
+        ]
+
+    texts = {"b1": "a\nb\n", "b2": "a\nx\nb\n", "b3": "a\nx\n", "b4": "a\nx\ny\n"}
+    blob_of = {"c1": "b1", "c2": "b2", "c3": "b3"}
+    cache = {}
+    assert core._blame_lines(linear("c1", "c2", "c3"), blob_of, texts, cache) == ["c1", "c2"]
+    assert cache["c2"] == ["c1", "c2", "c1"]
+
+    # A later version diffs only against cached results.
+    blob_of["c4"] = "b4"
+    cache["c1"] = ["stale"]
+    assert core._blame_lines(linear("c1", "c2", "c3", "c4"), blob_of, texts, cache) == ["c1", "c2", "c4"]
+
+
+def test_blame_lines_across_a_merge():
+    """Lines merged in from a parallel branch keep the commit that wrote them"""
+    texts = {"base": "a\nb\n", "left": "l\na\nb\n", "right": "a\nb\nr\n", "merged": "l\na\nb\nr\nm\n"}
+    history = [
+        {"commit": "base", "parents": []},
+        {"commit": "left", "parents": ["base"]},
+        {"commit": "right", "parents": ["side"]},  # side: right's parent, untouched file
+        {"commit": "merge", "parents": ["left", "right"]},
+    ]
+    blob_of = {"base": "base", "left": "left", "side": "base", "right": "right", "merge": "merged"}
+    assert core._blame_lines(history, blob_of, texts, {}) == ["left", "base", "base", "right", "merge"]
+
+
+def test_history_blame_annotates_lines(jj_repo, monkeypatch):
+    """history_blame() attributes lines to the checkpoints that added them"""
+    monkeypatch.chdir(jj_repo)
+    (jj_repo / "STATUS.md").write_text("# Status\nfirst\n")
+    core.describe("add first")
+    (jj_repo / "STATUS.md").write_text("# Status\nfirst\nsecond\n")
+    core.describe("add second")
+
+    result = str(core.history_blame("STATUS.md"))
+    assert "add first" in result
+    assert "add second" in result
+    assert "3| second" in result
+
+
+def _next(i):
+    return {"tool": "t", "next": i}
+
+
+def _cursor(page):
+    return core._decode_cursor(page.cursor, "t")
+
+
+def test_paginate_stops_at_budget_with_cursor():
+    """_paginate() stops lazily at the budget and encodes the next index"""
+    produced = []
+
+    def sections():
+        for i in range(10):
+            produced.append(i)
+            yield Section(f"section {i}", {"i": i})
+
+    page = core._paginate(sections(), 40, 0, _next)
+    assert str(page).splitlines()[:2] == ["section 0", "section 1"]
+    assert "resume with cursor:" in str(page)
+    assert _cursor(page) == {"tool": "t", "next": 2}
+    assert produced == [0, 1, 2]
+
+
+def test_paginate_resumes_inside_oversized_section():
+    """_paginate() cuts a section larger than the budget at a line and resumes inside it"""
+    text = "\n".join(f"line {i:02}" for i in range(20))
+    pages = []
+    cursor = {"next": 3}
+    while cursor is not None:
+        rest = [Section(text, {"rev": "r"}), Section("tail", {})][cursor["next"] - 3:]
+        page = core._paginate(iter(rest), 60, cursor["next"], _next, cursor.get("offset", 0))
+        pages.append(page)
+        cursor = _cursor(page) if page.cursor else None
+    assert len(pages) > 2
+    assert pages[0].sections[0].data == {"rev": "r", "truncated": True}
+    assert pages[1].sections[0].data["offset"] > 0
+    shown = "\n".join(s.text for page in pages for s in page.sections)
+    assert shown == text + "\ntail"
+
+
+def test_paginate_budgets_structured_data():
+    """Section data counts against max_bytes; a cut section keeps only small fields"""
+    big = Section("d" * 10, {"rev": "abc", "diffs": {"a.md": "x" * 1000}})
+    page = core._paginate(iter([Section("s", {"i": 0}), big]), 200, 0, _next)
+    assert [s.text for s in page.sections] == ["s"] and _cursor(page)["next"] == 1
+
+    # The text fits once the large data is left out: no cursor into it.
+    page = core._paginate(iter([big]), 200, 0, _next)
+    assert page.sections[0].data == {"rev": "abc", "truncated": True}
+    assert page.sections[0].text == "d" * 10 and page.cursor is None
+    assert sum(core._section_bytes(s) for s in page.sections) <= 200
+
+
+def test_paginate_closes_generator_and_keeps_message():
+    """_paginate() closes an unfinished generator and uses a return value as message"""
+    closed = []
+
+    def sections():
+        try:
+            for i in range(10):
+                yield Section(f"section {i}", {"i": i})
+        finally:
+            closed.append(True)
+
+    core._paginate(sections(), 12, 0, _next)
+    assert closed == [True]
+
+    def empty():
+        return "No files matching x in range."
+        yield
+
+    assert str(core._paginate(empty(), None, 0, _next)) == "No files matching x in range."
+
+
+def test_cursor_roundtrip_checks_tool():
+    """Cursors decode only for the tool that issued them"""
+    token = core._encode_cursor({"tool": "history_diffs", "next": 3})
+    assert core._decode_cursor(token, "history_diffs")["next"] == 3
+    with pytest.raises(ValueError):
+        core._decode_cursor(token, "history_batch")
+    with pytest.raises(ValueError):
+        core._decode_cursor("not a cursor", "history_diffs")
+
+
+def test_history_search_cursor_pins_full_commit_ids(tmp_path, monkeypatch):
+    """history_search() shows short commit ids but resumes by full ones"""
+    commits = ["a" * 40, "b" * 40, "c" * 40]
+    calls = []
+
+    def fake_run_jj(args, cwd):
+        calls.append(args)
+        rows = commits if len(calls) == 1 else commits[1:]
+        return 0, "".join(f"ch{c[0]}\t{c}\t2026-01-02 14:00\tfix {c[0]}\n" for c in rows), ""
+
+    monkeypatch.setattr(core, "_agent_files_cwd", lambda: tmp_path)
+    monkeypatch.setattr(core, "run_jj", fake_run_jj)
+
+    first = core.history_search("TODO", max_bytes=200)
+    assert f"cha {'a' * 12} 2026-01-02 14:00 fix a" in str(first)
+    assert core._decode_cursor(first.cursor, "history_search")["revs"] == commits[1:]
+
+    core.history_search("TODO", max_bytes=200, cursor=first.cursor)
+    assert calls[1][3] == " | ".join(commits[1:])
+
+
+def test_history_diffs_pages_with_cursor(jj_repo, monkeypatch):
+    """history_diffs() resumes at the next revision from a cursor"""
+    monkeypatch.chdir(jj_repo)
+    for i in range(4):
+        (jj_repo / "STATUS.md").write_text(f"v{i}\n")
+        core.describe(f"v{i}")
+
+    full = str(core.history_diffs("STATUS.md", "@----", "@"))
+    first = str(core.history_diffs("STATUS.md", "@----", "@", max_bytes=200))
+    assert "resume with cursor:" in first
+    token = first.rsplit("resume with cursor: ", 1)[1].rstrip("]")
+
+    # New checkpoints don't shift the pinned range.
+    core.describe("later")
+    rest = str(core.history_diffs("STATUS.md", "ignored", cursor=token))
+    shown = first.rsplit("\n[truncated", 1)[0] + "\n" + rest
+    assert shown.replace("\n", "") == full.replace("\n", "")
+
+
+def test_conflicts_lists_regions(jj_repo, monkeypatch):
+    """conflicts() finds a merge conflict and parses its region"""
+    monkeypatch.chdir(jj_repo)
+
+    def jj(*args):
+        subprocess.run(["jj", *args], cwd=jj_repo, check=True, capture_output=True)
+
+    jj("new", "-m", "side a")
+    (jj_repo / "STATUS.md").write_text("# Status\n- task-a\n")
+    jj("bookmark", "create", "side-a", "-r", "@")
+    jj("new", "@-", "-m", "side b")
+    (jj_repo / "STATUS.md").write_text("# Status\n- task-b\n")
+    jj("new", "side-a", "@", "-m", "merge")
+
+    inventory = core.conflicts()
+    [rev] = inventory.revisions
+    [conflicted] = rev.files
+    assert conflicted.path == "STATUS.md"
+    [region] = conflicted.regions
+    assert {tuple(region.ours.lines), tuple(region.theirs.lines)} == {("- task-a",), ("- task-b",)}
+    assert "STATUS.md" in str(inventory)
+
+
+def test_sync_auto_merges_status_conflict(jj_repo, monkeypatch):
+    """sync() resolves a STATUS.md conflict in @ with the markdown merge"""
+    monkeypatch.chdir(jj_repo)
+
+    def jj(*args):
+        subprocess.run(["jj", *args], cwd=jj_repo, check=True, capture_output=True)
+
+    jj("new", "-m", "side a")
+    (jj_repo / "STATUS.md").write_text("# Status\n- cache: in progress\n")
+    jj("bookmark", "create", "side-a", "-r", "@")
+    jj("new", "@-", "-m", "side b")
+    (jj_repo / "STATUS.md").write_text("# Status\n- search: in progress\n")
+    jj("new", "side-a", "@")
+
+    result = core.sync("merge sides")
+    assert result.auto_merged == ["STATUS.md"]
+    assert (jj_repo / "STATUS.md").read_text() == "# Status\n- cache: in progress\n- search: in progress\n"
+    assert not core.conflicts().revisions
+
+
+def test_gc_abandons_leftover_empty_commits(jj_repo, monkeypatch):
+    """gc drops empty undescribed commits nothing builds on and keeps the rest"""
+    monkeypatch.chdir(jj_repo)
+    subprocess.run(["jj", "new", "--no-edit"], cwd=jj_repo, check=True)
+
+    preview = core.gc(dry_run=True)
+    assert preview.abandoned == 1
+    assert preview.bytes_after == preview.bytes_before
+
+    result = core.gc()
+    assert result.abandoned == 1
+    assert "reclaimed" in str(result)
+    assert core.gc(dry_run=True).abandoned == 0
+    assert "initial" in subprocess.run(
+        ["jj", "log", "--no-graph", "-r", "::@", "-T", "description"],
+        cwd=jj_repo, capture_output=True, text=True, check=True,
+    ).stdout
+
+
+def test_handoff_revs_prefers_agent_records(tmp_path):
+    """Handoff file commit comes first, then the agent's STATUS.md line"""
+    (tmp_path / "handoffs").mkdir()
+    (tmp_path / "handoffs" / "HANDOFF_alice.md").write_text(
+        "# HANDOFF: alice\nupdated: 2026-01-02 10:00\ncommit: aaa111\n"
+    )
+    (tmp_path / "STATUS.md").write_text(
+        "# Status\n"
+        "## alice\nLast handoff: 2026-01-02 10:00 (rev bbb222)\n"
+        "## bob\nLast handoff: 2026-01-01 09:00 (rev ccc333)\n"
+    )
+    assert core._handoff_revs("alice", tmp_path) == ["aaa111", "bbb222", "ccc333"]
+    assert core._handoff_revs("bob", tmp_path) == ["ccc333", "bbb222"]
+
+
+def test_split_git_diff_per_file():
+    """Git-format diffs split into per-file chunks with line stats"""
+    diff = (
+        "diff --git a/STATUS.md b/STATUS.md\n--- a/STATUS.md\n+++ b/STATUS.md\n"
+        "@@ -1 +1,2 @@\n # Status\n+- new\n"
+        "diff --git a/tasks/TASK_a.md b/tasks/TASK_a.md\n--- a/tasks/TASK_a.md\n"
+        "+++ b/tasks/TASK_a.md\n@@ -1 +1 @@\n-old\n+new\n"
+    )
+    chunks = core._split_git_diff(diff)
+    assert list(chunks) == ["STATUS.md", "tasks/TASK_a.md"]
+    assert core._diff_stat(chunks["STATUS.md"]) == (1, 0)
+    assert core._diff_stat(chunks["tasks/TASK_a.md"]) == (1, 1)
+
+
+def test_since_handoff_reports_net_changes(jj_repo, monkeypatch):
+    """since_handoff diffs every workspace against the recorded handoff rev"""
+    monkeypatch.chdir(jj_repo)
+    rev = core.describe("handoff: alice").rev
+    (jj_repo / "STATUS.md").write_text(f"# Status\nLast handoff: 2026-01-02 10:00 (rev {rev})\n")
+    core.describe("edit status")
+    (jj_repo / "tasks" / "TASK_a.md").write_text("# TASK: a\n")
+
+    result = core.since_handoff("alice")
+    stats = {s["file"]: s for s in result.sections[0].data["files"]}
+    assert set(stats) == {"STATUS.md", "tasks/TASK_a.md"}
+    assert stats["tasks/TASK_a.md"]["added"] == 1
+    assert stats["tasks/TASK_a.md"]["workspaces"] == ["default"]
+
+    first = core.since_handoff("alice", max_bytes=core._section_bytes(result.sections[0]))
+    assert first.cursor is not None
+    # Later pages read the pinned result instead of diffing again.
+    (jj_repo / "tasks" / "TASK_b.md").write_text("# TASK: b\n")
+    monkeypatch.setattr(core, "_handoff_variants", lambda *a: pytest.fail("recomputed"))
+    rest = core.since_handoff("alice", cursor=first.cursor)
+    assert [s.data["file"] for s in rest.sections] == ["STATUS.md", "tasks/TASK_a.md"]
+
+
+def test_path_args_and_globs():
+    """Globs become jj glob filesets, match per path component, and follow the task layout"""
+    assert core._fileset("tasks/TASK_auth*.md") == (
+        'glob:"tasks/TASK_auth*.md" | glob:"tasks/??/TASK_auth*.md"'
+    )
+    assert core._fileset("topics/*.md") == 'glob:"topics/*.md"'
+    assert core._fileset("STATUS.md") == "STATUS.md"
+    assert core._glob_pattern("glob:tasks/*.md") == "tasks/*.md"
+    assert core._glob_pattern("file:STATUS.md") is None
+    assert core._plain_path("file:STATUS.md") == "STATUS.md"
+    assert core._glob_match("tasks/TASK_auth*.md", "tasks/TASK_auth_login.md")
+    assert not core._glob_match("tasks/*.md", "tasks/_archive/TASK_x.md")
+    assert not core._glob_match("tasks/[!x]/a.md", "tasks///a.md")
+    assert core._glob_match("**/TASK_*.md", "tasks/au/TASK_auth.md")
+    assert core._glob_match("**/TASK_*.md", "TASK_auth.md")
+    assert core._glob_match("tasks/**", "tasks/_archive/TASK_x.md")
+    assert not core._glob_match("tasks*/x.md", "tasks/au/x.md")
+    assert core._layout_globs("tasks/TASK_auth*.md") == [
+        "tasks/TASK_auth*.md", "tasks/??/TASK_auth*.md"
+    ]
+    assert not any(
+        core._glob_match(g, "tasks/_archive/TASK_auth.md")
+        for g in core._layout_globs("tasks/TASK_auth*.md")
+    )
+
+
+def test_history_multi_path_groups_by_revision(jj_repo, monkeypatch):
+    """history_diffs/batch take several paths and globs in one call"""
+    monkeypatch.chdir(jj_repo)
+    (jj_repo / "tasks" / "TASK_auth_a.md").write_text("a1\n")
+    (jj_repo / "tasks" / "TASK_other.md").write_text("o1\n")
+    core.describe("add tasks")
+    (jj_repo / "STATUS.md").write_text("# Status\n- auth_a\n")
+    (jj_repo / "tasks" / "TASK_auth_a.md").write_text("a2\n")
+    core.describe("update auth")
+
+    diffs = core.history_diffs(["STATUS.md", "tasks/TASK_auth*.md"], "@--", "@-")
+    by_rev = [section.data["paths"] for section in diffs.sections]
+    assert ["STATUS.md", "tasks/TASK_auth_a.md"] in by_rev
+    assert all("tasks/TASK_other.md" not in paths for paths in by_rev)
+
+    batch = core.history_batch(["STATUS.md", "tasks/TASK_auth*.md"], "@--", "@-")
+    newest = {f["file"]: f["content"] for f in batch.sections[0].data["files"]}
+    assert newest == {"STATUS.md": "# Status\n- auth_a\n", "tasks/TASK_auth_a.md": "a2\n"}
+    assert "--- tasks/TASK_auth_a.md ---" in str(batch)
+
+
+def test_complete_task_archives_and_updates_status(tmp_path, monkeypatch):
+    """complete_task() edits, archives and updates STATUS.md before one sync"""
+    from taskman import deps, tasks
+    from taskman.results import SyncResult
+
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    (agent_dir / "tasks").mkdir()
+    (agent_dir / "tasks" / "TASK_auth.md").write_text(
+        "# TASK: Auth\n\n## Meta\nStatus: in_progress\nPriority: P0\n\n## Summary\nCurrent state: done\n"
+    )
+    (agent_dir / "tasks" / "TASK_cache.md").write_text(
+        "# TASK: Cache\n\n## Meta\nStatus: planned\nPriority: P1\nBlocked-by: auth\n"
+    )
+    (agent_dir / "tasks" / "TASK_api.md").write_text(
+        "# TASK: API\n\n## Meta\nStatus: planned\nPriority: P0\nDepends-on: cache\n"
+    )
+    (agent_dir / "STATUS.md").write_text("# Status\n- auth: in progress (TASK_auth.md)\n- cache: planned\n")
+    tasks._cache.clear()
+    deps._cache.clear()
+    synced = []
+
+    def fake_sync(reason, cwd):
+        synced.append((reason, sorted(p.name for p in (cwd / "tasks").rglob("*.md"))))
+        return SyncResult(rev="abc", workspace="default", bookmark="moved")
+
+    monkeypatch.setattr(core, "_agent_files_cwd", lambda: agent_dir)
+    monkeypatch.setattr(core, "_sync_locked", fake_sync)
+
+    result = core.complete_task("auth", "login works")
+    # Next is the task completing auth unblocked, not the P0 still waiting.
+    assert (result.path, result.sync.rev, result.next, result.next_path) == (
+        "tasks/_archive/TASK_auth.md", "abc", "cache", "tasks/TASK_cache.md",
+    )
+    assert synced == [("complete: auth", ["TASK_api.md", "TASK_auth.md", "TASK_cache.md"])]
+    assert not (agent_dir / "tasks" / "TASK_auth.md").exists()
+    archived = (agent_dir / "tasks" / "_archive" / "TASK_auth.md").read_text()
+    assert "Status: complete\n" in archived
+    assert "Completed: " in archived and "Outcome: login works" in archived
+    assert (agent_dir / "STATUS.md").read_text() == (
+        "# Status\n- cache: planned\nNext: cache (tasks/TASK_cache.md)\n"
+    )
+    assert "next: cache (tasks/TASK_cache.md)" in str(result)
+
+    # Re-running finishes idempotently from the archived copy.
+    again = core.complete_task("auth")
+    assert again.path == "tasks/_archive/TASK_auth.md"
+    with pytest.raises(FileNotFoundError):
+        core.complete_task("nope")
+
+
+def test_complete_task_in_jj_repo(jj_repo, monkeypatch):
+    """The completion lands in one checkpoint on the workspace bookmark"""
+    monkeypatch.chdir(jj_repo)
+    (jj_repo / "tasks" / "TASK_auth.md").write_text("# TASK: Auth\n\n## Meta\nStatus: in_progress\n")
+    core.describe("add auth")
+
+    result = core.complete_task("auth", "done")
+    out = subprocess.run(
+        ["jj", "diff", "--summary", "-r", "default"], cwd=jj_repo,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert result.sync.rev
+    assert "tasks/_archive/TASK_auth.md" in out
@@ -0,0 +1,111 @@
+import pytest
+from taskman import archive, deps, tasks
+
+
+@pytest.fixture
+def agent_dir(tmp_path):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    (agent_dir / "tasks" / "_archive").mkdir(parents=True)
+    tasks._cache.clear()
+    deps._cache.clear()
+    return agent_dir
+
+
+def _task(agent_dir, slug, status="planned", priority="P1", created="2026-01-01", extra=""):
+    path = agent_dir / tasks.relpath(slug, "flat")
+    path.write_text(
+        f"# TASK: {slug.title()}\n\n## Meta\nStatus: {status}\nPriority: {priority}\n"
+        f"Created: {created}\n{extra}\n## Problem\nBlocked-by: not-meta\n"
+    )
+    return path
+
+
+def _slugs(queue):
+    return [task.slug for task in queue.ready]
+
+
+def test_parse_deps():
+    """Slugs, file names and paths are accepted; parenthesised text is not"""
+    assert deps.parse_deps("auth, TASK_cache.md tasks/sc/TASK_schema.md") == ["auth", "cache", "schema"]
+    assert deps.parse_deps("auth (waiting on review), auth") == ["auth"]
+    assert deps.parse_deps("none") == []
+    parsed = deps.parse_task("# TASK: X\n\n## Meta\nBlocked-by: a\nDepends-on: b, a\n")
+    assert (parsed["title"], parsed["deps"], parsed["status"]) == ("X", ["a", "b"], "planned")
+
+
+def test_ready_queue_orders_by_priority_and_status(agent_dir):
+    """P0 beats P1; in_progress beats planned; blocked/complete are skipped"""
+    _task(agent_dir, "low", "in_progress", "P2")
+    _task(agent_dir, "new", "planned", "P1", "2026-02-01")
+    _task(agent_dir, "old", "planned", "P1", "2026-01-01")
+    _task(agent_dir, "wip", "in_progress", "P1", "2026-03-01")
+    _task(agent_dir, "stuck", "blocked", "P0")
+    _task(agent_dir, "done", "complete", "P0")
+    queue = deps.ready_queue(agent_files=agent_dir)
+    assert _slugs(queue) == ["wip", "old", "new", "low"]
+    assert [(t.slug, t.waiting_on) for t in queue.blocked] == [("stuck", [])]
+    assert queue.open == 5
+    assert _slugs(deps.ready_queue(limit=2, exclude="wip", agent_files=agent_dir)) == ["old", "new"]
+
+
+def test_dependencies_gate_the_ready_set(agent_dir, monkeypatch):
+    """A task is ready once everything it waits on is complete or archived"""
+    _task(agent_dir, "schema", "complete")
+    _task(agent_dir, "auth", priority="P1", extra="Depends-on: schema\n")
+    _task(agent_dir, "api", priority="P0", extra="Blocked-by: auth, cache\n")
+    _task(agent_dir, "cache", priority="P2")
+    _task(agent_dir, "ui", priority="P0", extra="Blocked-by: typo\n")
+
+    queue = deps.ready_queue(agent_files=agent_dir)
+    assert _slugs(queue) == ["auth", "cache"]
+    assert queue.ready[0].unblocks == 1
+    assert [(t.slug, t.waiting_on, t.missing) for t in queue.blocked] == [
+        ("api", ["auth", "cache"], []),
+        ("ui", [], ["typo"]),
+    ]
+    assert "api  waiting on auth, cache" in str(queue)
+
+    # Archiving auth and packing cache unblocks api.
+    (agent_dir / "tasks/TASK_auth.md").rename(agent_dir / "tasks/_archive/TASK_auth.md")
+    (agent_dir / "tasks/TASK_cache.md").rename(agent_dir / "tasks/_archive/TASK_cache.md")
+    monkeypatch.setattr(tasks, "run_jj", lambda args, cwd: (0, "", ""))
+    archive.pack(agent_dir)
+    assert _slugs(deps.ready_queue(agent_files=agent_dir)) == ["api"]
+
+    # A task marked blocked whose blockers are all done is ready, after open work.
+    _task(agent_dir, "later", "blocked", "P0", extra="Blocked-by: schema\n")
+    assert _slugs(deps.ready_queue(agent_files=agent_dir)) == ["api", "later"]
+
+
+def test_cycles_are_reported(agent_dir):
+    """Tasks waiting on each other are reported and never ready"""
+    _task(agent_dir, "a", extra="Blocked-by: b\n")
+    _task(agent_dir, "b", extra="Blocked-by: c\n")
+    _task(agent_dir, "c", extra="Blocked-by: a\n")
+    _task(agent_dir, "self", extra="Blocked-by: self\n")
+    _task(agent_dir, "d", extra="Blocked-by: a\n")
+    queue = deps.ready_queue(agent_files=agent_dir)
+    assert queue.ready == []
+    assert queue.cycles == [["a", "b", "c"], ["self"]]
+    assert "dependency cycle: a, b, c" in str(queue)
+
+
+def test_graph_rereads_only_changed_files(agent_dir, monkeypatch):
+    """Unchanged task files are not re-read, even by a new process"""
+    _task(agent_dir, "auth")
+    cache = _task(agent_dir, "cache", extra="Blocked-by: auth\n")
+    assert _slugs(deps.ready_queue(agent_files=agent_dir)) == ["auth"]
+
+    deps._cache.clear()
+    tasks._cache.clear()
+    parsed = []
+    real = deps.parse_task
+    monkeypatch.setattr(deps, "parse_task", lambda text: parsed.append(text) or real(text))
+    assert deps.load(agent_dir).refresh() is False
+    assert _slugs(deps.ready_queue(agent_files=agent_dir)) == ["auth"]
+    assert parsed == []
+
+    cache.write_text(cache.read_text().replace("Blocked-by: auth", "Blocked-by: -"))
+    assert _slugs(deps.ready_queue(agent_files=agent_dir)) == ["auth", "cache"]
+    assert len(parsed) == 1
@@ -0,0 +1,50 @@
+from taskman import doctor
+from taskman.results import DoctorCheck, DoctorReport
+
+
+def test_check_flags_threshold_with_fix():
+    """Values over the threshold warn and name the remediation command"""
+    ok = doctor._check("operations", 10)
+    assert (ok.status, ok.fix) == ("ok", "")
+    bad = doctor._check("operations", doctor.THRESHOLDS["operations"] + 1)
+    assert bad.status == "warn"
+    assert bad.fix == doctor.REMEDIATION["operations"]
+
+
+def test_working_copy_stats_skip_repo_dirs(tmp_path):
+    """Only files jj snapshots are counted"""
+    (tmp_path / "tasks").mkdir()
+    (tmp_path / "tasks" / "TASK_a.md").write_text("12345")
+    (tmp_path / "STATUS.md").write_text("123")
+    (tmp_path / ".jj" / "repo").mkdir(parents=True)
+    (tmp_path / ".jj" / "repo" / "big").write_text("x" * 1000)
+    assert doctor._working_copy_stats(tmp_path) == (2, 8)
+
+
+def test_report_renders_warnings_and_json():
+    """The report lists each check, its limit and fix, and counts warnings"""
+    report = DoctorReport(checks=[
+        DoctorCheck("snapshot_seconds", 0.9, "s", 0.5, "warn", "taskman gc"),
+        DoctorCheck("working_copy_bytes", 2048, "B", 4096),
+    ])
+    assert str(report) == (
+        "warn  snapshot_seconds: 0.900s (limit 0.500s)\n"
+        "      fix: taskman gc\n"
+        "ok    working_copy_bytes: 2.0 KiB (limit 4.0 KiB)\n"
+        "1 warning(s)"
+    )
+    assert report.to_dict()["warnings"] == 1
+    assert report.to_dict()["checks"][0]["fix"] == "taskman gc"
+
+
+def test_doctor_perf_measures_repo(jj_repo, monkeypatch):
+    """doctor --perf reports counts and timings for a real repo"""
+    from taskman import core
+
+    monkeypatch.chdir(jj_repo)
+    report = core.doctor(perf=True)
+    values = {check.name: check.value for check in report.checks}
+    assert values["commits"] >= 2
+    assert values["operations"] >= 1
+    assert values["snapshot_seconds"] > 0
+    assert all(report.capabilities.values())
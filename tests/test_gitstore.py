@@ -0,0 +1,113 @@
+import subprocess
+
+import pytest
+
+from taskman import gitstore
+
+
+def _git(repo, *args, input=None):
+    return subprocess.run(
+        ["git", "-C", str(repo), *args], check=True, capture_output=True, input=input
+    ).stdout
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """A repo with many small edits to one file, so repacking makes deltas."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    _git(repo, "config", "user.email", "t@example.com")
+    _git(repo, "config", "user.name", "t")
+    (repo / "tasks").mkdir()
+    lines = [f"line {i} of a task file that changes a little each time" for i in range(400)]
+    commits = []
+    for i in range(12):
+        lines[i * 7] = f"edited in round {i}"
+        (repo / "tasks" / "TASK_a.md").write_text("\n".join(lines) + "\n")
+        (repo / f"note{i % 3}.md").write_text(f"note {i}\n")
+        if i == 5:
+            (repo / "tasks" / "TASK_b.md").write_text("b\n")
+        _git(repo, "add", "-A")
+        _git(repo, "commit", "-q", "-m", f"round {i}")
+        commits.append(_git(repo, "rev-parse", "HEAD").decode().strip())
+    return repo / ".git", commits
+
+
+def _cat(git_dir, spec):
+    return subprocess.run(
+        ["git", "--git-dir", str(git_dir), "cat-file", "-p", spec],
+        check=True, capture_output=True,
+    ).stdout
+
+
+def _check_reads(git_dir, commits):
+    store = gitstore.GitStore(git_dir)
+    for commit in commits:
+        blob = store.blob_id(commit, "tasks/TASK_a.md")
+        assert store.blob(blob) == _cat(git_dir, f"{commit}:tasks/TASK_a.md")
+    assert store.blob_id(commits[0], "tasks/TASK_b.md") is None
+    assert store.blob_id(commits[-1], "tasks") is None
+    assert store.blob_id(commits[-1], "tasks/TASK_a.md/x") is None
+    assert store.paths(commits[:2]) == {"tasks/TASK_a.md", "note0.md", "note1.md"}
+    assert "tasks/TASK_b.md" in store.paths(commits)
+    with pytest.raises(KeyError):
+        store.read("0" * 40)
+
+
+def test_reads_loose_objects(git_repo):
+    """Blobs and trees are read from loose objects like git cat-file"""
+    _check_reads(*git_repo)
+
+
+def test_reads_packed_deltas(git_repo):
+    """Packed objects, including delta chains, match git cat-file"""
+    git_dir, commits = git_repo
+    _git(git_dir.parent, "repack", "-adq", "--depth=50", "--window=50")
+    assert not list((git_dir / "objects").glob("[0-9a-f][0-9a-f]/*"))
+    verify = _git(git_dir.parent, "verify-pack", "-v",
+                  str(next((git_dir / "objects" / "pack").glob("*.idx"))))
+    assert b"chain length" in verify  # the pack does contain deltas
+    _check_reads(git_dir, commits)
+
+
+def test_finds_packs_written_after_open(git_repo):
+    """A store opened before a repack still finds every object"""
+    git_dir, commits = git_repo
+    store = gitstore.GitStore(git_dir)
+    _git(git_dir.parent, "repack", "-adq")
+    _git(git_dir.parent, "prune-packed")
+    blob = store.blob_id(commits[-1], "tasks/TASK_a.md")
+    assert store.blob(blob) == _cat(git_dir, f"{commits[-1]}:tasks/TASK_a.md")
+
+
+def test_apply_delta_copy_and_insert():
+    """apply_delta handles copy and insert opcodes"""
+    base = b"hello world"
+    # src size 11, dst size 11: copy base[0:6], insert "there"
+    delta = bytes([11, 11, 0x90, 6, 5]) + b"there"
+    assert gitstore.apply_delta(base, delta) == b"hello there"
+    with pytest.raises(ValueError):
+        gitstore.apply_delta(b"short", delta)
+
+
+def test_core_reads_match_cat_file_fallback(git_repo, monkeypatch):
+    """core's blob helpers return the same data in-process and via git cat-file"""
+    from taskman import core
+
+    git_dir, commits = git_repo
+    _git(git_dir.parent, "repack", "-adq")
+    specs = [f"{c}:{p}" for c in commits for p in ("tasks/TASK_b.md", "note1.md")]
+
+    def reads():
+        ids = core._blob_ids(git_dir, specs)
+        reader = core._BlobReader(git_dir)
+        try:
+            files = [reader.read(c, "tasks/TASK_a.md") for c in commits]
+        finally:
+            reader.close()
+        return ids, core._read_blobs(git_dir, sorted({b for b in ids if b})), files
+
+    in_process = reads()
+    monkeypatch.setenv("TASKMAN_GITSTORE", "0")
+    assert reads() == in_process
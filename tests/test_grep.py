@@ -0,0 +1,144 @@
+import os
+import sys
+import pytest
+from taskman import archive, grep, tasks
+
+
+@pytest.fixture
+def agent_dir(tmp_path):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    (agent_dir / "tasks" / "_archive").mkdir(parents=True)
+    (agent_dir / "topics").mkdir()
+    grep._cache.clear()
+    return agent_dir
+
+
+def _write(agent_dir, rel, text):
+    path = agent_dir / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def _bump(path):
+    """Advance mtime so a same-size rewrite within one tick is still seen."""
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_required_literals():
+    """Only literal runs every match must contain are used to prefilter"""
+    assert grep.required_literals(r"retry\s+backoff") == ["retry", "backoff"]
+    assert grep.required_literals(r"^(foo|bar)baz") == ["baz"]
+    assert grep.required_literals(r"colou?r") == ["colo", "r"]
+    assert grep.required_literals(r"(?:abc)+x*") == ["abc"]
+    assert grep.required_literals(r"[a-z]+") == []
+    assert grep.required_literals(r"(?i)err(?=or)\.log|warn") == []
+    assert grep.required_literals(r"\x41bc{2,}[]x]\.md") == ["b", "c", ".md"]
+    # Syntax the scanner does not know means a full scan, not a guess.
+    assert grep.required_literals(r"(?x) retry  backoff") == []
+
+
+def test_literal_and_regex_search(agent_dir):
+    """Matches carry path, line number and optional context"""
+    _write(agent_dir, "STATUS.md", "# Status\n- auth: in progress\n")
+    _write(agent_dir, "topics/TOPIC_jj.md", "# jj\nproblem: stale workspace\nfix: jj workspace update-stale\ncheck: jj st\n")
+
+    result = grep.grep("update-stale", agent_files=agent_dir)
+    assert [(m.path, m.line, m.text) for m in result.matches] == [
+        ("topics/TOPIC_jj.md", 3, "fix: jj workspace update-stale"),
+    ]
+    assert result.candidates == 1
+
+    result = grep.grep(r"^(fix|check):", regex=True, context=1, agent_files=agent_dir)
+    assert [m.line for m in result.matches] == [3, 4]
+    assert result.matches[0].before == ["problem: stale workspace"]
+    assert str(result).splitlines()[:3] == [
+        "topics/TOPIC_jj.md-2-problem: stale workspace",
+        "topics/TOPIC_jj.md:3:fix: jj workspace update-stale",
+        "topics/TOPIC_jj.md-4-check: jj st",
+    ]
+
+    assert not grep.grep("STALE", agent_files=agent_dir).matches
+    assert len(grep.grep("STALE", ignore_case=True, agent_files=agent_dir).matches) == 2
+    assert grep.grep("Status", path="topics/*", agent_files=agent_dir).matches == []
+    assert "No matches" in str(grep.grep("nowhere to be found", agent_files=agent_dir))
+
+
+def test_prefilter_skips_files_without_trigrams(agent_dir):
+    """Files lacking a query trigram are never read"""
+    for i in range(20):
+        _write(agent_dir, f"topics/TOPIC_{i}.md", f"note {i}: nothing special here\n")
+    _write(agent_dir, "topics/TOPIC_needle.md", "the quokka index\n")
+    result = grep.grep("quokka", agent_files=agent_dir)
+    assert result.candidates == 1 and result.files == 21
+    # Short queries have no trigram and scan every file.
+    assert grep.grep("no", agent_files=agent_dir).candidates == 21
+
+
+def test_index_tracks_edits_deletes_and_reloads(agent_dir):
+    """Edited, added and removed files are picked up before each query"""
+    a = _write(agent_dir, "topics/TOPIC_a.md", "alpha beta\n")
+    b = _write(agent_dir, "topics/TOPIC_b.md", "gamma delta\n")
+    assert grep.grep("gamma", agent_files=agent_dir).matches[0].path == "topics/TOPIC_b.md"
+
+    a.write_text("alpha gamma\n")
+    _bump(a)
+    b.unlink()
+    _write(agent_dir, "handoffs/HANDOFF_x.md", "gamma ray\n")
+    assert [m.path for m in grep.grep("gamma", agent_files=agent_dir).matches] == [
+        "handoffs/HANDOFF_x.md", "topics/TOPIC_a.md",
+    ]
+    assert grep.load(agent_dir).refresh() is False
+
+    # A new process reads the persisted index and reuses it as is.
+    grep._cache.clear()
+    index = grep.load(agent_dir)
+    assert sorted(index.ids) == ["handoffs/HANDOFF_x.md", "topics/TOPIC_a.md"]
+    assert index.refresh() is False
+    assert not grep.grep("delta", agent_files=agent_dir).matches
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_repeat_searches_follow_inotify(agent_dir, monkeypatch):
+    """From the second search on, only files inotify reported are looked at"""
+    _write(agent_dir, "topics/TOPIC_a.md", "alpha\n")
+    grep.grep("alpha", agent_files=agent_dir)
+    grep.grep("alpha", agent_files=agent_dir)
+    index = grep.load(agent_dir)
+    assert index.watcher is not None
+
+    def no_full_scan():
+        raise AssertionError("full scan while watching")
+
+    monkeypatch.setattr(index, "_current_sources", no_full_scan)
+    _write(agent_dir, "topics/deep/TOPIC_b.md", "alphabet soup\n")
+    (agent_dir / "topics/TOPIC_a.md").unlink()
+    assert [m.path for m in grep.grep("alpha", agent_files=agent_dir).matches] == [
+        "topics/deep/TOPIC_b.md",
+    ]
+
+
+def test_searches_archive_pack_and_skips_binary(agent_dir, monkeypatch):
+    """Packed archive entries are searchable; binary files are not"""
+    _write(agent_dir, "tasks/_archive/TASK_old.md", "# TASK: Old\nused a zebra cache\n")
+    monkeypatch.setattr(tasks, "run_jj", lambda args, cwd: (0, "", ""))
+    archive.pack(agent_dir)
+    (agent_dir / "blob.bin").write_bytes(b"zebra\0cache")
+
+    result = grep.grep("zebra", agent_files=agent_dir)
+    assert [(m.path, m.line) for m in result.matches] == [("pack:old", 2)]
+
+
+def test_limit_truncates(agent_dir):
+    """Results stop at the limit and say so"""
+    _write(agent_dir, "STATUS.md", "".join(f"item {i}\n" for i in range(10)))
+    result = grep.grep("item", limit=3, agent_files=agent_dir)
+    assert len(result.matches) == 3 and result.truncated
+    assert str(result).endswith("... stopped at 3 matches")
+
+
+def test_invalid_regex(agent_dir):
+    with pytest.raises(ValueError):
+        grep.grep("(", regex=True, agent_files=agent_dir)
@@ -0,0 +1,45 @@
+import threading
+import pytest
+from taskman import group
+
+
+def test_concurrent_requests_share_one_pass(tmp_path):
+    """Requests arriving within the window are processed together, each answered"""
+    batches = []
+
+    def process(requests):
+        batches.append(len(requests))
+        return [{"echo": r["n"]} for r in requests]
+
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def worker(n):
+        barrier.wait()
+        results[n] = group.submit(tmp_path / "q", {"n": n}, 0.2, process, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {n: {"echo": n} for n in range(8)}
+    assert sum(batches) == 8
+    assert len(batches) < 8
+    assert sorted(p.name for p in (tmp_path / "q").iterdir()) == ["leader.lock"]
+
+
+def test_error_response_raises(tmp_path):
+    """An error response is raised to that caller"""
+    with pytest.raises(RuntimeError, match="boom"):
+        group.submit(tmp_path / "q", {}, 0, lambda reqs: [{"error": "boom"}], timeout=1)
+
+
+def test_process_exception_answers_every_waiter(tmp_path):
+    """A crashing batch still answers its callers instead of hanging them"""
+    def process(requests):
+        raise ValueError("bad batch")
+
+    with pytest.raises(RuntimeError, match="bad batch"):
+        group.submit(tmp_path / "q", {}, 0, process, timeout=1)
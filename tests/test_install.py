@@ -12,7 +12,7 @@ def test_install_skills_creates_dir(mock_home):
 
 def test_install_skills_copies_all_files(mock_home):
     """install_skills copies all skill .md files"""
-    result = core.install_skills("claude")
+    result = str(core.install_skills("claude"))
     skills_dir = mock_home / ".claude" / "skills" / "taskman"
 
     expected = ["describe.md", "sync.md", "history-diffs.md",
@@ -38,7 +38,7 @@ def test_install_mcp_claude_dot_mcp(mock_home, tmp_path, monkeypatch):
     monkeypatch.chdir(tmp_path)
     (tmp_path / ".mcp.json").write_text("{}")
 
-    result = core.install_mcp("claude")
+    result = str(core.install_mcp("claude"))
 
     config = json.loads((tmp_path / ".mcp.json").read_text())
     assert "mcpServers" in config
@@ -50,7 +50,7 @@ def test_install_mcp_claude_home_fallback(mock_home, tmp_path, monkeypatch):
     monkeypatch.chdir(tmp_path)
     # No .mcp.json in cwd
 
-    result = core.install_mcp("claude")
+    result = str(core.install_mcp("claude"))
 
     config = json.loads((mock_home / ".claude.json").read_text())
     assert "mcpServers" in config
@@ -63,7 +63,7 @@ def test_install_mcp_cursor(mock_home, tmp_path, monkeypatch):
     (tmp_path / ".cursor").mkdir()
     (tmp_path / ".cursor" / "mcp.json").write_text("{}")
 
-    result = core.install_mcp("cursor")
+    result = str(core.install_mcp("cursor"))
 
     config = json.loads((tmp_path / ".cursor" / "mcp.json").read_text())
     assert "mcpServers" in config
@@ -71,7 +71,7 @@ def test_install_mcp_cursor(mock_home, tmp_path, monkeypatch):
 
 def test_install_mcp_codex(mock_home):
     """install_mcp writes codex config to ~/.codex/config.toml"""
-    result = core.install_mcp("codex")
+    result = str(core.install_mcp("codex"))
 
     config_path = mock_home / ".codex" / "config.toml"
     assert config_path.exists()
@@ -31,3 +31,53 @@ def test_find_agent_files_dir_not_found(tmp_path):
     """find_agent_files_dir raises FileNotFoundError if not found"""
     with pytest.raises(FileNotFoundError):
         find_agent_files_dir(tmp_path)
+
+
+class _Proc:
+    def __init__(self, returncode, stderr=""):
+        self.returncode = returncode
+        self.stdout = "ok\n" if returncode == 0 else ""
+        self.stderr = stderr
+
+
+def _fake_run(monkeypatch, procs):
+    calls = []
+
+    def run(cmd, cwd=None, **kwargs):
+        calls.append(cmd)
+        proc = procs.pop(0)
+        return proc.returncode, proc.stdout, proc.stderr
+
+    monkeypatch.setattr("taskman.jj.process.run", run)
+    monkeypatch.setattr("taskman.jj.time.sleep", lambda s: None)
+    return calls
+
+
+def test_run_jj_retries_lock_errors(monkeypatch):
+    """run_jj retries transient lock errors and then succeeds"""
+    calls = _fake_run(monkeypatch, [
+        _Proc(1, "Error: Failed to lock working copy"),
+        _Proc(1, "error: cannot lock ref 'refs/heads/default'"),
+        _Proc(0),
+    ])
+    assert run_jj(["new"], Path.cwd())[1] == "ok\n"
+    assert len(calls) == 3
+
+
+def test_run_jj_retry_is_bounded(monkeypatch):
+    """run_jj gives up after the retry budget"""
+    calls = _fake_run(monkeypatch, [_Proc(1, "Error: Failed to lock")] * 3)
+    with pytest.raises(RuntimeError, match="Failed to lock"):
+        run_jj(["new"], Path.cwd(), retries=2)
+    assert len(calls) == 3
+
+
+def test_run_jj_does_not_retry_real_errors(monkeypatch):
+    """Ordinary failures, even with the auto-resolve warning, fail at once"""
+    calls = _fake_run(monkeypatch, [
+        _Proc(1, "Concurrent modification detected, resolving automatically.\n"
+                 "Error: Revision `nope` doesn't exist"),
+    ])
+    with pytest.raises(RuntimeError):
+        run_jj(["log", "-r", "nope"], Path.cwd())
+    assert len(calls) == 1
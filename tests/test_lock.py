@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+import pytest
+from taskman import lock
+
+
+@pytest.fixture
+def agent_dir(tmp_path):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    return agent_dir
+
+
+def _queue(agent_dir):
+    return agent_dir / ".jj" / "repo" / "taskman" / lock.QUEUE_DIR
+
+
+def test_lock_is_reentrant(agent_dir):
+    """Nested repo_lock in the same thread does not wait on itself"""
+    with lock.repo_lock(agent_dir, timeout=1) as outer:
+        with lock.repo_lock(agent_dir, timeout=1) as inner:
+            assert inner.waited == 0.0
+        assert len(list(_queue(agent_dir).iterdir())) == 1
+    assert outer.waited < 1
+    assert list(_queue(agent_dir).iterdir()) == []
+
+
+def test_dead_ticket_is_reaped(agent_dir):
+    """A ticket nobody holds a flock on (crashed owner) is skipped and removed"""
+    queue = _queue(agent_dir)
+    queue.mkdir(parents=True)
+    (queue / "00000000000000000001-1-dead").write_text("")
+    with lock.repo_lock(agent_dir, timeout=1):
+        assert not (queue / "00000000000000000001-1-dead").exists()
+
+
+def test_live_ticket_blocks_until_timeout(agent_dir):
+    """A live ticket ahead in the queue holds back later waiters"""
+    queue = _queue(agent_dir)
+    queue.mkdir(parents=True)
+    ticket, fd = lock._take_ticket(queue)
+    try:
+        with pytest.raises(TimeoutError):
+            with lock.repo_lock(agent_dir, timeout=0.1):
+                pass
+    finally:
+        ticket.unlink()
+        os.close(fd)
+    assert [p.name for p in queue.iterdir()] == []
+
+
+def test_waiters_are_served_in_arrival_order(agent_dir):
+    """Queued waiters get the lock first-come first-served and report their wait"""
+    queue = _queue(agent_dir)
+    order = []
+    waits = []
+
+    def worker(i):
+        with lock.repo_lock(agent_dir, timeout=5) as info:
+            order.append(i)
+            waits.append(info.waited)
+
+    threads = []
+    with lock.repo_lock(agent_dir, timeout=1):
+        for i in range(4):
+            t = threading.Thread(target=worker, args=(i,))
+            t.start()
+            threads.append(t)
+            # Wait for this worker's ticket so arrival order is deterministic.
+            while len([p for p in queue.iterdir() if not p.name.startswith(".")]) < i + 2:
+                time.sleep(0.001)
+        time.sleep(0.05)
+    for t in threads:
+        t.join()
+
+    assert order == [0, 1, 2, 3]
+    assert min(waits) >= 0.05
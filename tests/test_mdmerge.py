@@ -0,0 +1,101 @@
+from taskman import mdmerge
+
+TASK = """# TASK: Cache
+
+## Meta
+Status: in_progress
+
+## Checklist
+- [ ] design
+- [ ] implement
+
+## Attempts
+### Attempt 1 (2024-01-02 10:00)
+Approach: a
+Result: failed
+
+## Notes
+- note one
+"""
+
+
+def test_task_checklists_and_attempts_union():
+    """Checklist items union by text (checked wins); attempts sort by time"""
+    ours = (TASK.replace("- [ ] design", "- [x] design")
+            .replace("- [ ] implement\n", "- [ ] implement\n- [ ] benchmark\n")
+            .replace("## Notes", "### Attempt 2 (2024-01-03 09:00)\nApproach: ours\n\n## Notes"))
+    theirs = (TASK.replace("- [ ] implement\n", "- [ ] implement\n- [ ] document\n")
+              .replace("## Notes", "### Attempt 2 (2024-01-02 15:00)\nApproach: theirs\n\n## Notes")
+              .replace("- note one\n", "- note one\n- note two\n"))
+    merged = mdmerge.merge("task", TASK, ours, theirs)
+
+    assert "- [x] design\n- [ ] implement\n- [ ] benchmark\n- [ ] document\n" in merged
+    assert merged.index("Approach: theirs") < merged.index("Approach: ours")
+    assert "- note one\n- note two\n" in merged
+    assert "- [ ] design" not in merged
+
+
+def test_overlapping_field_edit_is_a_conflict():
+    """Both sides changing the same field differently is left to the agent"""
+    ours = TASK.replace("in_progress", "blocked")
+    theirs = TASK.replace("in_progress", "complete")
+    assert mdmerge.merge("task", TASK, ours, theirs) is None
+
+
+def test_same_line_edited_two_ways_is_a_conflict():
+    """A free-text line rewritten differently on both sides is not kept twice"""
+    assert mdmerge.merge("memory", "# Mem\n- one\n", "# Mem\n- one!\n", "# Mem\n- one?\n") is None
+    assert mdmerge.merge("memory", "# Mem\n- one\n", "# Mem\n- one!\n", "# Mem\n- one!\n") == "# Mem\n- one!\n"
+
+
+def test_blank_and_separator_lines_keep_their_place():
+    """Lines without a key of their own follow their neighbours, not a count"""
+    base = "# Mem\n- a\n\n- b\n"
+    merged = mdmerge.merge("memory", base, "# Mem\n- a!\n\n- b\n", "# Mem\n- a\n\n- b2\n")
+    assert merged == "# Mem\n- a!\n\n- b2\n"
+
+    # Ours edits the line before the separator; theirs moves it and appends.
+    base = "# Mem\n- a\n---\n- b\n"
+    merged = mdmerge.merge("memory", base, "# Mem\n- a2\n---\n- b\n", "# Mem\n- a\n- b\n---\n- c\n")
+    assert merged == "# Mem\n- a2\n- b\n---\n- c\n"
+
+
+def test_one_sided_deletion_and_newer_timestamp():
+    """Untouched items deleted on one side go; timestamped fields take the newer value"""
+    base = "# Status\n- cache: planned\n- old: done\nLast handoff: 2024-05-01 10:00 (rev a)\n"
+    ours = "# Status\n- cache: planned\nLast handoff: 2024-05-02 09:00 (rev b)\n"
+    theirs = "# Status\n- cache: planned\n- old: done\nLast handoff: 2024-05-01 12:00 (rev c)\n"
+    merged = mdmerge.merge("status", base, ours, theirs)
+    assert "old" not in merged
+    assert "Last handoff: 2024-05-02 09:00 (rev b)" in merged
+
+
+def test_merge_conflicted_rebuilds_sides_from_markers():
+    """STATUS conflicts in git-style markers merge by task slug"""
+    text = (
+        "# Status\n"
+        "<<<<<<< Side #1 (Conflict 1 of 1)\n"
+        "- cache: in progress (agent-a)\n"
+        "- auth: planned\n"
+        "||||||| Base\n"
+        "- cache: planned\n"
+        "=======\n"
+        "- cache: planned\n"
+        "- search: in progress (agent-b)\n"
+        ">>>>>>> Side #2 (Conflict 1 of 1 ends)\n"
+    )
+    assert mdmerge.merge_conflicted("STATUS.md", text) == (
+        "# Status\n"
+        "- cache: in progress (agent-a)\n"
+        "- auth: planned\n"
+        "- search: in progress (agent-b)\n"
+    )
+
+
+def test_memory_entries_dedupe_and_unknown_files_skip():
+    """Memory entries dedupe ignoring whitespace; handoffs are never auto-merged"""
+    text = "<<<<<<< a\n- use  --ignore-working-copy\n- a\n||||||| b\n=======\n- use --ignore-working-copy\n- b\n>>>>>>> c\n"
+    merged = mdmerge.merge_conflicted("topics/TOPIC_jj.md", text)
+    assert merged.count("ignore-working-copy") == 1
+    assert "- a\n" in merged and "- b\n" in merged
+    assert mdmerge.merge_conflicted("handoffs/HANDOFF_x.md", text) is None
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from taskman import metrics
+
+
+def test_registry_renders_prometheus_text(tmp_path):
+    """Counts, histograms and token totals appear in exposition format"""
+    registry = metrics.Registry()
+    registry.observe("history_diffs", 0.02, 4000, "ok")
+    registry.observe("history_diffs", 3.0, 0, "error")
+    registry.observe("sync", 0.2, 100, "cancelled")
+    text = registry.render_prometheus({"agent": "a1"})
+    assert 'taskman_tool_calls_total{tool="history_diffs",outcome="ok",agent="a1"} 1' in text
+    assert 'taskman_tool_calls_total{tool="history_diffs",outcome="error",agent="a1"} 1' in text
+    assert 'taskman_tool_duration_seconds_bucket{tool="history_diffs",le="0.025",agent="a1"} 1' in text
+    assert 'taskman_tool_duration_seconds_bucket{tool="history_diffs",le="+Inf",agent="a1"} 2' in text
+    assert 'taskman_tool_response_tokens_total{tool="history_diffs",agent="a1"} 1000' in text
+    assert "# TYPE taskman_tool_duration_seconds histogram" in text
+
+    path = tmp_path / "taskman.prom"
+    registry.write_textfile(path, {"agent": "a1"})
+    assert path.read_text() == text
+    assert [p.name for p in tmp_path.iterdir()] == ["taskman.prom"]
+
+
+def test_snapshot_summarizes_tools():
+    """snapshot() gives per-tool totals for the metrics resource"""
+    registry = metrics.Registry()
+    registry.observe("conflicts", 0.5, 800, "ok")
+    registry.observe("conflicts", 1.5, 0, "error")
+    tool = registry.snapshot()["tools"]["conflicts"]
+    assert (tool["calls"], tool["ok"], tool["error"]) == (2, 1, 1)
+    assert tool["seconds_avg"] == 1.0
+    assert (tool["response_bytes"], tool["response_tokens"]) == (800, 200)
+
+
+def test_server_records_tool_calls(tmp_path, monkeypatch):
+    """MCP tool calls are counted and readable at taskman://metrics"""
+    from mcp.types import CallToolResult, TextContent
+    from taskman.server import mcp
+
+    (tmp_path / ".agent-files" / "tasks").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+
+    async def main():
+        await mcp._inner.call_tool("archive_list", {})
+        return await mcp._inner.read_resource("taskman://metrics")
+
+    contents = asyncio.run(main())
+    data = json.loads(list(contents)[0].content)
+    assert data["tools"]["archive_list"]["ok"] == 1
+    # Text and structured content both count.
+    expected = CallToolResult(
+        content=[TextContent(type="text", text="No archived tasks found")],
+        structuredContent={"entries": []},
+    )
+    assert data["tools"]["archive_list"]["response_bytes"] == len(
+        expected.model_dump_json(exclude_none=True)
+    )
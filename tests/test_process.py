@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from taskman import process
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_classify_commands():
+    """Commands map to the timeout class of what they do"""
+    jj = ["jj", "--config-toml", 'ui.conflict-marker-style = "git"']
+    assert process.classify([*jj, "log", "-r", "@"]) == "read"
+    assert process.classify([*jj, "--ignore-working-copy", "op", "log"]) == "read"
+    assert process.classify([*jj, "describe", "-m", "x"]) == "write"
+    assert process.classify([*jj, "git", "push", "-b", "main"]) == "network"
+    assert process.classify([*jj, "util", "gc"]) == "maintenance"
+    assert process.classify(["git", "--git-dir", "/r/.git", "cat-file", "--batch"]) == "read"
+    assert process.classify(["git", "worktree", "add", "wt"]) == "write"
+    assert process.classify(["jj", "--version"]) == "read"
+
+
+def test_timeout_env_override(monkeypatch):
+    """TASKMAN_TIMEOUT_<CLASS> overrides a class; 0 disables it"""
+    assert process.timeout_for("network") == process.TIMEOUTS["network"]
+    monkeypatch.setenv("TASKMAN_TIMEOUT_NETWORK", "5")
+    assert process.timeout_for("network") == 5.0
+    monkeypatch.setenv("TASKMAN_TIMEOUT_READ", "0")
+    assert process.timeout_for("read") is None
+
+
+def test_run_feeds_input_and_reads_large_output():
+    """Input and output larger than a pipe buffer do not deadlock"""
+    data = "line\n" * 200_000
+    code, out, err = process.run(["cat"], input=data)
+    assert (code, out, err) == (0, data, "")
+    code, out, _ = process.run(["cat"], input=data, binary=True)
+    assert out == data.encode()
+
+
+def test_timeout_kills_process_group(tmp_path):
+    """A timed-out command is killed together with its children"""
+    pidfile = tmp_path / "pid"
+    started = time.monotonic()
+    with pytest.raises(TimeoutError, match="timed out after 0.5s"):
+        process.run(["sh", "-c", f"sleep 30 & echo $! > {pidfile}; wait"], timeout=0.5)
+    assert time.monotonic() - started < 5
+    child = int(pidfile.read_text())
+    for _ in range(50):
+        if not _alive(child):
+            break
+        time.sleep(0.05)
+    assert not _alive(child)
+
+
+def test_cancel_scope_kills_running_command():
+    """Setting the cancel event stops the command inside the scope"""
+    event = threading.Event()
+    threading.Timer(0.2, event.set).start()
+    started = time.monotonic()
+    with process.cancel_on(event), pytest.raises(RuntimeError, match="cancelled"):
+        process.run(["sleep", "30"])
+    assert time.monotonic() - started < 5
+
+
+def test_iter_lines_streams_and_returns_status():
+    """iter_lines yields lines as printed and returns (returncode, stderr)"""
+    lines = process.iter_lines(["sh", "-c", "printf 'a\\nb\\nc'; echo oops >&2; exit 3"])
+    got = []
+    while True:
+        try:
+            got.append(next(lines))
+        except StopIteration as stop:
+            result = stop.value
+            break
+    assert got == ["a\n", "b\n", "c"]
+    assert result == (3, "oops\n")
+
+
+def test_pipe_answers_requests_and_honours_cancel():
+    """A long-lived Pipe exchanges lines and is killed by the cancel scope"""
+    pipe = process.Pipe(["cat"])
+    pipe.send(b"hello\nworld")
+    assert pipe.readline() == b"hello\n"
+    assert pipe.read(5) == b"world"
+    assert pipe.close() == 0
+
+    pipe = process.Pipe(["sh", "-c", "read line; sleep 30"])
+    event = threading.Event()
+    threading.Timer(0.2, event.set).start()
+    started = time.monotonic()
+    with process.cancel_on(event), pytest.raises(RuntimeError, match="cancelled"):
+        pipe.send(b"x\n")
+        pipe.readline()
+    assert time.monotonic() - started < 5
+    assert pipe._proc.poll() is not None
+
+
+def test_cancelled_mcp_call_kills_tool_command():
+    """Cancelling an MCP tool call terminates the jj/git child it is running"""
+    from taskman.server import _call_cancellable
+
+    outcome = []
+
+    def tool():
+        try:
+            process.run(["sleep", "30"])
+        except RuntimeError as e:
+            outcome.append(str(e))
+
+    async def main():
+        task = asyncio.ensure_future(_call_cancellable(tool))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    asyncio.run(main())
+    for _ in range(50):
+        if outcome:
+            break
+        time.sleep(0.05)
+    assert outcome and "cancelled" in outcome[0]
+    assert time.monotonic() - started < 5
@@ -0,0 +1,105 @@
+import subprocess
+import time
+import pytest
+from taskman import core, push
+
+
+@pytest.fixture
+def agent_dir(tmp_path):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    return agent_dir
+
+
+def test_enqueue_coalesces_same_bookmark(agent_dir):
+    """Repeated pushes of one bookmark stay a single queue entry"""
+    assert push.enqueue(agent_dir, "alice", "origin") == 1
+    assert push.enqueue(agent_dir, "alice", "origin") == 1
+    assert push.enqueue(agent_dir, "bob", "origin") == 2
+    status = push.status(agent_dir)
+    assert [e.bookmark for e in status.entries] == ["alice", "bob"]
+    assert status.entries[0].coalesced == 1
+    assert status.to_dict()["depth"] == 2
+
+
+def test_run_due_pushes_and_backs_off(agent_dir):
+    """Successful pushes leave the queue; failures retry later with the error kept"""
+    push.enqueue(agent_dir, "alice", "origin")
+    push.enqueue(agent_dir, "bob", "backup")
+    pushed = []
+
+    def fake_push(_, bookmark, remote):
+        pushed.append((bookmark, remote))
+        if bookmark == "bob":
+            raise RuntimeError("jj command failed\nstderr:\nError: remote unreachable")
+
+    wait = push.run_due(agent_dir, fake_push)
+    assert pushed == [("alice", "origin"), ("bob", "backup")]
+    assert wait is not None and wait > 0
+
+    [entry] = push.status(agent_dir).entries
+    assert (entry.bookmark, entry.attempts) == ("bob", 1)
+    assert entry.last_error == "Error: remote unreachable"
+
+    # Not due yet: nothing is pushed.
+    pushed.clear()
+    push.run_due(agent_dir, fake_push)
+    assert pushed == []
+
+
+def test_failing_push_is_parked_and_worker_exits(agent_dir, monkeypatch):
+    """After MAX_ATTEMPTS failures the entry is parked; a new sync re-arms it"""
+    monkeypatch.setattr(push, "MAX_ATTEMPTS", 3)
+    push.enqueue(agent_dir, "alice", "gone")
+
+    def failing(*_):
+        raise RuntimeError("Error: remote not found")
+
+    now = time.time()
+    for _ in range(3):
+        now += push.BACKOFF_CAP + 1
+        wait = push.run_due(agent_dir, failing, now=now)
+    assert wait is None
+    [entry] = push.status(agent_dir).entries
+    assert entry.failed and entry.attempts == 3
+    assert "1 failed" in str(push.status(agent_dir))
+
+    # The worker leaves with only parked entries queued.
+    monkeypatch.setattr(push, "_jj_push", failing)
+    push.work(agent_dir)
+
+    push.enqueue(agent_dir, "alice", "origin")
+    [entry] = push.status(agent_dir).entries
+    assert (entry.failed, entry.attempts, entry.remote) == (False, 0, "origin")
+    assert push.run_due(agent_dir, lambda *a: None) is None
+    assert push.status(agent_dir).entries == []
+
+
+def test_requeue_during_push_keeps_entry(agent_dir):
+    """A sync landing mid-push leaves the bookmark queued for another push"""
+    push.enqueue(agent_dir, "alice", "origin")
+
+    def slow_push(_, bookmark, remote):
+        push.enqueue(agent_dir, bookmark, remote)
+
+    assert push.run_due(agent_dir, slow_push) == 0.0
+    assert push.run_due(agent_dir, lambda *a: None) is None
+
+
+def test_sync_push_reaches_bare_remote(jj_repo, monkeypatch, tmp_path):
+    """sync(push_remote=...) queues the bookmark and the worker pushes it"""
+    monkeypatch.chdir(jj_repo)
+    monkeypatch.setattr(push, "ensure_worker", lambda agent_files: None)
+    (jj_repo / "STATUS.md").write_text("# Pushed\n")
+
+    result = core.sync("push me", push_remote="origin")
+    assert result.push == "origin"
+    assert core.push_status().entries[0].bookmark == result.workspace
+
+    push.work(jj_repo)
+    assert core.push_status().entries == []
+    branches = subprocess.run(
+        ["git", "--git-dir", str(tmp_path / "origin.git"), "branch", "--list", result.workspace],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert result.workspace in branches
@@ -0,0 +1,49 @@
+from taskman.results import GcResult, HistoryResult, Section, SyncResult, WorktreeList, WorktreeStatus
+
+
+def test_sync_result_renders_and_serializes():
+    """SyncResult keeps the old text and exposes the bookmark outcome"""
+    result = SyncResult(rev="abc123", workspace="feature", bookmark="moved")
+    assert str(result) == "rev: abc123\nbookmark: feature -> @"
+    assert result.to_dict() == {
+        "rev": "abc123", "workspace": "feature", "bookmark": "moved",
+        "lock_wait": 0.0, "group": 1, "auto_merged": [], "push": "",
+    }
+
+    waited = SyncResult(rev="abc123", workspace="feature", bookmark="moved", lock_wait=1.5)
+    assert str(waited).endswith("lock wait: 1.50s")
+
+
+def test_history_result_entries_and_cursor():
+    """HistoryResult exposes section data and the resume cursor"""
+    result = HistoryResult(
+        sections=[Section("=== abc ===", {"change": "abc"})],
+        cursor="tok",
+        max_bytes=10,
+    )
+    assert "resume with cursor: tok" in str(result)
+    assert result.to_dict() == {"entries": [{"change": "abc"}], "cursor": "tok"}
+
+    empty = HistoryResult(message="No revisions in range")
+    assert str(empty) == "No revisions in range"
+    assert empty.to_dict() == {"entries": [], "message": "No revisions in range"}
+
+
+def test_worktree_list_nests_dicts():
+    """Nested results serialize to plain dicts"""
+    result = WorktreeList([WorktreeStatus("a", "ok", "ok", True)])
+    assert str(result) == "a: git:ok jj-ws:ok bm:exists"
+    assert result.to_dict()["worktrees"][0]["git"] == "ok"
+
+
+def test_gc_result_reports_reclaimed_space():
+    """GcResult summarizes steps and space reclaimed, or the size for a dry run"""
+    result = GcResult(
+        abandoned=2, ops_trimmed=40, bytes_before=3 * 1024 * 1024,
+        bytes_after=1024 * 1024, seconds=1.25, steps=["abandoned 2 empty commit(s)"],
+    )
+    assert str(result) == (
+        "abandoned 2 empty commit(s)\nreclaimed 2.0 MiB (3.0 MiB -> 1.0 MiB) in 1.2s"
+    )
+    dry = GcResult(0, 0, 512, 512, 0.1, dry_run=True)
+    assert str(dry) == "dry run: repo is 512 B"
@@ -20,3 +20,28 @@ def test_mcp_has_history_tools():
     assert "history_diffs" in tools
     assert "history_batch" in tools
     assert "history_search" in tools
+
+
+def test_mcp_has_archive_tools():
+    """MCP server exposes archive tools"""
+    tools = [t.name for t in mcp.list_tools()]
+    assert "archive_show" in tools
+    assert "archive_list" in tools
+
+
+def test_mcp_has_conflicts_tool():
+    """MCP server exposes conflicts tool"""
+    tools = [t.name for t in mcp.list_tools()]
+    assert "conflicts" in tools
+
+
+def test_mcp_has_similar_attempts_tool():
+    """MCP server exposes similar_attempts tool"""
+    tools = [t.name for t in mcp.list_tools()]
+    assert "similar_attempts" in tools
+
+
+def test_mcp_has_push_status_tool():
+    """MCP server exposes push_status tool"""
+    tools = [t.name for t in mcp.list_tools()]
+    assert "push_status" in tools
@@ -0,0 +1,161 @@
+import os
+import subprocess
+import pytest
+from taskman import archive, tasks
+
+
+@pytest.fixture
+def agent_dir(tmp_path):
+    agent_dir = tmp_path / ".agent-files"
+    (agent_dir / ".jj" / "repo").mkdir(parents=True)
+    (agent_dir / "tasks" / "_archive").mkdir(parents=True)
+    tasks._cache.clear()
+    return agent_dir
+
+
+def _task(agent_dir, rel, title="Task"):
+    path = agent_dir / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"# TASK: {title}\n\n## Meta\nStatus: planned\n")
+    return path
+
+
+def test_shard_and_relpath():
+    """Sharded paths use the slug's first two characters, lowercased"""
+    assert tasks.shard_of("Auth-flow") == "au"
+    assert tasks.shard_of("x") == "x_"
+    assert tasks.shard_of("-a") == "_a"
+    assert tasks.relpath("auth", "flat") == "tasks/TASK_auth.md"
+    assert tasks.relpath("auth", "sharded") == "tasks/au/TASK_auth.md"
+
+
+def test_normalize_slug():
+    """File names are accepted as slugs; paths are rejected"""
+    assert tasks.normalize_slug("TASK_auth.md") == "auth"
+    for bad in ("", "a/b", "../x", ".layout"):
+        with pytest.raises(ValueError):
+            tasks.normalize_slug(bad)
+
+
+def test_task_path_flat_and_new(agent_dir):
+    """Existing flat tasks resolve; unknown slugs get the canonical path"""
+    _task(agent_dir, "tasks/TASK_auth.md")
+    found = tasks.task_path("auth", agent_dir)
+    assert (found.path, found.exists, found.layout) == ("tasks/TASK_auth.md", True, "flat")
+
+    (agent_dir / "tasks" / ".layout").write_text("sharded\n")
+    new = tasks.task_path("cache", agent_dir)
+    assert (new.path, new.exists, new.layout) == ("tasks/ca/TASK_cache.md", False, "sharded")
+    assert str(new) == "tasks/ca/TASK_cache.md (new)"
+    # Not moved yet: the flat file is still found under the sharded layout.
+    assert tasks.task_path("auth", agent_dir).path == "tasks/TASK_auth.md"
+
+
+def test_task_path_uses_index_for_other_locations(agent_dir):
+    """Tasks outside the canonical path are found through the index"""
+    _task(agent_dir, "tasks/misc/deep/TASK_odd.md")
+    assert tasks.task_path("odd", agent_dir).path == "tasks/misc/deep/TASK_odd.md"
+
+    index = tasks.load(agent_dir)
+    assert index.refresh() is False
+    os.rename(agent_dir / "tasks/misc/deep/TASK_odd.md", agent_dir / "tasks/misc/TASK_odd.md")
+    assert tasks.task_path("odd", agent_dir).path == "tasks/misc/TASK_odd.md"
+
+    # A fresh process reads the persisted index.
+    tasks._cache.clear()
+    assert tasks.load(agent_dir).slugs == {"odd": "tasks/misc/TASK_odd.md"}
+
+
+def test_task_path_archived(agent_dir, monkeypatch):
+    """Archived tasks resolve to the loose file or the pack"""
+    _task(agent_dir, "tasks/_archive/TASK_done.md")
+    assert str(tasks.task_path("done", agent_dir)) == "tasks/_archive/TASK_done.md (archived)"
+    monkeypatch.setattr(tasks, "run_jj", lambda args, cwd: (0, "", ""))
+    archive.pack(agent_dir)
+    packed = tasks.task_path("done", agent_dir)
+    assert (packed.path, packed.archived) == ("", True)
+    assert "taskman archive show done" in str(packed)
+    # Archived tasks are never indexed as live ones.
+    assert "done" not in tasks.load(agent_dir).slugs
+
+
+def test_reshard_moves_and_rewrites(agent_dir, monkeypatch):
+    """reshard() renames tasks, rewrites references and checkpoints once"""
+    calls = []
+
+    def fake_run_jj(args, cwd):
+        calls.append(args)
+        if args[:1] == ["log"]:
+            return 0, "1" if "empty" in args[-1] else "abc123", ""
+        return 0, "", ""
+
+    monkeypatch.setattr(tasks, "run_jj", fake_run_jj)
+    auth = _task(agent_dir, "tasks/TASK_auth.md", "Auth")
+    _task(agent_dir, "tasks/TASK_cache.md", "Cache")
+    # A link to an archived task of the same slug must not become a live path.
+    with auth.open("a") as fh:
+        fh.write("See tasks/_archive/TASK_cache.md\n")
+    (agent_dir / "STATUS.md").write_text("- auth: tasks/TASK_auth.md\n- done: tasks/TASK_gone.md\n")
+
+    dry = tasks.reshard(dry_run=True, agent_files=agent_dir)
+    assert (dry.moved, dry.rewritten, calls) == (2, 1, [])
+    assert (agent_dir / "tasks/TASK_auth.md").exists()
+
+    result = tasks.reshard(agent_files=agent_dir)
+    assert (result.moved, result.rewritten, result.rev) == (2, 1, "abc123")
+    assert (agent_dir / "tasks/au/TASK_auth.md").read_text().startswith("# TASK: Auth")
+    assert not (agent_dir / "tasks/TASK_auth.md").exists()
+    assert tasks.layout(agent_dir) == "sharded"
+    assert (agent_dir / "STATUS.md").read_text() == (
+        "- auth: tasks/au/TASK_auth.md\n- done: tasks/TASK_gone.md\n"
+    )
+    assert "See tasks/_archive/TASK_cache.md\n" in (agent_dir / "tasks/au/TASK_auth.md").read_text()
+    describes = [args for args in calls if args[0] == "describe"]
+    assert describes == [["describe", "-m", "reshard tasks/: 2 task(s) to sharded layout"]]
+    assert str(tasks.reshard(agent_files=agent_dir)) == "tasks/ already uses the sharded layout"
+
+    back = tasks.reshard(flat=True, agent_files=agent_dir)
+    assert back.moved == 2
+    assert (agent_dir / "tasks/TASK_cache.md").exists()
+    assert not (agent_dir / "tasks/ca").exists()
+    assert not (agent_dir / "tasks/.layout").exists()
+
+
+def test_reshard_in_jj_repo(jj_repo):
+    """The reshard checkpoint moves the file with its content unchanged"""
+    _task(jj_repo, "tasks/TASK_auth.md")
+    subprocess.run(["jj", "describe", "-m", "add auth"], cwd=jj_repo, check=True)
+    subprocess.run(["jj", "new"], cwd=jj_repo, check=True)
+
+    result = tasks.reshard(agent_files=jj_repo)
+    show = subprocess.run(
+        ["jj", "file", "show", "-r", result.rev, "tasks/au/TASK_auth.md"], cwd=jj_repo,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert show.startswith("# TASK: Task")
+    files = subprocess.run(
+        ["jj", "file", "list", "-r", result.rev], cwd=jj_repo,
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert "tasks/TASK_auth.md" not in files
+    assert "tasks/.layout" in files
+
+
+def test_set_meta_and_sections():
+    """Meta fields are replaced in place or appended to the section"""
+    text = "# TASK: X\n\n## Meta\nStatus: planned\nPriority: P1\n\n## Summary\nCurrent state: x\n\n## Notes\n"
+    text = tasks.set_meta(text, "Status", "complete")
+    text = tasks.set_meta(text, "Completed", "2026-01-02")
+    text = tasks.add_to_section(text, "Summary", "Outcome: shipped")
+    assert text == (
+        "# TASK: X\n\n## Meta\nStatus: complete\nPriority: P1\nCompleted: 2026-01-02\n\n"
+        "## Summary\nCurrent state: x\nOutcome: shipped\n\n## Notes\n"
+    )
+    assert tasks.meta_fields(text)["completed"] == "2026-01-02"
+    assert tasks.set_meta("# TASK: Y\nbody\n", "Status", "complete") == (
+        "# TASK: Y\n\n## Meta\nStatus: complete\n\nbody\n"
+    )
+    assert tasks.add_to_section("# TASK: Y\n", "Summary", "Outcome: ok") == (
+        "# TASK: Y\n\n## Summary\nOutcome: ok\n"
+    )
+
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from taskman import core, timeline
+
+
+NOW = datetime(2026, 1, 3, 15, 30).timestamp()
+
+
+def test_parse_time_absolute_and_relative():
+    """ISO times, day names and ages all resolve to timestamps"""
+    assert timeline.parse_time("2026-01-02") == datetime(2026, 1, 2).timestamp()
+    assert timeline.parse_time("2026-01-02 14:00") == datetime(2026, 1, 2, 14).timestamp()
+    assert timeline.parse_time("today", NOW) == datetime(2026, 1, 3).timestamp()
+    assert timeline.parse_time("yesterday", NOW) == datetime(2026, 1, 2).timestamp()
+    assert timeline.parse_time("6h", NOW) == NOW - 6 * 3600
+    assert timeline.parse_time("2d ago", NOW) == NOW - 2 * 86400
+    with pytest.raises(ValueError):
+        timeline.parse_time("last tuesday")
+
+
+def test_between_bisects_sorted_entries(tmp_path):
+    """Time windows are inclusive on both ends"""
+    index = timeline.Timeline(tmp_path, tmp_path / "timeline.json")
+    index.entries = [[t, t, f"c{t}", f"r{t}", [], ""] for t in (10, 20, 30, 40)]
+    index.times = [entry[0] for entry in index.entries]
+    assert [e[2] for e in index.between(20, 30)] == ["c20", "c30"]
+    assert [e[2] for e in index.between(None, 15)] == ["c10"]
+    assert [e[2] for e in index.between(35, None)] == ["c40"]
+
+
+def test_timeline_tracks_new_checkpoints(jj_repo, monkeypatch):
+    """The index picks up new commits and filters history by time"""
+    monkeypatch.chdir(jj_repo)
+    (jj_repo / "STATUS.md").write_text("v1\n")
+    core.describe("first")
+
+    listed = core.timeline(since="1h")
+    assert any(entry.description == "first" for entry in listed.entries)
+    assert all(entry.workspaces == ["default"] for entry in listed.entries
+               if entry.description == "first")
+
+    (jj_repo / "STATUS.md").write_text("v2\n")
+    core.describe("second")
+    described = [e.description for e in core.timeline(since="1h").entries if e.description]
+    assert described[:2] == ["second", "first"]
+
+    future = core.history_diffs("STATUS.md", since="2999-01-01")
+    assert future.sections == []
+    recent = core.history_diffs("STATUS.md", since="1h")
+    assert len(recent.sections) >= 2
@@ -0,0 +1,76 @@
+import subprocess
+import sys
+import pytest
+from taskman import watch
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_debouncer_waits_for_quiet_period():
+    """Debouncer fires once edits stop for the quiet period"""
+    clock = FakeClock()
+    d = watch.Debouncer(quiet=2.0, interval=60.0, clock=clock)
+    assert d.timeout() is None
+
+    d.add({"STATUS.md"})
+    clock.now = 1.0
+    d.add({"tasks/TASK_a.md"})
+    assert not d.due()
+
+    clock.now = 3.0
+    assert d.due()
+    assert d.drain() == {"STATUS.md", "tasks/TASK_a.md"}
+    assert d.timeout() is None
+
+
+def test_debouncer_caps_batch_at_interval():
+    """Debouncer fires at the interval even while edits keep arriving"""
+    clock = FakeClock()
+    d = watch.Debouncer(quiet=2.0, interval=5.0, clock=clock)
+    for t in range(6):
+        clock.now = float(t)
+        d.add({"STATUS.md"})
+    assert d.due()
+
+
+def test_checkpoint_message_truncates():
+    """Checkpoint message lists a few files and counts the rest"""
+    paths = {f"tasks/TASK_{i}.md" for i in range(8)}
+    message = watch._checkpoint_message(paths)
+    assert message.startswith("auto-checkpoint: 8 files")
+    assert "(+3 more)" in message
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_inotify_reports_changed_paths(tmp_path):
+    """Inotify reports edits, including files in new directories, and skips .jj/"""
+    (tmp_path / ".jj").mkdir()
+    with watch.Inotify(tmp_path) as inotify:
+        (tmp_path / "STATUS.md").write_text("x\n")
+        (tmp_path / ".jj" / "op").write_text("ignored\n")
+        (tmp_path / "tasks").mkdir()
+        (tmp_path / "tasks" / "TASK_a.md").write_text("a\n")
+
+        changed = set()
+        for _ in range(5):
+            changed |= inotify.read(0.2)
+        assert "STATUS.md" in changed
+        assert "tasks/TASK_a.md" in changed
+        assert not any(p.startswith(".jj") for p in changed)
+
+
+def test_checkpoint_skips_empty_batch(jj_repo):
+    """checkpoint() does nothing when the batch has no net change"""
+    subprocess.run(["jj", "new"], cwd=jj_repo, check=True)
+    assert watch.checkpoint(jj_repo, {"scratch.tmp"}) is None
+
+    (jj_repo / "STATUS.md").write_text("# Changed\n")
+    result = watch.checkpoint(jj_repo, {"STATUS.md"})
+    assert result is not None
+    assert result.reason == "auto-checkpoint: 1 file: STATUS.md"
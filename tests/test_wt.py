@@ -60,7 +60,7 @@ class TestWtList:
         """wt_list returns 'No worktrees found' when none exist."""
         main_repo, _ = wt_setup
         monkeypatch.chdir(main_repo)
-        result = core.wt_list()
+        result = str(core.wt_list())
         assert result == "No worktrees found"
 
     def test_lists_worktree(self, wt_setup, monkeypatch):
@@ -71,7 +71,7 @@ class TestWtList:
         # Create a worktree
         core.wt("feature-1", new_branch=True)
 
-        result = core.wt_list()
+        result = str(core.wt_list())
         assert "feature-1" in result
         assert "git:ok" in result
         assert "jj-ws:ok" in result
@@ -89,7 +89,7 @@ class TestWtList:
         import shutil
         shutil.rmtree(wt_dir / ".agent-files")
 
-        result = core.wt_list()
+        result = str(core.wt_list())
         assert "orphan-test" in result
         assert "jj-ws:orphaned" in result
 
@@ -112,7 +112,7 @@ class TestWtRm:
         subprocess.run(["jj", "st"], cwd=wt_agent, capture_output=True, check=True)
 
         # Remove it
-        result = core.wt_rm("to-remove")
+        result = str(core.wt_rm("to-remove"))
         assert "Removed git worktree" in result
         assert "Forgot jj workspace" in result
         assert "Merged changes from 'to-remove'" in result
@@ -173,7 +173,7 @@ class TestWtRm:
         assert "uncommitted" in str(exc_info.value).lower() or "force" in str(exc_info.value).lower()
 
         # With force should succeed
-        result = core.wt_rm("dirty-wt", force=True)
+        result = str(core.wt_rm("dirty-wt", force=True))
         assert "Removed git worktree" in result
         assert not wt_dir.exists()
 
@@ -199,7 +199,7 @@ class TestWtRm:
         )
 
         # wt_rm should still clean up jj workspace and merge
-        result = core.wt_rm("partial")
+        result = str(core.wt_rm("partial"))
         assert "Forgot jj workspace" in result
         assert "Merged changes" in result
 
@@ -208,7 +208,7 @@ class TestWtRm:
         main_repo, _ = wt_setup
         monkeypatch.chdir(main_repo)
 
-        result = core.wt_rm("does-not-exist")
+        result = str(core.wt_rm("does-not-exist"))
         assert "Nothing to clean" in result
 
 
@@ -226,17 +226,17 @@ class TestWtPrune:
         shutil.rmtree(wt_dir)
 
         # Verify orphaned state before prune
-        list_result = core.wt_list()
+        list_result = str(core.wt_list())
         assert "orphan" in list_result
         assert "orphaned" in list_result
 
         # Prune should clean it up
-        result = core.wt_prune()
+        result = str(core.wt_prune())
         assert "orphan" in result
         assert "Forgot" in result or "git:" in result
 
         # Should be clean now
-        list_after = core.wt_list()
+        list_after = str(core.wt_list())
         assert "orphan" not in list_after or "No worktrees" in list_after
 
     def test_no_orphans(self, wt_setup, monkeypatch):
@@ -244,5 +244,5 @@ class TestWtPrune:
         main_repo, _ = wt_setup
         monkeypatch.chdir(main_repo)
 
-        result = core.wt_prune()
+        result = str(core.wt_prune())
         assert "No orphaned state" in result